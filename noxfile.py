@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import shutil
 from pathlib import Path
 
@@ -42,6 +43,21 @@ def tests(session: nox.Session) -> None:
     session.run("pytest", *session.posargs)
 
 
+@nox.session
+def bench(session: nox.Session) -> None:
+    """
+    Run the benchmarks, which only mean something on a quiet machine.
+    """
+    session.install(".[test]")
+    session.run(
+        "pytest",
+        "tests/test_performance.py",
+        "-rs",
+        *session.posargs,
+        env={"FORMULATE_BENCHMARKS": "1"},
+    )
+
+
 @nox.session
 def coverage(session: nox.Session) -> None:
     """
@@ -90,6 +106,38 @@ def build_api_docs(session: nox.Session) -> None:
     )
 
 
+@nox.session
+def generate(session: nox.Session) -> None:
+    """
+    Regenerate the standalone parsers from the grammars.
+    """
+
+    # The generated modules embed lark's runtime, so they parse without lark
+    # installed; `GRAMMAR_SHA256` is what lets the package, and the test suite,
+    # tell that one no longer matches the grammar it was generated from.
+    session.install("lark>=1.3")
+    package = DIR / "src" / "formulate"
+    for name in ("root", "numexpr"):
+        grammar = package / "resources" / f"{name}_grammar.lark"
+        source = session.run(
+            "python",
+            "-m",
+            "lark.tools.standalone",
+            "--maybe_placeholders",
+            str(grammar),
+            silent=True,
+        )
+        # The bytes as they are on disk, which is what the package hashes: text
+        # mode would turn a CRLF checkout's line endings into LF first.
+        digest = hashlib.sha256(grammar.read_bytes()).hexdigest()
+        header = (
+            f"# Generated by `nox -s generate` from resources/{grammar.name}.\n"
+            "# Do not edit: change the grammar and regenerate instead.\n"
+            f'GRAMMAR_SHA256 = "{digest}"\n\n'
+        )
+        package.joinpath("_standalone", f"{name}_parser.py").write_text(header + source)
+
+
 @nox.session
 def build(session: nox.Session) -> None:
     """
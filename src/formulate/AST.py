@@ -16,15 +16,24 @@ how "this construct has no faithful equivalent here" is expressed, and raises
 ``ValueError`` rather than emitting something subtly different.
 """
 
+import functools
+import hashlib
 import re
+import sys
+import weakref
 from abc import ABCMeta, abstractmethod
-from collections.abc import Callable, Iterator, Sequence
+from collections.abc import (
+    Callable,
+    Iterable,
+    Iterator,
+    KeysView,
+    Mapping,
+    Sequence,
+)
 from dataclasses import dataclass, field
-from typing import Any
-
-from ordered_set import OrderedSet
+from typing import IO, TYPE_CHECKING, Any, ClassVar, NamedTuple, TypeVar, cast
 
-from ._traversal import fold
+from ._traversal import chunks, emit, emit_each, fold
 from .identifiers import (
     CONSTANTS,
     FUNCTION_DISPLAY_NAMES,
@@ -38,8 +47,61 @@ from .identifiers import (
     ROOT_CONSTANTS,
     ROOT_FUNCTIONS,
     ROOT_OPERATOR_SYMBOLS,
+    UNARY_OPERATORS,
 )
 
+if TYPE_CHECKING:  # pragma: no cover
+    import ast
+
+    from ._evaluate import ShortCircuit
+    from .compact import CompactAST
+
+# How tightly each kind of node binds, loosest first. With `parens="minimal"` a
+# node is parenthesized only where it binds more loosely than its position
+# allows; by default every operator is, whatever its position. Binary operators
+# sit between _SEPARATOR and _UNARY, at the level their backend's `precedence`
+# gives them, which is where the languages disagree.
+_SEPARATOR = 0  # ROOT's ":" and Python's ",", only ever at the very top
+_EXPRESSION = 1  # anything but a separator: a call argument, say
+_UNARY = 7
+_POWER = 8
+_ATOM = 9
+
+# The values `parens` takes in the `to_*` methods.
+_PARENS = ("full", "minimal")
+
+# Fragments -- names, numbers, operators and brackets -- in each chunk that the
+# `iter_*` and `write_*` methods produce: tens of kilobytes of text, which is
+# few enough calls to `write` and little enough memory.
+_CHUNK_FRAGMENTS = 8192
+
+_COMPARISONS = frozenset({"lt", "gt", "lte", "gte", "eq", "neq"})
+
+# From the grammars, which follow C++ for ROOT and Python for NumExpr.
+_ROOT_PRECEDENCE = {
+    "multi_out": _SEPARATOR,
+    "or": 1,
+    "and": 2,
+    "eq": 3,
+    "neq": 3,
+    **dict.fromkeys(["lt", "gt", "lte", "gte"], 4),
+    "add": 5,
+    "sub": 5,
+    **dict.fromkeys(["mul", "div", "mod"], 6),
+    "pow": _POWER,
+}
+
+_NUMEXPR_PRECEDENCE = {
+    **dict.fromkeys(_COMPARISONS, 1),
+    "or": 2,
+    "xor": 3,
+    "and": 4,
+    "add": 5,
+    "sub": 5,
+    **dict.fromkeys(["mul", "div", "mod"], 6),
+    "pow": _POWER,
+}
+
 
 @dataclass(frozen=True, slots=True)
 class _Backend:
@@ -49,16 +111,85 @@ class _Backend:
     constants: dict[str, Any]
     function_prefix: str = ""
     pow_as_operator: bool = False
-    unparenthesized_ops: frozenset[str] = frozenset()
+    # The level each binary operator binds at; see _SEPARATOR.
+    precedence: dict[str, int] = field(default_factory=dict)
+    # Operators whose operands must both bind more tightly than they do, where
+    # the left operand could otherwise bind as tightly: comparisons, which do
+    # not nest in NumExpr and chain, meaning something else, in Python.
+    non_associative: frozenset[str] = frozenset()
     # Unary operators written as a function call instead of a symbol, mapped to
     # the function name. Takes precedence over operator_symbols.
     unary_functions: dict[str, str] = field(default_factory=dict)
     index_format: str | None = (
         "python"  # None = forbidden, "root" = [x][y], "python" = [x,y]
     )
+    # The loosest level an index may be written at without parentheses.
+    index_binding: int = _EXPRESSION
     # Whether a name this backend cannot spell is hex-encoded rather than
     # emitted as written. See `_encode_name`.
     encode_invalid_names: bool = False
+    # Worked out once from the tables above, so that rendering a node looks its
+    # spelling up rather than building it. Binary operators map to the text
+    # between their operands and the loosest level each operand may be written
+    # at bare; unary ones to the text before their operand, the fragments
+    # after it, its loosest level, and their own level; functions to the text
+    # before their arguments; constants to their spelling. Anything the
+    # backend cannot write is missing.
+    binary: dict[str, tuple[str, int, int]] = field(init=False)
+    unary: dict[str, tuple[str, tuple[str, ...], int, int]] = field(init=False)
+    calls: dict[str, str] = field(init=False)
+    constant_spellings: dict[str, str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        binary = {}
+        for operator, level in self.precedence.items():
+            symbol = self.operator_symbols[operator]
+            # A comma is punctuation rather than an operator: it hugs the
+            # operand on its left, so it renders as ``x, y`` and not ``x , y``.
+            separator = f"{symbol} " if symbol == "," else f" {symbol} "
+            if level == _POWER:
+                # The only operator that groups from the right, and the
+                # tightest: its base has to be an atom, but its exponent may
+                # carry a sign.
+                binary[operator] = (separator, _ATOM, _UNARY)
+            elif operator in self.non_associative:
+                binary[operator] = (separator, level + 1, level + 1)
+            else:
+                binary[operator] = (separator, level, level + 1)
+
+        unary: dict[str, tuple[str, tuple[str, ...], int, int]] = {}
+        for operator in UNARY_OPERATORS:
+            if (function := self.unary_functions.get(operator)) is not None:
+                opening = f"{self.function_prefix}{function}("
+                unary[operator] = (opening, (")",), _EXPRESSION, _ATOM)
+            else:
+                # A sign on a sign keeps its parentheses, -(-a) rather than
+                # --a, which C++ would read as a decrement.
+                symbol = self.operator_symbols[operator]
+                unary[operator] = (symbol, (), _POWER, _UNARY)
+
+        constant_spellings = {}
+        for name, const in self.constants.items():
+            text = str(const)
+            if isinstance(const, (bool, int, float)) and const < 0:
+                # A bare negative number is not an atom: ** binds tighter than
+                # unary minus, so the sign would escape the exponent and
+                # ``eminus ** 2`` would come out negative.
+                text = f"({text})"
+            constant_spellings[name] = text
+
+        # The dataclass is frozen, and these are part of its value.
+        object.__setattr__(self, "binary", binary)
+        object.__setattr__(self, "unary", unary)
+        object.__setattr__(
+            self,
+            "calls",
+            {
+                function: f"{self.function_prefix}{name}("
+                for function, name in self.functions.items()
+            },
+        )
+        object.__setattr__(self, "constant_spellings", constant_spellings)
 
 
 _NUMEXPR = _Backend(
@@ -67,6 +198,8 @@ _NUMEXPR = _Backend(
     functions=NUMEXPR_FUNCTIONS,
     constants=NUMEXPR_CONSTANTS,
     pow_as_operator=True,
+    precedence=_NUMEXPR_PRECEDENCE,
+    non_associative=_COMPARISONS,
     index_format=None,
     encode_invalid_names=True,
 )
@@ -76,8 +209,10 @@ _ROOT = _Backend(
     operator_symbols=ROOT_OPERATOR_SYMBOLS,
     functions=ROOT_FUNCTIONS,
     constants=ROOT_CONSTANTS,
-    unparenthesized_ops=frozenset({":"}),
+    precedence=_ROOT_PRECEDENCE,
     index_format="root",
+    # ROOT's brackets hold a sum, not any expression.
+    index_binding=_ROOT_PRECEDENCE["add"],
 )
 
 _PYTHON = _Backend(
@@ -86,10 +221,14 @@ _PYTHON = _Backend(
     functions=PYTHON_FUNCTIONS,
     constants=PYTHON_CONSTANTS,
     function_prefix="np.",
-    unparenthesized_ops=frozenset({","}),
+    precedence={**_NUMEXPR_PRECEDENCE, "multi_out": _SEPARATOR},
+    non_associative=_COMPARISONS,
     unary_functions=PYTHON_UNARY_FUNCTIONS,
 )
 
+# What :meth:`AST.render` calls each backend.
+_BACKENDS = {"root": _ROOT, "numexpr": _NUMEXPR, "python": _PYTHON}
+
 
 # ROOT branch names are not always identifiers -- `branch.leaf` is one name with
 # a dot in it, not an attribute access -- but NumExpr rejects any expression
@@ -108,11 +247,173 @@ _PYTHON = _Backend(
 _ENCODE_RUN = re.compile(r"[^A-Za-z0-9]+")
 
 
+# Remembered, as every occurrence of a branch is encoded again otherwise.
+@functools.lru_cache(maxsize=4096)
 def _encode_name(name: str) -> str:
     """Hex-encode the parts of `name` that cannot appear in an identifier."""
     return _ENCODE_RUN.sub(lambda run: f"_{run.group().encode().hex()}_", name)
 
 
+_Node = TypeVar("_Node")
+
+
+def _separated(
+    groups: Iterable[Sequence[str | _Node]], separator: str
+) -> list[str | _Node]:
+    """The fragments of `groups`, with `separator` between each pair."""
+    fragments: list[str | _Node] = []
+    for i, group in enumerate(groups):
+        if i:
+            fragments.append(separator)
+        fragments.extend(group)
+    return fragments
+
+
+def _is_minimal(parens: str) -> bool:
+    if parens not in _PARENS:
+        msg = f"Unknown parens {parens!r}; expected one of {', '.join(_PARENS)}"
+        raise ValueError(msg)
+    return parens == "minimal"
+
+
+def _operand(
+    node: "AST", binding: int, backend: _Backend, minimal: bool
+) -> Sequence["str | AST"]:
+    """`node` as a fragment where nothing binding more loosely than `binding`
+    may be written bare: parenthesized if need be, which is wherever it is an
+    operator unless `minimal`.
+
+    The parent decides, not the node, so that what is still to come of a node
+    being written is the node itself and the strings around it: a long chain
+    keeps nothing new per level while it is streamed.
+    """
+    level = node._level(backend)
+    if level < binding if minimal else _SEPARATOR < level < _ATOM:
+        return ("(", node, ")")
+    return (node,)
+
+
+def _serializer(
+    backend: _Backend, minimal: bool
+) -> Callable[["AST"], Sequence["str | AST"]]:
+    def serialize(node: AST) -> Sequence[str | AST]:
+        return node._serialize(backend, minimal)
+
+    return serialize
+
+
+def _shared(tree: "AST") -> frozenset[int]:
+    """The ids of the nodes that occur more than once in `tree`, for
+    `emit_each` to write once and copy.
+
+    Only an interned tree shares subtrees, and finding them costs a walk of its
+    own, so for any other the answer is none without looking.
+    """
+    kept = _KEPT.get(id(tree))
+    if kept is None or not kept.interned:
+        return frozenset()
+    seen: set[int] = set()
+    shared: set[int] = set()
+    stack: list[AST] = [tree]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            shared.add(id(node))
+        else:
+            seen.add(id(node))
+            stack.extend(node._children())
+    return frozenset(shared)
+
+
+class _Kept(weakref.ref["AST"]):
+    """What has been worked out about one node and kept for it, beside a weak
+    reference to the node, which drops it from `_KEPT` once the node is gone.
+
+    Most nodes are never asked anything, so rather than every node carrying a
+    slot for each value that might be kept, only the ones asked have an entry.
+    """
+
+    __slots__ = ("fingerprint", "interned", "key", "summary")
+    fingerprint: bytes | None
+    interned: bool
+    key: int
+    summary: "_Summary | None"
+
+
+# What is kept for each node asked, by its id. A node's entry goes with it, so
+# an id is never looked up for the wrong node.
+_KEPT: dict[int, _Kept] = {}
+
+
+def _forget(kept: "weakref.ref[AST]") -> None:
+    _KEPT.pop(cast(_Kept, kept).key, None)
+
+
+def _kept(node: "AST") -> _Kept:
+    """The entry in `_KEPT` for `node`, made if it has none yet."""
+    return _KEPT.get(id(node)) or _keep(node)
+
+
+def _keep(node: "AST") -> _Kept:
+    kept = _Kept(node, _forget)
+    kept.key = id(node)
+    kept.fingerprint = kept.summary = None
+    kept.interned = False
+    # Another thread may have made one meanwhile: there is only ever the one.
+    return _KEPT.setdefault(id(node), kept)
+
+
+# Part of every fingerprint, so that one can only change on purpose.
+_FINGERPRINT_PERSON = b"formulate.AST.1"
+
+
+def _fingerprint(node: "AST") -> tuple[Sequence["AST"], Callable[..., bytes]]:
+    """`fold` the fingerprint of `node` out of its children's."""
+    kept = _KEPT.get(id(node))
+    if kept is not None and kept.fingerprint is not None:
+        known = kept.fingerprint
+        return (), lambda: known
+
+    def build(*children: bytes) -> bytes:
+        # The node type, then each field that is not a child with a tag, and
+        # strings with their length, then the children, which are digests and
+        # so all the same length: no two trees write the same bytes.
+        data = bytearray(type(node).__name__.encode())
+        for name in node.__match_args__:
+            value = getattr(node, name)
+            if isinstance(value, str):
+                encoded = value.encode()
+                data += b";s%d:%s" % (len(encoded), encoded)
+            elif isinstance(value, float):
+                data += b";f%a" % value
+            elif isinstance(value, int):
+                data += b";i%a" % value
+            elif isinstance(value, tuple):
+                data += b";t%d" % len(value)
+        data += b";"
+        data += b"".join(children)
+        return hashlib.blake2b(
+            data, digest_size=16, person=_FINGERPRINT_PERSON
+        ).digest()
+
+    return node._children(), build
+
+
+def _binary(
+    left: "AST",
+    right: "AST",
+    spelling: tuple[str, int, int],
+    backend: _Backend,
+    minimal: bool,
+) -> Sequence["str | AST"]:
+    separator, left_binding, right_binding = spelling
+    return (
+        *_operand(left, left_binding, backend, minimal),
+        separator,
+        *_operand(right, right_binding, backend, minimal),
+    )
+
+
 class AST(metaclass=ABCMeta):
     """Base class of every expression node.
 
@@ -131,19 +432,26 @@ class AST(metaclass=ABCMeta):
 
     # The node types are all slotted dataclasses, but a slotted class inheriting
     # from an unslotted one still gets a __dict__, which would undo that for
-    # every node in the tree.
-    __slots__ = ()
+    # every node in the tree. The one slot here is what lets the intern pool
+    # hold nodes weakly; what is worked out about a node is kept in `_KEPT`.
+    __slots__ = ("__weakref__",)
+    # Set by @dataclass on each node type: its fields, children among them, in
+    # the order `_children` gives the children.
+    __match_args__: ClassVar[tuple[str, ...]]
 
     @abstractmethod
     def _children(self) -> Sequence["AST"]: ...  # pragma: no cover
 
     @abstractmethod
-    def _format(self, *parts: str) -> str: ...  # pragma: no cover
+    def _format(self) -> Sequence["str | AST"]: ...  # pragma: no cover
+
+    @abstractmethod
+    def _level(self, backend: _Backend) -> int: ...  # pragma: no cover
 
     @abstractmethod
-    def _serializer(
-        self, backend: _Backend
-    ) -> Callable[..., str]: ...  # pragma: no cover
+    def _serialize(
+        self, backend: _Backend, minimal: bool
+    ) -> Sequence["str | AST"]: ...  # pragma: no cover
 
     def __eq__(self, other: object) -> bool:
         """Always raise: expression equality is not something this package answers.
@@ -177,6 +485,18 @@ class AST(metaclass=ABCMeta):
     # honestly not Hashable, as `isinstance(node, Hashable)` reports.
     __hash__ = None  # type: ignore[assignment]
 
+    def __reduce__(self) -> tuple[Callable[["CompactAST"], "AST"], tuple["CompactAST"]]:
+        """Pickle, and deep-copy, as a :class:`~formulate.compact.CompactAST`.
+
+        The dataclasses' own pickling nests one call per node, so a deep enough
+        tree hit the recursion limit on its way to a worker process. Flattened,
+        the tree pickles at any depth, in a fraction of the bytes, and is
+        rebuilt with a loop. Subtrees shared within the tree are copied apart.
+        """
+        from .compact import CompactAST  # noqa: PLC0415 (compact imports this)
+
+        return CompactAST.to_ast, (CompactAST.from_ast(self),)
+
     def _walk(self) -> Iterator["AST"]:
         """Yield every node in the tree, parents first and left to right.
 
@@ -190,17 +510,45 @@ class AST(metaclass=ABCMeta):
             stack.extend(reversed(node._children()))
 
     def __str__(self) -> str:
-        return fold(self, lambda node: (node._children(), node._format))
+        return emit(self, lambda node: node._format())
+
+    def _chunks(self, backend: _Backend, parens: str, size: int) -> Iterator[str]:
+        # Not a generator itself, so that a bad `parens` raises straight away.
+        minimal = _is_minimal(parens)
+        return chunks(
+            _operand(self, _SEPARATOR, backend, minimal),
+            _serializer(backend, minimal),
+            size,
+        )
 
-    def _to_backend(self, backend: _Backend) -> str:
-        return fold(self, lambda node: (node._children(), node._serializer(backend)))
+    def _to_backend(self, backend: _Backend, parens: str) -> str:
+        shared = _shared(self)
+        if not shared:
+            return "".join(self._chunks(backend, parens, sys.maxsize))
+        # Streamed text is gone by the time a shared subtree comes round again,
+        # so only the whole string is written with it copied.
+        minimal = _is_minimal(parens)
+        (text,) = emit_each(
+            [_operand(self, _SEPARATOR, backend, minimal)],
+            [_serializer(backend, minimal)],
+            (),
+            shared,
+        )
+        return cast(str, text)
 
-    def to_numexpr(self) -> str:
+    def _write_backend(self, fp: IO[str], backend: _Backend, parens: str) -> None:
+        for chunk in self._chunks(backend, parens, _CHUNK_FRAGMENTS):
+            fp.write(chunk)
+
+    def to_numexpr(self, *, parens: str = "full") -> str:
         """Render the expression as NumExpr source.
 
         Named constants have no NumExpr spelling and are substituted by their
         numeric value, so ``pi`` comes back as ``3.141592653589793``.
 
+        :param parens: ``"full"`` to parenthesize every operator, or
+            ``"minimal"`` for only the parentheses NumExpr's precedence and
+            associativity need. Either reads back as the same tree.
         :raises ValueError: if the expression uses a construct NumExpr has no
             equivalent for, such as array indexing, ``inf``, or the
             element-wise ``TMath::Min``/``TMath::Max``.
@@ -211,11 +559,14 @@ class AST(metaclass=ABCMeta):
             >>> formulate.from_root("TMath::Sqrt(x**2 + y**2)").to_numexpr()
             'sqrt(((x ** 2) + (y ** 2)))'
         """
-        return self._to_backend(_NUMEXPR)
+        return self._to_backend(_NUMEXPR, parens)
 
-    def to_root(self) -> str:
+    def to_root(self, *, parens: str = "full") -> str:
         """Render the expression as a ROOT ``TTreeFormula`` string.
 
+        :param parens: ``"full"`` to parenthesize every operator, or
+            ``"minimal"`` for only the parentheses C++ precedence and
+            associativity need. Either reads back as the same tree.
         :raises ValueError: if the expression uses a construct ROOT has no
             equivalent for, such as ``^`` used as XOR or NumExpr's ``where``.
 
@@ -224,16 +575,21 @@ class AST(metaclass=ABCMeta):
             >>> import formulate
             >>> formulate.from_numexpr("sqrt(x**2 + y**2)").to_root()
             'TMath::Sqrt(((x ** 2) + (y ** 2)))'
+            >>> formulate.from_numexpr("sqrt(x**2 + y**2)").to_root(parens="minimal")
+            'TMath::Sqrt(x ** 2 + y ** 2)'
         """
-        return self._to_backend(_ROOT)
+        return self._to_backend(_ROOT, parens)
 
-    def to_python(self) -> str:
+    def to_python(self, *, parens: str = "full") -> str:
         """Render the expression as plain Python, using NumPy for functions.
 
         Function and constant names are emitted with an ``np.`` prefix, so the
         result is meant to be evaluated somewhere NumPy is imported as ``np``.
         This backend is output-only: there is no ``from_python``.
 
+        :param parens: ``"full"`` to parenthesize every operator, or
+            ``"minimal"`` for only the parentheses Python's precedence and
+            associativity need.
         :raises ValueError: if the expression uses a construct with no NumPy
             equivalent that can be written as a single name, such as NumExpr's
             ``contains``.
@@ -244,29 +600,334 @@ class AST(metaclass=ABCMeta):
             >>> formulate.from_root("TMath::Sqrt(x**2 + y**2)").to_python()
             'np.sqrt(((x ** 2) + (y ** 2)))'
         """
-        return self._to_backend(_PYTHON)
+        return self._to_backend(_PYTHON, parens)
+
+    def to_python_ast(self) -> "ast.Expression":
+        """The expression as Python's own syntax tree.
+
+        Gives what ``ast.parse(self.to_python(), mode="eval")`` does, built
+        from the tree rather than from text, with every node at line one. It
+        is written as :meth:`to_python` writes it, so a dotted name is
+        attribute access; :meth:`compile_python` keeps it one name. Building
+        it works at any depth, but CPython's ``compile`` does not, past a few
+        hundred levels; :meth:`compile_python` does.
+
+        :raises ValueError: for what :meth:`to_python` raises it for.
+
+        .. code-block:: pycon
+
+            >>> import ast
+            >>> import formulate
+            >>> ast.unparse(formulate.from_root("TMath::Sqrt(x) > 2").to_python_ast())
+            'np.sqrt(x) > 2'
+        """
+        from . import _python_ast  # noqa: PLC0415 (it imports this)
+
+        return _python_ast.to_python_ast(self)
+
+    def compile_python(self, *, scalar: bool = False) -> Callable[..., Any]:
+        """A function computing the expression, compiled once and kept.
+
+        Its parameters are :attr:`variables`, in that order, and it returns
+        what ``eval`` of :meth:`to_python` gives with ``np`` and the arguments
+        in scope. A dotted name is one parameter, hex-encoded as in
+        :meth:`to_numexpr`: ``branch.leaf`` is passed as ``branch_2e_leaf``,
+        never read as an attribute of ``branch``. The code is generated from
+        the tree, with a deep one split into local variables so that any depth
+        compiles, and the function is kept, for up to 256 expressions by
+        fingerprint and mode, so that compiling the same expression again costs
+        a lookup. Needs NumPy.
+
+        :param scalar: compile for one event's values at a time instead, as an
+            event loop calls it, with Python's operators and :mod:`math` in
+            place of NumPy's, and ROOT's meaning: ``&&`` and ``||``
+            short-circuit and give ``True`` or ``False``, ``%`` truncates its
+            operands to integers, and dividing by zero or leaving a function's
+            domain gives an infinity or NaN rather than an error. An index
+            reads ``x[i][j]``, as for a list of lists, and functions taking a
+            whole array, such as ``Sum$``, take a sequence.
+        :raises ValueError: for what :meth:`to_python` raises it for, and with
+            `scalar`, for a function :mod:`math` has no equivalent of.
+
+        .. code-block:: pycon
+
+            >>> import formulate
+            >>> cut = formulate.from_root("Muon.pt > 20 && Muon.charge == -1")
+            >>> list(cut.variables)
+            ['Muon.pt', 'Muon.charge']
+            >>> cut.compile_python()(25.0, -1)
+            True
+            >>> formulate.from_root("1 / x + 7 % 2.5").compile_python(scalar=True)(0.0)
+            inf
+        """
+        from . import _python_ast  # noqa: PLC0415 (it imports this)
+
+        return _python_ast.compile_python(self, scalar)
+
+    def iter_numexpr(self, *, parens: str = "full") -> Iterator[str]:
+        """Render the expression as NumExpr source, a chunk at a time.
+
+        The chunks join to exactly what :meth:`to_numexpr` returns, but the whole
+        string is never held at once. Arguments and errors are those of
+        :meth:`to_numexpr`, except that an error comes after the chunks that
+        precede it.
+        """
+        return self._chunks(_NUMEXPR, parens, _CHUNK_FRAGMENTS)
+
+    def write_numexpr(self, fp: IO[str], *, parens: str = "full") -> None:
+        """Write the expression to the text file `fp` as NumExpr source.
+
+        Writes exactly what :meth:`to_numexpr` returns, a chunk at a time, so
+        that the whole string is never held at once. Arguments and errors are
+        those of :meth:`to_numexpr`; on an error, whatever precedes it has
+        already been written.
+        """
+        self._write_backend(fp, _NUMEXPR, parens)
+
+    def iter_root(self, *, parens: str = "full") -> Iterator[str]:
+        """Render the expression as a ROOT ``TTreeFormula`` string, a chunk at a time.
+
+        The chunks join to exactly what :meth:`to_root` returns, but the whole
+        string is never held at once. Arguments and errors are those of
+        :meth:`to_root`, except that an error comes after the chunks that
+        precede it.
+        """
+        return self._chunks(_ROOT, parens, _CHUNK_FRAGMENTS)
+
+    def write_root(self, fp: IO[str], *, parens: str = "full") -> None:
+        """Write the expression to the text file `fp` as a ROOT ``TTreeFormula`` string.
+
+        Writes exactly what :meth:`to_root` returns, a chunk at a time, so
+        that the whole string is never held at once. Arguments and errors are
+        those of :meth:`to_root`; on an error, whatever precedes it has
+        already been written.
+        """
+        self._write_backend(fp, _ROOT, parens)
+
+    def iter_python(self, *, parens: str = "full") -> Iterator[str]:
+        """Render the expression as plain Python, a chunk at a time.
+
+        The chunks join to exactly what :meth:`to_python` returns, but the whole
+        string is never held at once. Arguments and errors are those of
+        :meth:`to_python`, except that an error comes after the chunks that
+        precede it.
+        """
+        return self._chunks(_PYTHON, parens, _CHUNK_FRAGMENTS)
+
+    def write_python(self, fp: IO[str], *, parens: str = "full") -> None:
+        """Write the expression to the text file `fp` as plain Python.
+
+        Writes exactly what :meth:`to_python` returns, a chunk at a time, so
+        that the whole string is never held at once. Arguments and errors are
+        those of :meth:`to_python`; on an error, whatever precedes it has
+        already been written.
+        """
+        self._write_backend(fp, _PYTHON, parens)
+
+    def render(
+        self,
+        backends: Iterable[str] = tuple(_BACKENDS),
+        *,
+        parens: str = "full",
+    ) -> dict[str, str | ValueError]:
+        """Render the expression for several backends in one walk of the tree.
+
+        Gives the same strings as calling :meth:`to_root`, :meth:`to_numexpr`
+        and :meth:`to_python` one after another, for a single traversal. A
+        backend that has no equivalent for part of the expression gets the
+        ``ValueError`` its ``to_*`` method would have raised, in place of its
+        string, and the others are rendered regardless.
+
+        :param backends: which of ``"root"``, ``"numexpr"`` and ``"python"`` to
+            render, by default all three.
+        :param parens: as for the ``to_*`` methods, and applies to every
+            backend.
+        :return: each backend's string, or its error, by name.
+        :raises ValueError: for an unknown backend or `parens`, before
+            anything is rendered.
+
+        .. code-block:: pycon
+
+            >>> import formulate
+            >>> rendered = formulate.from_root("x[0] > 1").render()
+            >>> rendered["root"], rendered["python"]
+            ('(x[0] > 1)', '(x[0] > 1)')
+            >>> rendered["numexpr"]
+            ValueError('Matrix operations are forbidden in NumExpr.')
+        """
+        names = list(dict.fromkeys(backends))
+        for name in names:
+            if name not in _BACKENDS:
+                msg = (
+                    f"Unknown backend {name!r}; expected one of {', '.join(_BACKENDS)}"
+                )
+                raise ValueError(msg)
+        minimal = _is_minimal(parens)
+        chosen = [_BACKENDS[name] for name in names]
+        results = emit_each(
+            [_operand(self, _SEPARATOR, backend, minimal) for backend in chosen],
+            [_serializer(backend, minimal) for backend in chosen],
+            (ValueError,),
+            _shared(self),
+        )
+        return dict(zip(names, cast(list[str | ValueError], results), strict=True))
+
+    def evaluate(
+        self,
+        arrays: Mapping[str, Any],
+        *,
+        chunk_size: int | None = None,
+        engine: str = "numpy",
+        threads: int | None = None,
+        short_circuit: bool = False,
+        strategies: "list[ShortCircuit] | None" = None,
+    ) -> Any:
+        """Compute the expression over NumPy arrays.
+
+        The result is what ``eval`` of :meth:`to_python` gives with ``np`` and
+        `arrays` in scope, but the tree is walked directly, with no source
+        written or parsed, and the temporary arrays an operator makes are
+        reused by the operators after it wherever their dtype allows. An
+        expression with a top-level ``:`` (``,`` in Python) gives a tuple.
+        Needs NumPy, and NumExpr for that engine, which formulate does not
+        otherwise depend on.
+
+        :param arrays: the value of each variable, by name: arrays, or anything
+            NumPy accepts in their place.
+        :param chunk_size: compute this many rows at a time, writing each into
+            the result, so that temporaries only ever take a chunk's worth of
+            memory. The arrays must all be the same length, and the expression
+            must compute each row from the same row of its inputs: indexing
+            and the reductions are refused.
+        :param engine: ``"numpy"``, the default, or ``"numexpr"``, which
+            computes what :meth:`to_numexpr` writes with NumExpr. The program
+            NumExpr compiles is kept, for each expression and set of input
+            types, so only the first call renders and compiles it; every chunk
+            and every later call runs it directly. Dotted names are passed as
+            they are written, whatever NumExpr calls them.
+        :param threads: how many threads NumExpr may use for this call. It is
+            a setting for the whole process, restored afterwards.
+        :param short_circuit: compute the right operand of each ``&&`` and
+            ``||`` only for the rows its left operand leaves undecided, as C++
+            would, by taking those rows of its inputs, wherever the work that
+            saves outweighs taking them. The result is the same, but a cheap
+            cut in front of an expensive one saves most of the latter's work,
+            and its warnings for rows already rejected. Only for the
+            ``"numpy"`` engine.
+        :param strategies: a list to append a
+            :class:`~formulate._evaluate.ShortCircuit` to for each ``&&`` and
+            ``||`` computed with `short_circuit`, in the order they finished,
+            saying how many rows its left operand left undecided and whether
+            the right one was computed for those rows (``"compact"``) or for
+            all of them (``"dense"``).
+        :raises KeyError: for a variable missing from `arrays`.
+        :raises ValueError: for what the engine's ``to_*`` method has no
+            equivalent for, an expression or arrays that cannot be chunked, an
+            unknown `engine`, or an option it does not take.
+
+        .. code-block:: pycon
+
+            >>> import numpy as np
+            >>> import formulate
+            >>> expr = formulate.from_root("TMath::Sqrt(x**2 + y**2) > 5")
+            >>> expr.evaluate({"x": np.array([3.0, 4.0]), "y": np.array([4.0, 4.0])})
+            array([False,  True])
+        """
+        from . import _evaluate  # noqa: PLC0415 (NumPy is optional)
+
+        return _evaluate.evaluate(
+            self, arrays, chunk_size, engine, threads, short_circuit, strategies
+        )
+
+    def fingerprint(self) -> str:
+        """A digest of the expression, as a 32-character hexadecimal string.
+
+        Two expressions have the same fingerprint exactly when they have the
+        same ``str()``, whichever language they were parsed from, so it can
+        stand in for that string as a cache key or to find duplicates, at a
+        fixed size. It is a keyed BLAKE2 hash of the canonical tree, the same in
+        every process and on every platform, and only changes when canonical
+        names do, which makes it safe to store. It is computed from the leaves
+        up and remembered, so a second call costs nothing more, and one on an
+        expression containing this one only hashes what is around it.
+
+        .. code-block:: pycon
+
+            >>> import formulate
+            >>> a = formulate.from_root("TMath::Sqrt(x) && y")
+            >>> b = formulate.from_numexpr("sqrt(x) & y")
+            >>> a.fingerprint() == b.fingerprint()
+            True
+            >>> len(a.fingerprint())
+            32
+        """
+        kept = _kept(self)
+        if kept.fingerprint is None:
+            kept.fingerprint = fold(self, _fingerprint)
+        return kept.fingerprint.hex()
+
+    def _summarized(self) -> "_Summary":
+        """What the properties below report, found in one walk the first time
+        any of them is asked for, and kept."""
+        kept = _KEPT.get(id(self))
+        if kept is not None and kept.summary is not None:
+            return kept.summary
+        variables: dict[str, None] = {}
+        named_constants: dict[str, None] = {}
+        unnamed_constants: dict[int | float, None] = {}
+        count = 0
+        depth = level = 1
+        # The same order as `_walk`, parents first and left to right. Beneath
+        # a node's children goes a None, which marks climbing back out of them.
+        stack: list[AST | None] = [self]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                level -= 1
+                continue
+            count += 1
+            if isinstance(node, Symbol):
+                names = named_constants if node.name in CONSTANTS else variables
+                names[node.name] = None
+            elif isinstance(node, Literal):
+                unnamed_constants[node.value] = None
+            elif children := node._children():
+                stack.append(None)
+                stack.extend(reversed(children))
+                level += 1
+                if level > depth:
+                    depth = level
+        summary = _Summary(
+            variables.keys(),
+            named_constants.keys(),
+            unnamed_constants.keys(),
+            count,
+            depth,
+        )
+        _kept(self).summary = summary
+        return summary
 
     @property
-    def variables(self) -> OrderedSet[str]:
+    def variables(self) -> KeysView[str]:
         """The names the expression reads, in order of first appearance.
 
         Named constants are excluded; see :attr:`named_constants`. For a
         ``TTree`` expression this is the set of branches that have to be read.
 
+        Like the other properties here, this is a read-only view that supports
+        ``in`` and the set operators, and costs nothing after the first time any
+        of them is asked for.
+
         .. code-block:: pycon
 
             >>> import formulate
             >>> list(formulate.from_root("x + TMath::Pi() * y").variables)
             ['x', 'y']
         """
-        return OrderedSet(
-            node.name
-            for node in self._walk()
-            if isinstance(node, Symbol) and node.name not in CONSTANTS
-        )
+        return self._summarized().variables
 
     @property
-    def named_constants(self) -> OrderedSet[str]:
+    def named_constants(self) -> KeysView[str]:
         """The constants the expression names, in order of first appearance.
 
         Names are canonical rather than as written, so both ``TMath::E()`` and
@@ -278,14 +939,10 @@ class AST(metaclass=ABCMeta):
             >>> list(formulate.from_root("x + TMath::Pi() * y").named_constants)
             ['pi']
         """
-        return OrderedSet(
-            node.name
-            for node in self._walk()
-            if isinstance(node, Symbol) and node.name in CONSTANTS
-        )
+        return self._summarized().named_constants
 
     @property
-    def unnamed_constants(self) -> OrderedSet[int | float]:
+    def unnamed_constants(self) -> KeysView[int | float]:
         """The numeric literals in the expression, in order of first appearance.
 
         .. code-block:: pycon
@@ -294,9 +951,40 @@ class AST(metaclass=ABCMeta):
             >>> list(formulate.from_root("2 * x + 1.5").unnamed_constants)
             [2, 1.5]
         """
-        return OrderedSet(
-            node.value for node in self._walk() if isinstance(node, Literal)
-        )
+        return self._summarized().unnamed_constants
+
+    @property
+    def node_count(self) -> int:
+        """The number of nodes in the tree, counting a subtree shared by
+        ``intern=True`` once for every place it appears.
+
+        .. code-block:: pycon
+
+            >>> import formulate
+            >>> formulate.from_root("2 * x + 1.5").node_count
+            5
+        """
+        return self._summarized().node_count
+
+    @property
+    def depth(self) -> int:
+        """The number of nodes on the longest path from the root to a leaf.
+
+        .. code-block:: pycon
+
+            >>> import formulate
+            >>> formulate.from_root("2 * x + 1.5").depth
+            3
+        """
+        return self._summarized().depth
+
+
+class _Summary(NamedTuple):
+    variables: KeysView[str]
+    named_constants: KeysView[str]
+    unnamed_constants: KeysView[int | float]
+    node_count: int
+    depth: int
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -308,12 +996,14 @@ class Literal(AST):
     def _children(self) -> Sequence[AST]:
         return ()
 
-    def _format(self, *_parts: str) -> str:
-        return str(self.value)
+    def _format(self) -> Sequence[str | AST]:
+        return (str(self.value),)
 
-    def _serializer(self, _backend: _Backend) -> Callable[..., str]:
-        text = repr(self.value)
-        return lambda: text
+    def _level(self, _backend: _Backend) -> int:
+        return _ATOM
+
+    def _serialize(self, _backend: _Backend, _minimal: bool) -> Sequence[str | AST]:
+        return (repr(self.value),)
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -330,25 +1020,23 @@ class Symbol(AST):
     def _children(self) -> Sequence[AST]:
         return ()
 
-    def _format(self, *_parts: str) -> str:
-        return self.name
+    def _format(self) -> Sequence[str | AST]:
+        return (self.name,)
+
+    def _level(self, _backend: _Backend) -> int:
+        return _ATOM
 
-    def _serializer(self, backend: _Backend) -> Callable[..., str]:
-        text = self.name
-        if self.name in CONSTANTS:
-            const = backend.constants.get(self.name)
-            if const is None:
-                msg = f'Constant "{self.name}" is not supported in {backend.name}.'
+    def _serialize(self, backend: _Backend, _minimal: bool) -> Sequence[str | AST]:
+        name = self.name
+        if name in CONSTANTS:
+            text = backend.constant_spellings.get(name)
+            if text is None:
+                msg = f'Constant "{name}" is not supported in {backend.name}.'
                 raise ValueError(msg)
-            text = str(const)
-            if isinstance(const, (bool, int, float)) and const < 0:
-                # A bare negative number is not an atom: ** binds tighter than
-                # unary minus, so the sign would escape the exponent and
-                # ``eminus ** 2`` would come out negative.
-                text = f"({text})"
-        elif backend.encode_invalid_names and "." in self.name:
-            text = _encode_name(self.name)
-        return lambda: text
+            return (text,)
+        if backend.encode_invalid_names and "." in name:
+            return (_encode_name(name),)
+        return (name,)
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -366,18 +1054,21 @@ class UnaryOperator(AST):
     def _children(self) -> Sequence[AST]:
         return (self.operand,)
 
-    def _format(self, *parts: str) -> str:
-        return f"{self.operator}({parts[0]})"
+    def _format(self) -> Sequence[str | AST]:
+        return (f"{self.operator}(", self.operand, ")")
 
-    def _serializer(self, backend: _Backend) -> Callable[..., str]:
-        if (function := backend.unary_functions.get(self.operator)) is not None:
-            name = f"{backend.function_prefix}{function}"
-            return lambda operand: f"{name}({operand})"
-        symbol = backend.operator_symbols.get(self.operator)
-        if symbol is None:
+    def _level(self, backend: _Backend) -> int:
+        # An operator the backend lacks raises once it is serialized.
+        spelling = backend.unary.get(self.operator)
+        return _ATOM if spelling is None else spelling[3]
+
+    def _serialize(self, backend: _Backend, minimal: bool) -> Sequence[str | AST]:
+        spelling = backend.unary.get(self.operator)
+        if spelling is None:
             msg = f'Operator "{self.operator}" is not supported in {backend.name}.'
             raise ValueError(msg)
-        return lambda operand: f"({symbol}{operand})"
+        opening, closing, binding, _ = spelling
+        return (opening, *_operand(self.operand, binding, backend, minimal), *closing)
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -396,20 +1087,19 @@ class BinaryOperator(AST):
     def _children(self) -> Sequence[AST]:
         return (self.left, self.right)
 
-    def _format(self, *parts: str) -> str:
-        return f"{self.operator}({parts[0]}, {parts[1]})"
+    def _format(self) -> Sequence[str | AST]:
+        return (f"{self.operator}(", self.left, ", ", self.right, ")")
+
+    def _level(self, backend: _Backend) -> int:
+        # An operator the backend lacks raises once it is serialized.
+        return backend.precedence.get(self.operator, _ATOM)
 
-    def _serializer(self, backend: _Backend) -> Callable[..., str]:
-        symbol = backend.operator_symbols.get(self.operator)
-        if symbol is None:
+    def _serialize(self, backend: _Backend, minimal: bool) -> Sequence[str | AST]:
+        spelling = backend.binary.get(self.operator)
+        if spelling is None:
             msg = f'Operator "{self.operator}" is not supported in {backend.name}.'
             raise ValueError(msg)
-        # A comma is punctuation rather than an operator: it hugs the operand on
-        # its left, so it renders as ``x, y`` and not as ``x , y``.
-        separator = f"{symbol} " if symbol == "," else f" {symbol} "
-        if symbol in backend.unparenthesized_ops:
-            return lambda left, right: f"{left}{separator}{right}"
-        return lambda left, right: f"({left}{separator}{right})"
+        return _binary(self.left, self.right, spelling, backend, minimal)
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -427,22 +1117,26 @@ class Matrix(AST):
     def _children(self) -> Sequence[AST]:
         return (self.var, *self.indices)
 
-    def _format(self, *parts: str) -> str:
-        var_str, *indices = parts
-        return f"{var_str}[{', '.join(indices)}]"
+    def _format(self) -> Sequence[str | AST]:
+        indices = _separated([(index,) for index in self.indices], ", ")
+        return (self.var, "[", *indices, "]")
 
-    def _serializer(self, backend: _Backend) -> Callable[..., str]:
+    def _level(self, _backend: _Backend) -> int:
+        return _ATOM
+
+    def _serialize(self, backend: _Backend, minimal: bool) -> Sequence[str | AST]:
         if backend.index_format is None:
             msg = f"Matrix operations are forbidden in {backend.name}."
             raise ValueError(msg)
-        root_style = backend.index_format == "root"
-
-        def build(var_str: str, *indices: str) -> str:
-            if root_style:
-                return var_str + "".join(f"[{elem}]" for elem in indices)
-            return var_str + "[" + ", ".join(indices) + "]"
-
-        return build
+        separator = "][" if backend.index_format == "root" else ", "
+        indices = _separated(
+            [
+                _operand(index, backend.index_binding, backend, minimal)
+                for index in self.indices
+            ],
+            separator,
+        )
+        return (*_operand(self.var, _ATOM, backend, minimal), "[", *indices, "]")
 
 
 @dataclass(frozen=True, slots=True, eq=False)
@@ -460,10 +1154,14 @@ class Call(AST):
     def _children(self) -> Sequence[AST]:
         return self.arguments
 
-    def _format(self, *parts: str) -> str:
-        return f"{self.function}({', '.join(parts)})"
+    def _format(self) -> Sequence[str | AST]:
+        arguments = _separated([(argument,) for argument in self.arguments], ", ")
+        return (f"{self.function}(", *arguments, ")")
 
-    def _serializer(self, backend: _Backend) -> Callable[..., str]:
+    def _level(self, backend: _Backend) -> int:
+        return _POWER if backend.pow_as_operator and self.function == "pow" else _ATOM
+
+    def _serialize(self, backend: _Backend, minimal: bool) -> Sequence[str | AST]:
         if backend.pow_as_operator and self.function == "pow":
             # The backend has no pow() to fall back on: it is spelled as the
             # binary ** operator, so any other arity has nothing to render to.
@@ -474,11 +1172,18 @@ class Call(AST):
                     f"{len(self.arguments)}."
                 )
                 raise ValueError(msg)
-            return lambda base, exponent: f"({base} ** {exponent})"
-        function_str = backend.functions.get(self.function)
-        if function_str is None:
+            base, exponent = self.arguments
+            return _binary(base, exponent, backend.binary["pow"], backend, minimal)
+        opening = backend.calls.get(self.function)
+        if opening is None:
             display = FUNCTION_DISPLAY_NAMES.get(self.function, self.function)
             msg = f'Function "{display}" is not supported in {backend.name}.'
             raise ValueError(msg)
-        name = f"{backend.function_prefix}{function_str}"
-        return lambda *args: f"{name}({', '.join(args)})"
+        arguments = _separated(
+            [
+                _operand(argument, _EXPRESSION, backend, minimal)
+                for argument in self.arguments
+            ],
+            ", ",
+        )
+        return (opening, *arguments, ")")
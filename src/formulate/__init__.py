@@ -19,31 +19,134 @@ The parsed expression also reports what it refers to, through
 """
 
 import functools
-import importlib.resources
-from typing import Literal
+import importlib
+from collections.abc import Callable, Iterable, Iterator
+from typing import TYPE_CHECKING, Any, Literal, cast
 
-import lark
-
-from . import AST, exceptions, toast
 from ._version import __version__
-from .exceptions import ParseError
+
+if TYPE_CHECKING:  # pragma: no cover
+    import os
+
+    import lark
+
+    from . import AST, _cache, _intern, _translate, toast
+    from .exceptions import ParseError
 
 # Ordered by prominence rather than alphabetically: the two parsing functions
 # are the entry points, and everything else is reached through what they return.
-__all__ = ["from_numexpr", "from_root", "ParseError", "__version__"]  # noqa: RUF022
+__all__ = [  # noqa: RUF022
+    "from_numexpr",
+    "from_root",
+    "from_numexpr_many",
+    "from_root_many",
+    "translate_many",
+    "translation_cache_prune",
+    "ParseError",
+    "cache_info",
+    "cache_clear",
+    "cache_configure",
+    "intern_info",
+    "intern_clear",
+    "intern_configure",
+    "__version__",
+]
+
+# Nothing is imported until it is first used. A job that translates a handful of
+# expressions spends longer importing than translating, so `import formulate`
+# has to cost next to nothing: the parsers are loaded by the first parse, and
+# lark itself only once an expression fails to parse, or a generated parser has
+# to be replaced by compiling the grammar.
+# pylint: disable=import-outside-toplevel
+_SUBMODULES = frozenset({"AST", "cli", "compact", "exceptions", "identifiers", "toast"})
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name == "ParseError":
+        from .exceptions import ParseError
+
+        return ParseError
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_SUBMODULES, "ParseError"})
+
+
+def _read_grammar(parser_type: Literal["root", "numexpr"]) -> str:
+    # Through the package's loader rather than importlib.resources, which costs
+    # more to import than a generated parser does to load.
+    data: bytes = __spec__.loader.get_data(  # type: ignore[union-attr]
+        f"{__path__[0]}/resources/{parser_type}_grammar.lark"
+    )
+    return data.decode()
+
+
+def _lark_error() -> "type[lark.LarkError]":
+    # Only called once an `except` clause is being matched, by which point the
+    # failure has been reported by lark, and lark is loaded anyway.
+    import lark
+
+    return lark.LarkError
 
 
 @functools.cache
-def _get_parser(parser_type: Literal["root", "numexpr"]) -> lark.Lark:
-    grammar = (
-        importlib.resources.files(__package__)
-        / "resources"
-        / f"{parser_type}_grammar.lark"
-    ).read_text()
-    return lark.Lark(grammar, parser="lalr")
+def _get_lark_parser(
+    parser_type: Literal["root", "numexpr"], reduce: bool
+) -> "toast.Parser":
+    from . import _tables, toast
 
+    parser = _tables.load_parser(
+        parser_type,
+        _read_grammar(parser_type),
+        transformer=toast.Reducer() if reduce else None,
+        tree_class=toast.ParseTree,
+    )
+    # Built with tree_class=ParseTree, which lark's annotations cannot see.
+    return cast(toast.Parser, parser)
 
-def from_root(exp: str) -> AST.AST:
+
+@functools.cache
+def _get_parser(
+    parser_type: Literal["root", "numexpr"], reduce: bool
+) -> "toast.Parser":
+    from . import _standalone, toast
+
+    # The generated parser where there is one that matches the grammar, and
+    # the grammar compiled by lark otherwise. Both give identical trees and
+    # raise lark's own errors, so nothing downstream can tell which it got.
+    # With `reduce`, they build the AST through a `toast.Reducer` instead.
+    standalone = _standalone.load(
+        parser_type,
+        _read_grammar(parser_type),
+        functools.partial(_get_lark_parser, parser_type, reduce),
+        transformer=toast.Reducer() if reduce else None,
+        tree_class=toast.ParseTree,
+    )
+    if standalone is None:
+        return _get_lark_parser(parser_type, reduce)
+    return standalone
+
+
+_ENGINES = ("lark", "reduce", "fast")
+
+
+def _check_engine(engine: str) -> None:
+    if engine not in _ENGINES:
+        msg = f"Unknown engine {engine!r}; expected one of {', '.join(_ENGINES)}"
+        raise ValueError(msg)
+
+
+def from_root(
+    exp: str,
+    *,
+    engine: Literal["lark", "reduce", "fast"] = "lark",
+    cache: bool = True,
+    intern: bool = False,
+) -> "AST.AST":
     """Parse a ROOT ``TTreeFormula`` expression.
 
     The expression is parsed with C++ precedence, so ``&&`` and ``||`` bind
@@ -51,6 +154,20 @@ def from_root(exp: str) -> AST.AST:
     ``!`` is logical NOT.
 
     :param exp: the expression to parse.
+    :param engine: how to parse it. ``"lark"``, the default, runs the parser
+        generated from the grammar, which is the reference, and converts the
+        parse tree it builds. ``"reduce"`` runs the same parser but builds the
+        AST as it goes, without a parse tree. ``"fast"`` runs a hand-written
+        operator-precedence parser that builds the AST directly, in a fraction
+        of the time; it hands anything it does not accept, errors included,
+        back to lark. All three give the same result.
+    :param cache: whether to look `exp` up in, and add it to, the cache of
+        parsed expressions; see :func:`cache_info`. A cached expression is
+        returned as it is, whichever engine is asked for, since every engine
+        gives the same result.
+    :param intern: whether to share subtrees with every other expression parsed
+        this way that is still in use, and within this one; see
+        :func:`intern_info`.
     :returns: the parsed expression, ready to be rendered to any backend.
     :raises ParseError: if `exp` is not valid ROOT syntax. The message points
         at the offending location and suggests fixes for the mistakes people
@@ -58,7 +175,7 @@ def from_root(exp: str) -> AST.AST:
     :raises SyntaxError: if `exp` parses but names something that cannot be a
         symbol, or passes arguments to a constant.
     :raises ValueError: if `exp` uses an unknown function, constant, or
-        namespace.
+        namespace, or `engine` is not one of the above.
 
     .. code-block:: pycon
 
@@ -66,15 +183,68 @@ def from_root(exp: str) -> AST.AST:
         >>> formulate.from_root("TMath::Abs(x) < 2.5").to_numexpr()
         '(abs(x) < 2.5)'
     """
+    _check_engine(engine)
+    return _parse_with(
+        "root", exp, functools.partial(_parse_root, engine=engine), cache, intern
+    )
+
+
+def _parse_with(
+    language: str,
+    exp: str,
+    parse: Callable[[str], "AST.AST"],
+    cache: bool,
+    intern: bool,
+) -> "AST.AST":
+    if intern:
+        from . import _intern
+
+        # Interned before it is cached, so that the next lookup finds a tree
+        # that comes back out of the pool in one step.
+        parse = _interning(parse, _intern.POOL)
+    if not cache:
+        return parse(exp)
+    from . import _cache
+
+    node = _cache.PARSED.lookup(language, exp, parse)
+    # One cached by a parse without `intern` is interned on the way out.
+    return _intern.POOL.intern(node) if intern else node
+
+
+def _interning(
+    parse: Callable[[str], "AST.AST"], pool: "_intern.InternPool"
+) -> Callable[[str], "AST.AST"]:
+    return lambda exp: pool.intern(parse(exp))
+
+
+def _parse_root(exp: str, engine: str) -> "AST.AST":
+    if engine == "fast":
+        from . import _pratt
+
+        node = _pratt.parse_root(exp)
+        if node is not None:
+            return node
+
+    from . import exceptions, toast
+
+    reduce = engine == "reduce"
     try:
-        ptree = _get_parser("root").parse(exp)
-    except lark.LarkError as e:
+        result = _get_parser("root", reduce).parse(exp)
+    except _lark_error() as e:
         new_e = exceptions.debug_root(exp, e)
         raise new_e from e
-    return toast.toast(ptree)
+    if reduce:
+        return toast.finish(result)
+    return toast.toast(result)
 
 
-def from_numexpr(exp: str) -> AST.AST:
+def from_numexpr(
+    exp: str,
+    *,
+    engine: Literal["lark", "reduce", "fast"] = "lark",
+    cache: bool = True,
+    intern: bool = False,
+) -> "AST.AST":
     """Parse a NumExpr expression.
 
     The expression is parsed with Python precedence, so ``&`` and ``|`` bind
@@ -83,6 +253,20 @@ def from_numexpr(exp: str) -> AST.AST:
     support them.
 
     :param exp: the expression to parse.
+    :param engine: how to parse it. ``"lark"``, the default, runs the parser
+        generated from the grammar, which is the reference, and converts the
+        parse tree it builds. ``"reduce"`` runs the same parser but builds the
+        AST as it goes, without a parse tree. ``"fast"`` runs a hand-written
+        operator-precedence parser that builds the AST directly, in a fraction
+        of the time; it hands anything it does not accept, errors included,
+        back to lark. All three give the same result.
+    :param cache: whether to look `exp` up in, and add it to, the cache of
+        parsed expressions; see :func:`cache_info`. A cached expression is
+        returned as it is, whichever engine is asked for, since every engine
+        gives the same result.
+    :param intern: whether to share subtrees with every other expression parsed
+        this way that is still in use, and within this one; see
+        :func:`intern_info`.
     :returns: the parsed expression, ready to be rendered to any backend.
     :raises ParseError: if `exp` is not valid NumExpr syntax. The message
         points at the offending location and suggests fixes for the mistakes
@@ -90,7 +274,8 @@ def from_numexpr(exp: str) -> AST.AST:
         ``&``.
     :raises SyntaxError: if `exp` parses but names something that cannot be a
         symbol, or passes arguments to a constant.
-    :raises ValueError: if `exp` uses an unknown function or constant.
+    :raises ValueError: if `exp` uses an unknown function or constant, or
+        `engine` is not one of the above.
 
     .. code-block:: pycon
 
@@ -98,9 +283,283 @@ def from_numexpr(exp: str) -> AST.AST:
         >>> formulate.from_numexpr("abs(x) < 2.5").to_root()
         '(TMath::Abs(x) < 2.5)'
     """
+    _check_engine(engine)
+    return _parse_with(
+        "numexpr", exp, functools.partial(_parse_numexpr, engine=engine), cache, intern
+    )
+
+
+def _parse_numexpr(exp: str, engine: str) -> "AST.AST":
+    if engine == "fast":
+        from . import _pratt
+
+        node = _pratt.parse_numexpr(exp)
+        if node is not None:
+            return node
+
+    from . import exceptions, toast
+
+    reduce = engine == "reduce"
     try:
-        ptree = _get_parser("numexpr").parse(exp)
-    except lark.LarkError as e:
+        result = _get_parser("numexpr", reduce).parse(exp)
+    except _lark_error() as e:
         new_e = exceptions.debug_numexpr(exp, e)
         raise new_e from e
-    return toast.toast(ptree)
+    if reduce:
+        return toast.finish(result)
+    return toast.toast(result)
+
+
+def _check_jobs(jobs: int | None) -> None:
+    if jobs is not None and jobs < 1:
+        msg = f"jobs must be at least 1, or None for one per CPU, not {jobs!r}"
+        raise ValueError(msg)
+
+
+def from_root_many(
+    expressions: Iterable[str],
+    *,
+    engine: Literal["lark", "reduce", "fast"] = "lark",
+    jobs: int | None = 1,
+) -> Iterator["AST.AST | Exception"]:
+    """Parse many ROOT expressions, in order.
+
+    Each distinct expression is parsed once, however often it occurs, and a
+    failure does not stop the batch: the exception :func:`from_root` would
+    have raised is yielded in place of that expression's AST.
+
+    :param expressions: the expressions to parse. They are read lazily, a block
+        at a time, so this can be a generator over a large file.
+    :param engine: how to parse them; see :func:`from_root`.
+    :param jobs: the number of worker processes to parse in, or None for one
+        per CPU. The default, 1, parses in this process. Each worker loads its
+        parser as it starts, and results are yielded in input order whatever
+        order they finish in.
+    :returns: an iterator over the AST of each expression, or the
+        :class:`ParseError`, ``SyntaxError`` or ``ValueError`` it raised.
+    :raises ValueError: if `engine` is unknown or `jobs` is less than 1.
+
+    .. code-block:: pycon
+
+        >>> import formulate
+        >>> results = list(formulate.from_root_many(["a && b", "a &", "a && b"]))
+        >>> results[0] is results[2], type(results[1]).__name__
+        (True, 'ParseError')
+    """
+    _check_engine(engine)
+    _check_jobs(jobs)
+    from . import _batch
+
+    return _batch.parse_many("root", expressions, engine, jobs)
+
+
+def from_numexpr_many(
+    expressions: Iterable[str],
+    *,
+    engine: Literal["lark", "reduce", "fast"] = "lark",
+    jobs: int | None = 1,
+) -> Iterator["AST.AST | Exception"]:
+    """Parse many NumExpr expressions, in order.
+
+    Each distinct expression is parsed once, however often it occurs, and a
+    failure does not stop the batch: the exception :func:`from_numexpr` would
+    have raised is yielded in place of that expression's AST.
+
+    :param expressions: the expressions to parse. They are read lazily, a block
+        at a time, so this can be a generator over a large file.
+    :param engine: how to parse them; see :func:`from_numexpr`.
+    :param jobs: the number of worker processes to parse in, or None for one
+        per CPU. The default, 1, parses in this process. Each worker loads its
+        parser as it starts, and results are yielded in input order whatever
+        order they finish in.
+    :returns: an iterator over the AST of each expression, or the
+        :class:`ParseError`, ``SyntaxError`` or ``ValueError`` it raised.
+    :raises ValueError: if `engine` is unknown or `jobs` is less than 1.
+    """
+    _check_engine(engine)
+    _check_jobs(jobs)
+    from . import _batch
+
+    return _batch.parse_many("numexpr", expressions, engine, jobs)
+
+
+def translate_many(
+    expressions: Iterable[str],
+    *,
+    source: Literal["root", "numexpr"],
+    target: Literal["root", "numexpr", "python"],
+    engine: Literal["lark", "reduce", "fast"] = "lark",
+    jobs: int | None = 1,
+    cache: "str | os.PathLike[str] | None" = None,
+) -> "_translate.Translations":
+    """Convert many expressions from one language to another, in order.
+
+    Like :func:`from_root_many` and :func:`from_numexpr_many`, but yielding
+    each expression rendered in `target` rather than its AST. A failure, to
+    parse or to render, is yielded in place of the string.
+
+    :param expressions: the expressions to convert, read lazily.
+    :param source: the language they are written in.
+    :param target: the language to render them in.
+    :param engine: how to parse them; see :func:`from_root`.
+    :param jobs: the number of worker processes to parse in, or None for one
+        per CPU. The default, 1, parses in this process.
+    :param cache: the path of an sqlite database in which to keep each
+        translation, or each failure, between runs, or None, the default, for
+        no cache. Expressions found in it are not parsed at all. It is created
+        if it does not exist, and entries written by another formulate version
+        are kept for that version but never read; see
+        :func:`translation_cache_prune`. A :class:`ParseError` read back from
+        it has no ``lark_error``.
+    :returns: an iterator over the translation of each expression, or the
+        :class:`ParseError`, ``SyntaxError`` or ``ValueError`` it raised. Its
+        ``hits`` and ``lookups`` say how many of the distinct expressions looked
+        up so far were found in `cache`.
+    :raises ValueError: if `source`, `target` or `engine` is unknown, or
+        `jobs` is less than 1.
+
+    .. code-block:: pycon
+
+        >>> import formulate
+        >>> list(formulate.translate_many(["a && b"], source="root", target="numexpr"))
+        ['(a & b)']
+    """
+    if source not in ("root", "numexpr"):
+        msg = f"Unknown source {source!r}; expected 'root' or 'numexpr'"
+        raise ValueError(msg)
+    if target not in ("root", "numexpr", "python"):
+        msg = f"Unknown target {target!r}; expected 'root', 'numexpr' or 'python'"
+        raise ValueError(msg)
+    _check_engine(engine)
+    _check_jobs(jobs)
+    from . import _translate
+
+    return _translate.Translations(source, target, expressions, engine, jobs, cache)
+
+
+def translation_cache_prune(path: "str | os.PathLike[str]") -> int:
+    """Drop the translations another formulate version, or another grammar,
+    wrote to the cache at `path`.
+
+    :func:`translate_many` only reads the entries the installed version wrote,
+    but keeps the rest, so that going back and forth between two versions does
+    not start either afresh. A cache used across many upgrades grows with each
+    one until it is pruned.
+
+    :param path: the sqlite database given to :func:`translate_many` as
+        ``cache``. It is created if it does not exist.
+    :returns: the number of entries dropped.
+    """
+    from . import _translate
+
+    return _translate.prune(path)
+
+
+def cache_info() -> "_cache.CacheInfo":
+    """Statistics for the cache of parsed expressions.
+
+    :func:`from_root` and :func:`from_numexpr` keep the expressions they have
+    parsed most recently, keyed on the language and on the source with each
+    run of whitespace collapsed to a single space, and return the same AST
+    object again when one comes up a second time. ASTs are immutable, so the
+    same object can safely be shared between callers and between threads.
+    Failed parses are not cached.
+
+    :returns: a named tuple of ``hits``, ``misses``, ``maxsize``,
+        ``currsize``, ``maxbytes`` and ``currbytes``, in the spirit of
+        :func:`functools.lru_cache`.
+
+    .. code-block:: pycon
+
+        >>> import formulate
+        >>> formulate.cache_clear()
+        >>> _ = formulate.from_root("a && b"), formulate.from_root("a  &&  b")
+        >>> info = formulate.cache_info()
+        >>> info.hits, info.misses, info.currsize
+        (1, 1, 1)
+    """
+    from . import _cache
+
+    return _cache.PARSED.info()
+
+
+def cache_clear() -> None:
+    """Empty the cache of parsed expressions, and reset its statistics."""
+    from . import _cache
+
+    _cache.PARSED.clear()
+
+
+def cache_configure(*, maxsize: int | None, maxbytes: int | None = None) -> None:
+    """Bound the cache of parsed expressions.
+
+    When either bound is exceeded, the least recently used expressions are
+    evicted until both hold again, including straight away if the new bounds
+    are smaller than what is already cached.
+
+    :param maxsize: the most expressions to keep, or None for no limit. Zero
+        turns the cache off. The default is 1024.
+    :param maxbytes: the most source to keep, in bytes of the normalized
+        expressions, or None, the default, for no limit. An AST grows with the
+        length of its source, so this bounds the memory the cache holds even
+        when a few expressions are very long.
+    :raises ValueError: if either bound is negative.
+    """
+    from . import _cache
+
+    _cache.PARSED.configure(maxsize, maxbytes)
+
+
+def intern_info() -> "_intern.InternInfo":
+    """Statistics for the pool of shared subtrees.
+
+    :func:`from_root` and :func:`from_numexpr` called with ``intern=True`` pass
+    the expression through a pool of the subtrees parsed that way so far,
+    replacing each one the pool holds, in this expression or any other, with
+    the node it already has. Identical subtrees are then a single object,
+    which keeps a library of selections that repeat themselves small, and is
+    rendered once per string however often it occurs. The pool holds its
+    nodes weakly, so a subtree is dropped once no expression uses it.
+
+    :returns: a named tuple of ``hits``, ``misses``, ``maxsize`` and
+        ``currsize``, counted in nodes.
+
+    .. code-block:: pycon
+
+        >>> import formulate
+        >>> formulate.intern_clear()
+        >>> cut = formulate.from_root("sqrt(px**2 + py**2) > 20", intern=True)
+        >>> pt = formulate.from_root("sqrt(px**2 + py**2)", intern=True)
+        >>> pt is cut.left
+        True
+    """
+    from . import _intern
+
+    return _intern.POOL.info()
+
+
+def intern_clear() -> None:
+    """Empty the pool of shared subtrees, and reset its statistics.
+
+    Expressions already parsed keep sharing what they share; only later ones
+    no longer share it with them.
+    """
+    from . import _intern
+
+    _intern.POOL.clear()
+
+
+def intern_configure(*, maxsize: int) -> None:
+    """Bound the pool of shared subtrees.
+
+    Once the pool is full, further subtrees are not added to it, but still
+    share whatever the pool holds already. Nodes are dropped as the expressions
+    that use them are, never to make room.
+
+    :param maxsize: the most nodes to keep. Zero turns interning off. The
+        default is 65536.
+    :raises ValueError: if `maxsize` is negative.
+    """
+    from . import _intern
+
+    _intern.POOL.configure(maxsize)
@@ -0,0 +1,206 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Parsing many expressions at once, optionally over a pool of processes.
+
+A configuration file can hold a hundred thousand selections, most of them
+repeated. Each distinct one is parsed once per batch, and its result handed
+back for every occurrence, so the results stay in input order and one bad
+expression does not lose the rest: it is reported as its exception, in its
+place.
+
+With more than one job the distinct expressions are parsed in worker processes,
+each of which loads its parser once, when it starts, rather than on its first
+expression. Input is read a block at a time, so the batch streams: memory holds
+one block in flight plus one result per distinct expression.
+
+Failures come back from the workers as None, and are parsed again here. That is
+the slow path, but failures are rare and the exception a worker raised could
+not be sent back intact anyway: it holds lark's error, parser state and all. A
+chunk whose results do not come back at all is parsed here again too, and once a
+worker has died, which breaks the pool for good, so is the rest of the batch:
+the pool never changes what a batch returns. An AST itself
+travels flat, however deep it is; see :meth:`formulate.AST.AST.__reduce__`.
+"""
+
+import functools
+import itertools
+import os
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TypeVar
+
+from . import AST, _get_parser, from_numexpr, from_root
+from .exceptions import ParseError
+
+# What a batch reports in place of a result. Anything else is a bug, and
+# propagates.
+_FAILURES = (ParseError, SyntaxError, ValueError)
+
+_T = TypeVar("_T")
+
+# Expressions read from the input before they are parsed.
+BLOCK = 10_000
+
+
+def _parser(language: str, engine: str) -> Callable[[str], AST.AST]:
+    # Batches do their own deduplication; going through the cache as well would
+    # only flush it of what the rest of the program parsed.
+    parse = from_root if language == "root" else from_numexpr
+    return functools.partial(parse, engine=engine, cache=False)  # type: ignore[arg-type]
+
+
+def prewarm(language: str, engine: str) -> None:
+    """Load everything a parse of `language` with `engine` needs: the parser,
+    lark for the errors, and whatever a first successful parse imports."""
+    _get_parser(language, engine == "reduce")
+    _parser(language, engine)("a")
+
+
+def parse_chunk(language: str, engine: str, chunk: list[str]) -> list[AST.AST | None]:
+    """Parse each of `chunk`, with None for those that fail. This is the task a
+    worker is given."""
+    parse = _parser(language, engine)
+    results: list[AST.AST | None] = []
+    for exp in chunk:
+        try:
+            results.append(parse(exp))
+        except _FAILURES:
+            results.append(None)
+    return results
+
+
+def blocks(expressions: Iterable[str], size: int) -> Iterator[list[str]]:
+    """Read `expressions` `size` at a time."""
+    iterator = iter(expressions)
+    while block := list(itertools.islice(iterator, size)):
+        yield block
+
+
+def deduplicated(
+    expressions: Iterable[str],
+    handle: Callable[[list[str]], Iterable[_T]],
+    jobs: int,
+    *,
+    forget: bool = False,
+) -> Iterator[_T]:
+    """Yield a result for each of `expressions`, in order, calling `handle` on
+    each block of distinct expressions that have no result yet.
+
+    :param jobs: how many processes `handle` spreads its work over. With one,
+        expressions are handled one at a time, so each result is yielded as
+        soon as its expression has been read; with more, a block at a time, so
+        that every process gets a share.
+    :param forget: only recognise duplicates within the last block or so,
+        rather than within the whole batch, so that memory stays bounded
+        however many distinct expressions there are. For callers that write
+        each result out and drop it, like the command-line interface.
+    """
+    done: dict[str, _T] = {}
+    for block in blocks(expressions, 1 if jobs == 1 else BLOCK):
+        if forget and len(done) >= BLOCK:
+            done.clear()
+        new = [exp for exp in dict.fromkeys(block) if exp not in done]
+        if new:
+            done.update(zip(new, handle(new), strict=True))
+        yield from (done[exp] for exp in block)
+
+
+class Parser:
+    """Parses lists of expressions, in this process or in a pool of workers.
+
+    A context manager: the pool, if any, is started on entry, with each worker
+    loading its parser as it starts, and shut down on exit.
+
+    :param jobs: the number of worker processes, or 1 to parse in this process.
+    """
+
+    def __init__(self, language: str, engine: str, jobs: int) -> None:
+        self._language = language
+        self._engine = engine
+        self._jobs = jobs
+        self._here = _parser(language, engine)
+        self._pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "Parser":
+        if self._jobs > 1:
+            # Loaded here as well, so that forked workers inherit the parser
+            # instead of each loading their own.
+            prewarm(self._language, self._engine)
+            self._pool = ProcessPoolExecutor(
+                self._jobs, initializer=prewarm, initargs=(self._language, self._engine)
+            )
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _parse_here(self, exp: str) -> AST.AST | Exception:
+        try:
+            return self._here(exp)
+        except _FAILURES as error:
+            return error
+
+    def parse(self, expressions: list[str]) -> list[AST.AST | Exception]:
+        """The AST of each of `expressions`, or the exception it raised."""
+        if self._pool is not None:
+            try:
+                return self._parse_in_pool(self._pool, expressions)
+            # A pool whose worker died takes no more work, so this block and
+            # every one after it are parsed here.
+            except BrokenProcessPool:
+                self._pool.shutdown()
+                self._pool = None
+        return [self._parse_here(exp) for exp in expressions]
+
+    def _parse_in_pool(
+        self, pool: ProcessPoolExecutor, expressions: list[str]
+    ) -> list[AST.AST | Exception]:
+        # One chunk per worker, so that each gets a share.
+        size = -(-len(expressions) // self._jobs)
+        chunks = [expressions[i : i + size] for i in range(0, len(expressions), size)]
+        futures = [
+            pool.submit(parse_chunk, self._language, self._engine, chunk)
+            for chunk in chunks
+        ]
+        parsed: list[AST.AST | Exception] = []
+        broken = False
+        for chunk, future in zip(chunks, futures, strict=True):
+            try:
+                results = future.result()
+            # The results could not be sent back, or the worker died: parse the
+            # chunk here instead, which raises again if it is a bug.
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                broken = broken or isinstance(error, BrokenProcessPool)
+                results = [None] * len(chunk)
+            parsed.extend(
+                self._parse_here(exp) if result is None else result
+                for exp, result in zip(chunk, results, strict=True)
+            )
+        # The rest of the batch is parsed here, as if `submit` had refused it.
+        if broken:
+            self._pool = None
+            pool.shutdown()
+        return parsed
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    """`jobs`, with None meaning one per CPU."""
+    return jobs if jobs is not None else os.cpu_count() or 1
+
+
+def parse_many(
+    language: str,
+    expressions: Iterable[str],
+    engine: str,
+    jobs: int | None,
+) -> Iterator[AST.AST | Exception]:
+    """Parse each of `expressions`, yielding its AST or its exception in order.
+
+    :param jobs: the number of worker processes, None for one per CPU, or 1 to
+        parse in this process.
+    """
+    jobs = resolve_jobs(jobs)
+    with Parser(language, engine, jobs) as parser:
+        yield from deduplicated(expressions, parser.parse, jobs)
@@ -0,0 +1,154 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""The in-process cache of parsed expressions.
+
+Analysis code tends to parse the same few selections over and over -- once per
+file, per chunk, per systematic variation -- and the ASTs it gets back are
+immutable, so the same object can be handed to every caller. This module keeps
+the most recently used ones, keyed on the language and the source text.
+
+The source is normalized before the lookup by collapsing each run of whitespace
+into a single space, so ``"a+b"`` and ``"a + b"`` stay distinct entries but
+``"a + b"`` and ``" a  +\\tb "`` share one. Only the whitespace the grammars
+ignore is collapsed, and always to a space rather than to nothing: the space
+still separates what it separated, so ``"a b"`` remains an error and ``"* *"``
+is not turned into ``"**"``. A miss parses the text it was given rather than
+the normalized one, so error messages still point into what the caller wrote;
+errors themselves are never cached.
+
+The cache is bounded both by a number of entries and, optionally, by the total
+length of the sources it holds. The size of an AST grows with the length of the
+expression it came from, so the second bounds the memory held without walking
+every tree to measure it. Either way the least recently used entries are evicted
+first.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from . import AST
+
+# The whitespace both grammars ignore (lark's common.WS); other Unicode spaces
+# are errors in an expression, so they must not be normalized away.
+_WHITESPACE = re.compile("[ \t\f\r\n]+")
+
+DEFAULT_MAXSIZE = 1024
+
+
+class CacheInfo(NamedTuple):
+    """Statistics for the parse cache, as returned by
+    :func:`formulate.cache_info`."""
+
+    hits: int
+    """Lookups answered from the cache."""
+    misses: int
+    """Lookups that had to parse, including those that failed."""
+    maxsize: int | None
+    """The most entries kept, or None for no limit."""
+    currsize: int
+    """The entries currently kept."""
+    maxbytes: int | None
+    """The most bytes of normalized source kept, or None for no limit."""
+    currbytes: int
+    """The bytes of normalized source currently kept."""
+
+
+def normalize(exp: str) -> str:
+    """The whitespace-normalized form of `exp` that the cache is keyed on."""
+    return _WHITESPACE.sub(" ", exp).strip(" ")
+
+
+class ParseCache:
+    """A thread-safe least-recently-used map from sources to parsed ASTs.
+
+    :param maxsize: the most entries to keep, or None for no limit. Zero turns
+        the cache off.
+    :param maxbytes: the most bytes of normalized source to keep, counted in
+        UTF-8, or None for no limit.
+    """
+
+    def __init__(
+        self, maxsize: int | None = DEFAULT_MAXSIZE, maxbytes: int | None = None
+    ) -> None:
+        # (language, normalized source) -> (AST, bytes of normalized source)
+        self._entries: OrderedDict[tuple[str, str], tuple[AST.AST, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._bytes = 0
+        self._maxsize: int | None = None
+        self._maxbytes: int | None = None
+        self.configure(maxsize, maxbytes)
+
+    def configure(self, maxsize: int | None, maxbytes: int | None) -> None:
+        """Change the bounds, evicting whatever no longer fits."""
+        for name, bound in (("maxsize", maxsize), ("maxbytes", maxbytes)):
+            if bound is not None and bound < 0:
+                msg = f"{name} must be non-negative or None, not {bound!r}"
+                raise ValueError(msg)
+        with self._lock:
+            self._maxsize = maxsize
+            self._maxbytes = maxbytes
+            self._evict()
+
+    def lookup(
+        self, language: str, exp: str, parse: Callable[[str], "AST.AST"]
+    ) -> "AST.AST":
+        """The cached AST for `exp`, or the result of ``parse(exp)``, which is
+        then cached. An exception from `parse` propagates and caches nothing.
+        """
+        key = (language, normalize(exp))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # Parse without the lock held, so that one slow parse does not hold up
+        # every other thread's hits. Two threads missing on the same source at
+        # once both parse it, and the second simply replaces the first's entry.
+        node = parse(exp)
+        size = len(key[1].encode())
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (node, size)
+            self._bytes += size
+            self._evict()
+        return node
+
+    def _evict(self) -> None:
+        while self._entries and (
+            (self._maxsize is not None and len(self._entries) > self._maxsize)
+            or (self._maxbytes is not None and self._bytes > self._maxbytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def info(self) -> CacheInfo:
+        """The hit and miss counts, bounds and current size."""
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._maxsize,
+                len(self._entries),
+                self._maxbytes,
+                self._bytes,
+            )
+
+    def clear(self) -> None:
+        """Drop every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._bytes = 0
+
+
+PARSED = ParseCache()
+"""The cache :func:`formulate.from_root` and :func:`formulate.from_numexpr`
+share."""
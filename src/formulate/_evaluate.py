@@ -0,0 +1,452 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Evaluating an expression over NumPy arrays, without writing it out first.
+
+``eval(expr.to_python(), {"np": numpy, **arrays})`` computes an expression, but
+renders it as Python source only for the interpreter to parse it straight back,
+and leaves a new array behind at every operator.
+:meth:`formulate.AST.AST.evaluate` walks the tree once instead, calling the
+NumPy function that :data:`formulate.identifiers.PYTHON_FUNCTIONS` names for
+each call and the ufunc behind each Python operator, so the result is what that
+source gives, computed the same way.
+
+A large intermediate array that nothing else can see -- one an operator or a
+ufunc made -- is overwritten by the ufunc that consumes it, whenever its dtype
+and shape are already those of the result. A long chain of arithmetic therefore
+needs one or two temporaries, not one per operator.
+
+With `chunk_size`, the rows are computed that many at a time into the output,
+so that besides the inputs and the result, memory holds one chunk's
+temporaries. That only makes sense when each row of the result depends on the
+same row of the inputs, so indexing and the reductions, which read across rows,
+are refused.
+
+With `short_circuit`, ``&&`` and ``||`` are evaluated as C++ evaluates them, a
+row at a time: the right operand is only computed for the rows the left one
+leaves undecided, the rows an ``&&`` keeps or an ``||`` rejects. Those rows'
+indices are taken, the right operand's inputs are compacted to them, and its
+result is written back into the left one's. That costs a few passes over the
+rows, so where it would save less -- the right operand is cheap, or the left
+one decides too few rows -- the right operand is computed over every row as
+before. Each ``&&`` and ``||`` is reported, with which was done, as a
+:class:`ShortCircuit`.
+"""
+
+import contextlib
+import functools
+import operator
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any, NamedTuple
+
+from . import AST
+from ._python_ast import CONSTANT_VALUES
+from ._traversal import fold
+from .identifiers import (
+    FUNCTION_DISPLAY_NAMES,
+    PYTHON_FUNCTIONS,
+    PYTHON_UNARY_FUNCTIONS,
+)
+
+try:
+    import numpy as np
+except ImportError as error:
+    msg = "evaluate() needs NumPy, which can be installed with `pip install numpy`"
+    raise ImportError(msg) from error
+
+# What each Python operator does, and the ufunc it calls on an array, which is
+# what a temporary is reused with. Scalars go through the operator, as they
+# would in Python: 1 / 0 raises rather than giving inf.
+_BINARY = {
+    "add": (operator.add, np.add),
+    "sub": (operator.sub, np.subtract),
+    "mul": (operator.mul, np.multiply),
+    "div": (operator.truediv, np.true_divide),
+    "mod": (operator.mod, np.remainder),
+    "pow": (operator.pow, np.power),
+    "lt": (operator.lt, np.less),
+    "gt": (operator.gt, np.greater),
+    "lte": (operator.le, np.less_equal),
+    "gte": (operator.ge, np.greater_equal),
+    "eq": (operator.eq, np.equal),
+    "neq": (operator.ne, np.not_equal),
+    "and": (operator.and_, np.bitwise_and),
+    "or": (operator.or_, np.bitwise_or),
+    "xor": (operator.xor, np.bitwise_xor),
+}
+
+_UNARY = {
+    "pos": (operator.pos, np.positive),
+    "neg": (operator.neg, np.negative),
+    **{
+        op: (getattr(np, name), getattr(np, name))
+        for op, name in PYTHON_UNARY_FUNCTIONS.items()
+    },
+}
+
+# The array-to-scalar functions, which read every row at once.
+_REDUCTIONS = frozenset({"sum", "prod", "min", "max", "length"})
+
+# Temporaries the walk made and nothing else holds, by id. Holding them here
+# also keeps their ids from being reused while they are listed.
+_Owned = dict[int, Any]
+
+# The smallest temporary worth reusing, which is where NumPy starts eliding its
+# own: below it, trying costs more than allocating does.
+_REUSE_BYTES = 1 << 18
+
+
+# The operators that short-circuit, and the truth of a left operand that
+# decides the row without the right one.
+_LOGICAL = {"and": False, "or": True}
+
+# The operators whose result is a truth value, whatever their operands.
+_COMPARISONS = frozenset({"lt", "gt", "lte", "gte", "eq", "neq"})
+
+# Those whose result is one where every operand is.
+_COMBINING = frozenset({"and", "or", "xor"})
+
+# What compacting costs besides the right operand's own operations, in passes
+# over the rows: one to find the undecided rows and one to write the right
+# operand's results back, and one for each input taken. Taking a scattered
+# tenth of an array reads most of its cache lines, so costs about as much as
+# reading all of it.
+_INDEXING = 2
+
+# How many right operands of an ``&&`` or ``||`` may be short-circuited within
+# one another. Each is folded, and walked to weigh it up, on its own, so this
+# bounds both the recursion and the repeated walks; deeper ones are computed as
+# they are without short_circuit.
+_NESTING = 16
+
+
+class ShortCircuit(NamedTuple):
+    """How one ``&&`` or ``||`` was evaluated, with ``short_circuit=True``."""
+
+    #: The operator, as a node of the expression.
+    node: AST.BinaryOperator
+    #: How many rows its left operand gave.
+    rows: int
+    #: How many of those the left operand did not decide.
+    undecided: int
+    #: ``"compact"``, if the right operand was computed for those rows alone,
+    #: or ``"dense"``, if it was computed for every row.
+    strategy: str
+
+
+class _Plan(NamedTuple):
+    # Where to report each ShortCircuit, and how many short-circuited right
+    # operands the walk is inside.
+    strategies: list[ShortCircuit]
+    nesting: int
+
+
+def _apply(
+    function: Callable[..., Any],
+    ufunc: Any,
+    arguments: Sequence[Any],
+    owned: _Owned,
+) -> Any:
+    """`function` applied to `arguments`, or `ufunc` in place of one of them if
+    that one is a temporary of the right dtype and shape."""
+    temporaries = [owned.pop(id(argument), None) for argument in arguments]
+    if isinstance(ufunc, np.ufunc):
+        for temporary in temporaries:
+            if temporary is not None:
+                try:
+                    # No casting at all, so that only a result of exactly its
+                    # dtype can be written into it; anything else is allocated
+                    # afresh.
+                    result = ufunc(*arguments, out=temporary, casting="no")
+                except (TypeError, ValueError):
+                    break
+                owned[id(result)] = result
+                return result
+    result = function(*arguments)
+    if (
+        isinstance(result, np.ndarray)
+        and result.nbytes >= _REUSE_BYTES
+        and _private(result, arguments)
+    ):
+        owned[id(result)] = result
+    return result
+
+
+def _private(result: Any, arguments: Sequence[Any]) -> bool:
+    """Whether `result` is an array of its own, rather than a view of one of
+    `arguments`, as ``np.real`` of a real array is."""
+    return result.base is None and not any(
+        np.shares_memory(result, argument)
+        for argument in arguments
+        if isinstance(argument, np.ndarray)
+    )
+
+
+def _evaluator(
+    arrays: Mapping[str, Any], owned: _Owned, plan: _Plan | None = None
+) -> Callable[[AST.AST], tuple[Sequence[AST.AST], Callable[..., Any]]]:
+    def expand(node: AST.AST) -> tuple[Sequence[AST.AST], Callable[..., Any]]:
+        if isinstance(node, AST.Literal):
+            value = node.value
+            return (), lambda: value
+        if isinstance(node, AST.Symbol):
+            name = node.name
+            if name in CONSTANT_VALUES:
+                constant = CONSTANT_VALUES[name]
+                return (), lambda: constant
+            if name not in arrays:
+                msg = f"No array named {name!r} to evaluate the expression with"
+                raise KeyError(msg)
+            array = arrays[name]
+            return (), lambda: array
+        if isinstance(node, AST.UnaryOperator):
+            function, ufunc = _UNARY[node.operator]
+            return (node.operand,), lambda operand: _apply(
+                function, ufunc, (operand,), owned
+            )
+        if isinstance(node, AST.BinaryOperator):
+            if node.operator == "multi_out":
+                # Python's "a, b": the parts, as one tuple however many.
+                nested = isinstance(node.left, AST.BinaryOperator) and (
+                    node.left.operator == "multi_out"
+                )
+                return node._children(), (
+                    (lambda left, right: (*left, right))
+                    if nested
+                    else (lambda left, right: (left, right))
+                )
+            if (
+                plan is not None
+                and plan.nesting < _NESTING
+                and node.operator in _LOGICAL
+            ):
+                return (node.left,), functools.partial(
+                    _short_circuit, node, arrays, owned, plan
+                )
+            function, ufunc = _BINARY[node.operator]
+            return node._children(), lambda *both: _apply(function, ufunc, both, owned)
+        if isinstance(node, AST.Matrix):
+            return node._children(), _index
+        assert isinstance(node, AST.Call)
+        spelling = PYTHON_FUNCTIONS.get(node.function)
+        if spelling is None:
+            display = FUNCTION_DISPLAY_NAMES.get(node.function, node.function)
+            msg = f'Function "{display}" is not supported in Python.'
+            raise ValueError(msg)
+        function = getattr(np, spelling)
+        return node.arguments, lambda *arguments: _apply(
+            function, function, arguments, owned
+        )
+
+    return expand
+
+
+def _index(var: Any, *indices: Any) -> Any:
+    """``var[i]``, or ``var[i, j]`` for several indices, as Python writes it."""
+    return var[indices[0] if len(indices) == 1 else indices]
+
+
+def _reads_across_rows(node: AST.AST) -> bool:
+    return isinstance(node, AST.Matrix) or (
+        isinstance(node, AST.Call) and node.function in _REDUCTIONS
+    )
+
+
+def _compactable(
+    node: AST.AST, arrays: Mapping[str, Any], rows: int
+) -> tuple[int, int] | None:
+    """How many operations `node` has and how many of `arrays` it takes a row
+    of, if it can be computed for some of `rows` rows by computing it on those
+    rows of its inputs: every input is one value per row or one for all of
+    them, and nothing reads across rows."""
+    inputs = 0
+    for name in node.variables:
+        if name not in arrays:
+            return None
+        shape = np.shape(arrays[name])
+        if shape not in ((), (rows,)):
+            return None
+        inputs += shape == (rows,)
+    operations = 0
+    for each in node._walk():
+        if _reads_across_rows(each):
+            return None
+        operations += not isinstance(each, (AST.Literal, AST.Symbol))
+    return (operations, inputs) if inputs else None
+
+
+def _gives_truth(node: AST.AST, arrays: Mapping[str, Any]) -> bool:
+    """Whether `node` is bound to come out as a truth value for each row, as far
+    as can be told before computing it: a comparison, a boolean input or
+    literal, or ``!``, ``&&``, ``||`` or ``^`` of those."""
+    stack = [node]
+    while stack:
+        each = stack.pop()
+        if isinstance(each, AST.BinaryOperator):
+            if each.operator in _COMPARISONS:
+                continue
+            if each.operator in _COMBINING:
+                stack.extend(each._children())
+                continue
+        elif isinstance(each, AST.UnaryOperator):
+            if each.operator == "inv":
+                stack.append(each.operand)
+                continue
+        elif isinstance(each, AST.Symbol):
+            value = CONSTANT_VALUES.get(each.name, arrays.get(each.name))
+            if value is not None and np.result_type(value).kind == "b":
+                continue
+        elif isinstance(each, AST.Literal) and isinstance(each.value, bool):
+            continue
+        return False
+    return True
+
+
+def _undecided(
+    node: AST.BinaryOperator, arrays: Mapping[str, Any], left: Any
+) -> tuple[int, int, Any]:
+    """How many rows `left` has, how many of them it leaves to the right
+    operand, and their indices, if computing that for those rows alone is
+    worth it, or else None."""
+    rows = int(np.size(left))
+    if not (isinstance(left, np.ndarray) and left.dtype == bool and left.ndim == 1):
+        return rows, rows, None
+    decides = _LOGICAL[node.operator]
+    true = int(np.count_nonzero(left))
+    undecided = rows - true if decides else true
+    costs = _compactable(node.right, arrays, rows)
+    # Anything but a truth value is combined with every row, as it would be
+    # without short_circuit, so it would have to be computed for every row.
+    if costs is None or not _gives_truth(node.right, arrays):
+        return rows, undecided, None
+    operations, inputs = costs
+    # Compacting makes _INDEXING + inputs passes over the rows, and saves the
+    # right operand's operations on every row that is decided.
+    if (rows - undecided) * operations <= (_INDEXING + inputs) * rows:
+        return rows, undecided, None
+    return rows, undecided, np.flatnonzero(left != decides)
+
+
+def _short_circuit(
+    node: AST.BinaryOperator,
+    arrays: Mapping[str, Any],
+    owned: _Owned,
+    plan: _Plan,
+    left: Any,
+) -> Any:
+    """``left && node.right``, or ``||``, computing the right operand only for
+    the rows `left` leaves undecided if that is worth it."""
+    inner = _Plan(plan.strategies, plan.nesting + 1)
+    rows, undecided, index = _undecided(node, arrays, left)
+    if index is not None:
+        compacted = dict(arrays)
+        for name in node.right.variables:
+            if np.shape(arrays[name]) == (rows,):
+                compacted[name] = np.take(arrays[name], index)
+        # Where the left operand did not decide, the right one, a truth value
+        # for each of those rows, is the answer.
+        right = fold(node.right, _evaluator(compacted, owned, inner))
+        result = owned.pop(id(left), None)
+        if result is None:
+            result = left.copy()
+        result[index] = right
+        if result.nbytes >= _REUSE_BYTES:
+            owned[id(result)] = result
+        plan.strategies.append(ShortCircuit(node, rows, undecided, "compact"))
+        return result
+    right = fold(node.right, _evaluator(arrays, owned, inner))
+    plan.strategies.append(ShortCircuit(node, rows, undecided, "dense"))
+    function, ufunc = _BINARY[node.operator]
+    return _apply(function, ufunc, (left, right), owned)
+
+
+def _whole(tree: AST.AST, arrays: Mapping[str, Any], plan: _Plan | None = None) -> Any:
+    return fold(tree, _evaluator(arrays, {}, plan))
+
+
+_ENGINES = ("numpy", "numexpr")
+
+
+def evaluate(
+    tree: AST.AST,
+    arrays: Mapping[str, Any],
+    chunk_size: int | None = None,
+    engine: str = "numpy",
+    threads: int | None = None,
+    short_circuit: bool = False,
+    strategies: list[ShortCircuit] | None = None,
+) -> Any:
+    """See :meth:`formulate.AST.AST.evaluate`."""
+    if engine not in _ENGINES:
+        msg = f"Unknown engine {engine!r}; expected one of {', '.join(_ENGINES)}"
+        raise ValueError(msg)
+    if strategies is not None and not short_circuit:
+        msg = "strategies are only reported with short_circuit=True"
+        raise ValueError(msg)
+    if engine == "numpy":
+        if threads is not None:
+            msg = 'threads only applies to engine="numexpr"'
+            raise ValueError(msg)
+        plan = None
+        if short_circuit:
+            plan = _Plan([] if strategies is None else strategies, 0)
+        return _chunked(
+            tree, arrays, chunk_size, functools.partial(_whole, tree, plan=plan)
+        )
+    if short_circuit:
+        msg = 'short_circuit only applies to engine="numpy"'
+        raise ValueError(msg)
+
+    from . import _numexpr  # noqa: PLC0415 (NumExpr is optional)
+
+    with contextlib.nullcontext() if threads is None else _numexpr.threads(threads):
+        compute = _numexpr.compiled(tree, arrays)
+        return _chunked(tree, arrays, chunk_size, compute)
+
+
+def _chunked(
+    tree: AST.AST,
+    arrays: Mapping[str, Any],
+    chunk_size: int | None,
+    compute: Callable[[Mapping[str, Any]], Any],
+) -> Any:
+    """`compute` of `arrays`, `chunk_size` rows at a time if that is given."""
+    if chunk_size is None:
+        return compute(arrays)
+    if chunk_size < 1:
+        msg = f"chunk_size must be positive, not {chunk_size!r}"
+        raise ValueError(msg)
+    for node in tree._walk():
+        if _reads_across_rows(node):
+            msg = (
+                f"{node} reads across rows, so the expression cannot be "
+                "evaluated in chunks; evaluate it without chunk_size"
+            )
+            raise ValueError(msg)
+
+    columns = {
+        name: arrays[name]
+        for name in tree.variables
+        if name in arrays and np.ndim(arrays[name]) > 0
+    }
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        msg = f"The arrays have different lengths: {sorted(lengths)}"
+        raise ValueError(msg)
+    length = lengths.pop() if lengths else 0
+    if length <= chunk_size:
+        return compute(arrays)
+
+    outputs: list[Any] = []
+    for start in range(0, length, chunk_size):
+        stop = start + chunk_size
+        chunk = {**arrays, **{name: a[start:stop] for name, a in columns.items()}}
+        result = compute(chunk)
+        parts = result if isinstance(result, tuple) else (result,)
+        if not outputs:
+            outputs = [
+                np.empty((length, *np.shape(part)[1:]), np.result_type(part))
+                for part in parts
+            ]
+        for output, part in zip(outputs, parts, strict=True):
+            output[start:stop] = part
+    return tuple(outputs) if isinstance(result, tuple) else outputs[0]
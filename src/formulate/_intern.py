@@ -0,0 +1,156 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""The pool that makes identical subtrees one shared object.
+
+Selections written by hand repeat themselves: the same transverse momentum, the
+same quality cut, in expression after expression and several times within one.
+Parsing with ``intern=True`` passes the tree through this pool on the way out,
+bottom-up, so that every subtree it has seen before, in this expression or any
+other still alive, is replaced by the node it already holds.
+
+Nodes are keyed on what they are and on the identity of their children, which
+are interned first; a whole tree is therefore interned in one lookup per node,
+however deep. A key can only be reused once the node it was made for has gone,
+taking its children with it, so identity is as good as structure here. That key
+stays in this module: the nodes themselves remain neither comparable nor
+hashable.
+
+The pool holds its nodes weakly, so a subtree is forgotten as soon as no
+expression uses it, and is bounded by a number of nodes besides. Once full, new
+nodes are returned as they are, still sharing whatever children were pooled.
+"""
+
+import threading
+import weakref
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, NamedTuple
+
+from . import AST
+from ._traversal import fold
+
+DEFAULT_MAXSIZE = 1 << 16
+
+
+class InternInfo(NamedTuple):
+    """Statistics for the intern pool, as returned by
+    :func:`formulate.intern_info`."""
+
+    hits: int
+    """Nodes replaced by one the pool already held."""
+    misses: int
+    """Nodes the pool did not hold, whether or not there was room to add them."""
+    maxsize: int
+    """The most nodes kept."""
+    currsize: int
+    """The nodes currently kept, which are those some expression still uses."""
+
+
+def _entry(
+    node: "AST.AST", children: Sequence["AST.AST"]
+) -> tuple[tuple[Any, ...], list[Any]]:
+    """The key of `node` with the interned `children` in place of its own, and
+    the fields to build that node from.
+
+    Numbers are keyed on their spelling, so that ``1``, ``1.0`` and ``True``,
+    which are all equal, stay apart, and so do ``0.0`` and ``-0.0``.
+    """
+    remaining = iter(children)
+    key: list[Any] = [type(node)]
+    fields: list[Any] = []
+    for name in node.__match_args__:
+        value = getattr(node, name)
+        if isinstance(value, str):
+            key.append(value)
+        elif isinstance(value, (int, float)):
+            key.append(repr(value))
+        elif isinstance(value, tuple):
+            value = tuple(islice(remaining, len(value)))
+            key.append(tuple(map(id, value)))
+        else:
+            value = next(remaining)
+            key.append(id(value))
+        fields.append(value)
+    return tuple(key), fields
+
+
+class InternPool:
+    """A thread-safe pool of shared AST nodes, held weakly.
+
+    :param maxsize: the most nodes to keep. Zero turns interning off.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        self._nodes: weakref.WeakValueDictionary[tuple[Any, ...], AST.AST] = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+        self._maxsize = 0
+        self.configure(maxsize)
+
+    def configure(self, maxsize: int) -> None:
+        """Change the bound. Nodes beyond it stay pooled until they are gone."""
+        if maxsize < 0:
+            msg = f"maxsize must be non-negative, not {maxsize!r}"
+            raise ValueError(msg)
+        with self._lock:
+            self._maxsize = maxsize
+
+    def owns(self, tree: "AST.AST") -> bool:
+        """Whether `tree` is a node of this pool, and so may share subtrees."""
+        with self._lock:
+            return self._owns(tree)
+
+    def _owns(self, tree: "AST.AST") -> bool:
+        key, _ = _entry(tree, tree._children())
+        return self._nodes.get(key) is tree
+
+    def intern(self, tree: "AST.AST") -> "AST.AST":
+        """`tree`, with every subtree the pool holds replaced by the pooled
+        one, and the rest added while there is room."""
+        nodes = self._nodes
+
+        def expand(node: "AST.AST") -> tuple[Sequence["AST.AST"], Any]:
+            own = node._children()
+
+            def build(*children: "AST.AST") -> "AST.AST":
+                key, fields = _entry(node, children)
+                pooled = nodes.get(key)
+                if pooled is not None:
+                    self._hits += 1
+                    return pooled
+                self._misses += 1
+                candidate = node
+                if any(new is not old for new, old in zip(children, own, strict=True)):
+                    candidate = type(node)(*fields)
+                if len(nodes) < self._maxsize:
+                    nodes[key] = candidate
+                return candidate
+
+            return own, build
+
+        with self._lock:
+            # A tree that came out of the pool is all in it already.
+            interned: AST.AST = tree if self._owns(tree) else fold(tree, expand)
+        # What tells rendering that the tree may share subtrees, without it
+        # asking the pool and waiting on its lock.
+        AST._kept(interned).interned = True
+        return interned
+
+    def info(self) -> InternInfo:
+        """The hit and miss counts, bound and current size."""
+        with self._lock:
+            return InternInfo(self._hits, self._misses, self._maxsize, len(self._nodes))
+
+    def clear(self) -> None:
+        """Forget every node and reset the statistics. Expressions that were
+        interned keep the nodes they share."""
+        with self._lock:
+            self._nodes.clear()
+            self._hits = self._misses = 0
+
+
+POOL = InternPool()
+"""The pool :func:`formulate.from_root` and :func:`formulate.from_numexpr`
+intern into."""
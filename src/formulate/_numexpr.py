@@ -0,0 +1,111 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Evaluating an expression with NumExpr, compiled once.
+
+``numexpr.evaluate(expr.to_numexpr())`` parses and compiles the string on every
+call unless it happens to match the last one NumExpr saw, and the names in it
+are the hex-encoded ones, so a dotted branch has to be passed under a name it
+was never called. ``expr.evaluate(arrays, engine="numexpr")`` renders and
+compiles the expression the first time it meets it with inputs of a given set
+of types, keeps the compiled program, and calls it directly from then on: on
+every chunk of a chunked evaluation and on every later call, with the
+expression itself, through its fingerprint, as the key. That direct call is
+what ``numexpr.re_evaluate`` makes, without the thread-local lookup of which
+program was last.
+
+Arrays are passed by the names the expression was written with, and bound to
+the encoded names the program uses, which are the ones :meth:`to_numexpr
+<formulate.AST.AST.to_numexpr>` writes.
+"""
+
+import contextlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+
+from . import AST
+
+try:
+    import numexpr
+    import numpy as np
+    from numexpr import necompiler
+except ImportError as error:
+    msg = (
+        'evaluate(engine="numexpr") needs NumExpr, which can be installed with '
+        "`pip install numexpr`"
+    )
+    raise ImportError(msg) from error
+
+MAXSIZE = 256
+
+# (fingerprint, signature) -> (program, whether it uses VML), most recently
+# used last.
+_Signature = tuple[tuple[str, type], ...]
+_programs: OrderedDict[tuple[str, _Signature], tuple[Any, bool]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _bound_name(name: str) -> str:
+    # As a Symbol renders itself for NumExpr.
+    return AST._encode_name(name) if "." in name else name
+
+
+def _program(tree: AST.AST, signature: _Signature) -> tuple[Any, bool]:
+    key = (tree.fingerprint(), signature)
+    with _lock:
+        entry = _programs.get(key)
+        if entry is not None:
+            _programs.move_to_end(key)
+            return entry
+    text = tree.to_numexpr()
+    # What numexpr.evaluate compiles with, and whether the program calls a VML
+    # function, which it is told when it runs.
+    context = necompiler.getContext({}, _frame_depth=0)
+    _, uses_vml = necompiler.getExprNames(text, context)
+    entry = (necompiler.NumExpr(text, signature, **context), uses_vml)
+    with _lock:
+        _programs[key] = entry
+        while len(_programs) > MAXSIZE:
+            _programs.popitem(last=False)
+    return entry
+
+
+def compiled(
+    tree: AST.AST, arrays: Mapping[str, Any]
+) -> Callable[[Mapping[str, Any]], Any]:
+    """The program computing `tree` from arrays of the types of `arrays`, as a
+    function of arrays like them."""
+    names = list(tree.variables)
+    for name in names:
+        if name not in arrays:
+            msg = f"No array named {name!r} to evaluate the expression with"
+            raise KeyError(msg)
+    signature = tuple(
+        (_bound_name(name), necompiler.getType(np.asarray(arrays[name])))
+        for name in names
+    )
+    program, uses_vml = _program(tree, signature)
+
+    def run(arrays: Mapping[str, Any]) -> Any:
+        inputs = [np.asarray(arrays[name]) for name in names]
+        return program(*inputs, ex_uses_vml=uses_vml)
+
+    return run
+
+
+@contextlib.contextmanager
+def threads(count: int) -> Iterator[None]:
+    """Run NumExpr on `count` threads until the block ends.
+
+    NumExpr's thread count is one setting for the whole process, so another
+    thread evaluating at the same time uses it too.
+    """
+    if count < 1:
+        msg = f"threads must be positive, not {count!r}"
+        raise ValueError(msg)
+    previous = numexpr.set_num_threads(count)
+    try:
+        yield
+    finally:
+        numexpr.set_num_threads(previous)
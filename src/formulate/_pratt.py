@@ -0,0 +1,325 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Operator-precedence parsers for the two grammars, building the AST directly.
+
+The grammars in ``resources`` remain the definition of both languages, and lark
+the reference parser for them. For the expressions people actually write,
+though, lark's general LALR machinery is most of the cost of a parse: several
+Python objects per token, a chain of unit rules per atom, and a whole parse
+tree that `toast` then walks a second time. These parsers instead read the
+tokens once, with one table of binding powers per language, and build
+:mod:`formulate.AST` nodes as operators are reduced. Like everything else in
+the package they do not recurse: pending operators and open brackets live on an
+explicit stack, so nesting depth is bounded by memory.
+
+They only ever have to get the *successful* parses right. Anything they do not
+accept -- a syntax error, an unknown function, a malformed number -- makes them
+return None, and the caller parses the expression again with lark, which
+raises exactly the error, with exactly the hints, that it always has. Failure
+is the slow path anyway, and this way there is only one implementation of the
+error reporting to keep right.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from . import AST
+from .identifiers import CONSTANTS, CONSTANTS_ALIASES
+from .toast import _literal, _resolve_function_name, _symbol
+
+# Both grammars import lark's common.NUMBER and ignore common.WS. Lark's DIGIT
+# is [0-9], not \d, which would also match other scripts' digits.
+_NUMBER = r"(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+_WHITESPACE = "[ \t\f\r\n]"
+
+# Binary operators are tabled as (precedence, canonical name, associativity).
+# Higher binds tighter; unary operators bind at _UNARY, between multiplication
+# and power, which is where both grammars put `factor`.
+_UNARY = 7
+_LEFT, _RIGHT, _NONE = range(3)
+
+
+@dataclass(frozen=True)
+class _Language:
+    """The tables one grammar's parser is driven by.
+
+    :param tokens: splits the source into numbers, names, operators and, for
+        anything else, single-character errors.
+    :param binary: binary operator tokens, as ``(precedence, name,
+        associativity)``.
+    :param prefix: unary operator tokens, with their canonical names.
+    :param floors: the lowest precedence allowed at the top level, inside
+        parentheses or a call, and inside an index. This is how ROOT's ``:``
+        stays at the top of an expression and an index stays a ``sum``.
+    :param namespaces: whether function names may be ``::``-qualified.
+    :param indexing: whether ``[...]`` indexes the preceding atom.
+    """
+
+    tokens: re.Pattern[str]
+    binary: dict[str, tuple[int, str, int]]
+    prefix: dict[str, str]
+    floors: tuple[int, int, int]
+    namespaces: bool
+    indexing: bool
+
+
+def _tokens(name: str, operators: list[str]) -> re.Pattern[str]:
+    # Longest operators first, as lark matches them, so `**` is not read as
+    # two `*`.
+    ops = "|".join(
+        re.escape(op) for op in sorted(set(operators), key=len, reverse=True)
+    )
+    return re.compile(
+        f"{_WHITESPACE}*(?:(?P<number>{_NUMBER})|(?P<name>{name})"
+        f"|(?P<op>{ops})|(?P<error>[^ \t\f\r\n]))"
+    )
+
+
+_ROOT_BINARY = {
+    ":": (0, "multi_out", _LEFT),
+    "||": (1, "or", _LEFT),
+    "&&": (2, "and", _LEFT),
+    "==": (3, "eq", _LEFT),
+    "!=": (3, "neq", _LEFT),
+    ">": (4, "gt", _LEFT),
+    ">=": (4, "gte", _LEFT),
+    "<": (4, "lt", _LEFT),
+    "<=": (4, "lte", _LEFT),
+    "+": (5, "add", _LEFT),
+    "-": (5, "sub", _LEFT),
+    "*": (6, "mul", _LEFT),
+    "/": (6, "div", _LEFT),
+    "%": (6, "mod", _LEFT),
+    "**": (8, "pow", _RIGHT),
+    "^": (8, "pow", _RIGHT),
+}
+_ROOT_PREFIX = {"+": "pos", "-": "neg", "!": "inv"}
+
+_ROOT = _Language(
+    tokens=_tokens(
+        r"(?!\d)\w+(?:\.\w+)*\$?",
+        [*_ROOT_BINARY, *_ROOT_PREFIX, "(", ")", ",", "::", "[", "]"],
+    ),
+    binary=_ROOT_BINARY,
+    prefix=_ROOT_PREFIX,
+    floors=(0, 1, 5),
+    namespaces=True,
+    indexing=True,
+)
+
+_NUMEXPR_BINARY = {
+    # Comparisons do not chain: `a < b < c` is an error, not `(a < b) < c`.
+    ">": (1, "gt", _NONE),
+    ">=": (1, "gte", _NONE),
+    "<": (1, "lt", _NONE),
+    "<=": (1, "lte", _NONE),
+    "!=": (1, "neq", _NONE),
+    "==": (1, "eq", _NONE),
+    "|": (2, "or", _LEFT),
+    "^": (3, "xor", _LEFT),
+    "&": (4, "and", _LEFT),
+    "+": (5, "add", _LEFT),
+    "-": (5, "sub", _LEFT),
+    "*": (6, "mul", _LEFT),
+    "/": (6, "div", _LEFT),
+    "%": (6, "mod", _LEFT),
+    "**": (8, "pow", _RIGHT),
+}
+_NUMEXPR_PREFIX = {"+": "pos", "-": "neg", "~": "inv"}
+
+_NUMEXPR = _Language(
+    tokens=_tokens(
+        r"(?!\d)\w+(?:\.\w+)*",
+        [*_NUMEXPR_BINARY, *_NUMEXPR_PREFIX, "(", ")", ","],
+    ),
+    binary=_NUMEXPR_BINARY,
+    prefix=_NUMEXPR_PREFIX,
+    floors=(0, 0, 0),
+    namespaces=False,
+    indexing=False,
+)
+
+# What an open bracket on the stack is waiting for.
+_GROUP, _CALL, _INDEX = range(3)
+
+
+class _Reject(Exception):
+    """The expression is not one this parser accepts; lark will decide."""
+
+
+def _reduce(stack: list[Any], values: list[AST.AST], precedence: int) -> None:
+    """Apply every pending operator that binds tighter than `precedence`.
+
+    Open brackets sit on the same stack with a precedence of -1, so this never
+    reaches past the innermost one.
+    """
+    while stack and stack[-1][0] > precedence:
+        _, unary, name = stack.pop()
+        if unary:
+            values[-1] = AST.UnaryOperator(name, values[-1])
+        else:
+            right = values.pop()
+            values[-1] = AST.BinaryOperator(name, values[-1], right)
+
+
+def _close(stack: list[Any], values: list[AST.AST], *kinds: int) -> tuple[Any, ...]:
+    """Reduce up to the innermost open bracket, which must be one of `kinds`."""
+    _reduce(stack, values, -1)
+    if not stack or stack[-1][1] not in kinds:
+        raise _Reject
+    return stack.pop()  # type: ignore[no-any-return]
+
+
+def _call(parts: list[str], arguments: tuple[AST.AST, ...]) -> AST.AST:
+    name = _resolve_function_name(parts)
+    if name in CONSTANTS:
+        if arguments:
+            raise _Reject
+        return AST.Symbol(name)
+    return AST.Call(name, arguments)
+
+
+def _parse(language: _Language, text: str) -> AST.AST:
+    matches = list(language.tokens.finditer(text))
+    kinds = [match.lastgroup for match in matches]
+    texts = [match[match.lastindex or 0] for match in matches]
+    kinds.append("end")
+    texts.append("")
+
+    values: list[AST.AST] = []
+    # Pending operators as (precedence, unary, name), and open brackets as
+    # (-1, kind, values below it, enclosing floor, payload), innermost last.
+    stack: list[Any] = []
+    top_floor, group_floor, index_floor = language.floors
+    floor = top_floor
+    operand = True
+    # An operand position that may instead close the call it is in: just after
+    # the `(`, or after a trailing comma.
+    closable = False
+    # The pieces of the last value, if it is a Matrix that a further `[...]`
+    # extends, as in `a[0][1]`, rather than indexes again, as in `(a[0])[1]`.
+    extendable: tuple[AST.AST, tuple[AST.AST, ...]] | None = None
+
+    i = 0
+    while True:
+        kind = kinds[i]
+        token = texts[i]
+        i += 1
+        if operand:
+            if kind == "number":
+                values.append(_literal(token))
+                operand = closable = False
+            elif kind == "name":
+                if texts[i] == "(" or (language.namespaces and texts[i] == "::"):
+                    parts = [token]
+                    while texts[i] == "::":
+                        if kinds[i + 1] != "name":
+                            raise _Reject
+                        parts.append(texts[i + 1])
+                        i += 2
+                    if texts[i] != "(":
+                        raise _Reject
+                    i += 1
+                    stack.append((-1, _CALL, len(values), floor, parts))
+                    floor = group_floor
+                    closable = True
+                else:
+                    values.append(_symbol(CONSTANTS_ALIASES.get(token, token)))
+                    operand = closable = False
+            elif kind != "op":
+                raise _Reject
+            elif token == "(":
+                stack.append((-1, _GROUP, len(values), floor, None))
+                floor = group_floor
+                closable = False
+            elif token in language.prefix:
+                stack.append((_UNARY, True, language.prefix[token]))
+                closable = False
+            elif token == ")" and closable:
+                _, _, base, floor, parts = _close(stack, values, _CALL)
+                arguments = tuple(values[base:])
+                del values[base:]
+                values.append(_call(parts, arguments))
+                operand = closable = False
+            else:
+                raise _Reject
+            extendable = None
+            continue
+
+        if kind == "end":
+            _reduce(stack, values, -1)
+            if stack:
+                raise _Reject
+            return values[0]
+        if kind != "op":
+            raise _Reject
+        if token in language.binary:
+            precedence, name, associativity = language.binary[token]
+            if precedence < floor:
+                raise _Reject
+            # A left-associative operator also applies the pending one of its
+            # own precedence; the others leave it for the one being pushed.
+            _reduce(stack, values, precedence - (associativity == _LEFT))
+            if associativity == _NONE and stack and stack[-1][0] == precedence:
+                raise _Reject
+            stack.append((precedence, False, name))
+            operand = True
+            extendable = None
+        elif token == "[" and language.indexing:
+            target = values.pop()
+            indices: tuple[AST.AST, ...] = ()
+            if extendable is not None:
+                target, indices = extendable
+            stack.append((-1, _INDEX, len(values), floor, (target, indices)))
+            floor = index_floor
+            operand = True
+        elif token == "]" and language.indexing:
+            _, _, _, floor, (target, indices) = _close(stack, values, _INDEX)
+            indices = (*indices, values[-1])
+            values[-1] = AST.Matrix(target, indices)
+            extendable = (target, indices)
+        elif token == ")":
+            _, bracket, base, floor, parts = _close(stack, values, _GROUP, _CALL)
+            if bracket == _CALL:
+                arguments = tuple(values[base:])
+                del values[base:]
+                values.append(_call(parts, arguments))
+            extendable = None
+        elif token == ",":
+            _reduce(stack, values, -1)
+            if not stack or stack[-1][1] != _CALL:
+                raise _Reject
+            operand = closable = True
+            extendable = None
+        else:
+            raise _Reject
+
+
+def _try(language: _Language, text: str) -> AST.AST | None:
+    try:
+        return _parse(language, text)
+    # Unknown names and malformed numbers are reported by the lark engine, in
+    # the order and with the messages it has always used.
+    except (_Reject, SyntaxError, ValueError):
+        return None
+
+
+def parse_root(text: str) -> AST.AST | None:
+    """Parse a ROOT expression, or return None to leave it to lark.
+
+    :param text: the expression.
+    :returns: the same AST that lark and `toast` would build, or None if the
+        expression is anything but a valid one.
+    """
+    return _try(_ROOT, text)
+
+
+def parse_numexpr(text: str) -> AST.AST | None:
+    """Parse a NumExpr expression, or return None to leave it to lark.
+
+    :param text: the expression.
+    :returns: the same AST that lark and `toast` would build, or None if the
+        expression is anything but a valid one.
+    """
+    return _try(_NUMEXPR, text)
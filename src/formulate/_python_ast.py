@@ -0,0 +1,321 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Python's own syntax tree for an expression, and code compiled from it.
+
+``compile(expr.to_python(), ...)`` writes the expression out only for CPython to
+tokenize and parse it straight back, and cannot compile a deep one at all: the
+parser refuses two hundred nested parentheses, and the compiler recurses once
+per level of what it parsed. :meth:`~formulate.AST.AST.to_python_ast` builds
+the :class:`ast.Expression` that parsing :meth:`~formulate.AST.AST.to_python`
+gives, node for node, straight from the tree.
+
+:meth:`~formulate.AST.AST.compile_python` builds a function of the
+expression's variables out of the same nodes and compiles it, once per
+expression: the function is kept, with the fingerprint as its key. Its body
+assigns every hundred levels of a deep tree to a local, and refers to that
+local in its place, so the compiler never nests deeper than that however deep
+the expression is.
+"""
+
+import ast
+import copy
+import math
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Any, TypeVar
+
+from . import AST
+from ._traversal import fold
+from .identifiers import (
+    FUNCTION_DISPLAY_NAMES,
+    NUMEXPR_CONSTANTS,
+    PYTHON_FUNCTIONS,
+    PYTHON_UNARY_FUNCTIONS,
+)
+
+_BINARY = {
+    "add": ast.Add,
+    "sub": ast.Sub,
+    "mul": ast.Mult,
+    "div": ast.Div,
+    "mod": ast.Mod,
+    "pow": ast.Pow,
+    "and": ast.BitAnd,
+    "or": ast.BitOr,
+    "xor": ast.BitXor,
+}
+
+_COMPARISONS = {
+    "lt": ast.Lt,
+    "gt": ast.Gt,
+    "lte": ast.LtE,
+    "gte": ast.GtE,
+    "eq": ast.Eq,
+    "neq": ast.NotEq,
+}
+
+_UNARY = {"pos": ast.UAdd, "neg": ast.USub}
+
+# Each constant as to_python writes it, parsed once; every use gets a copy.
+_SPELLED = {
+    name: ast.parse(text, mode="eval").body
+    for name, text in AST._PYTHON.constant_spellings.items()
+}
+
+# The values of PYTHON_CONSTANTS, which spells the last three as source. A
+# compiled function holds them as they are.
+CONSTANT_VALUES = {
+    **NUMEXPR_CONSTANTS,
+    "inf": math.inf,
+    "neginf": -math.inf,
+    "nan": math.nan,
+}
+
+# How deep a compiled function's expressions nest, at most, before the rest is
+# assigned to a local: well short of where the compiler runs out of stack.
+_SPILL_DEPTH = 100
+
+MAXSIZE = 256
+
+# (fingerprint, whether scalar) -> function, most recently used last.
+_functions: OrderedDict[tuple[str, bool], Callable[..., Any]] = OrderedDict()
+_lock = threading.Lock()
+
+_Located = TypeVar("_Located", bound=ast.AST)
+
+
+def _at(node: _Located) -> _Located:
+    """`node`, placed at the start of line one, where everything here goes.
+
+    ``ast.fix_missing_locations`` would do as much, but recursively.
+    """
+    node.lineno = node.end_lineno = 1  # type: ignore[attr-defined]
+    node.col_offset = node.end_col_offset = 0  # type: ignore[attr-defined]
+    return node
+
+
+def _name(name: str) -> ast.Name:
+    return _at(ast.Name(name, ast.Load()))
+
+
+def _attribute(value: ast.expr, attr: str) -> ast.Attribute:
+    return _at(ast.Attribute(value, attr, ast.Load()))
+
+
+# A built node, and how deep it nests.
+_Part = tuple[ast.expr, int]
+
+
+def _deepened(
+    node: ast.expr,
+    parts: Sequence[_Part],
+    spill: Callable[[ast.expr], ast.expr] | None,
+) -> _Part:
+    """`node`, built from `parts`, with its depth; or, as deep as
+    :data:`_SPILL_DEPTH`, what `spill` puts in its place, of depth one."""
+    depth = 1 + max((depth for _, depth in parts), default=0)
+    if spill is not None and depth >= _SPILL_DEPTH:
+        return spill(_at(node)), 1
+    return _at(node), depth
+
+
+def _outputs(node: AST.BinaryOperator) -> Callable[[_Part, _Part], _Part]:
+    """How the parts of Python's "a, b, c" are joined: as one tuple, however
+    many. It is the whole expression, so it is never assigned to a local."""
+    nested = isinstance(node.left, AST.BinaryOperator) and (
+        node.left.operator == "multi_out"
+    )
+
+    def join(left: _Part, right: _Part) -> _Part:
+        first = left[0].elts if nested else [left[0]]  # type: ignore[attr-defined]
+        elts = [*first, right[0]]
+        return _at(ast.Tuple(elts, ast.Load())), max(left[1], right[1] + 1)
+
+    return join
+
+
+def _built(
+    tree: AST.AST,
+    symbol: Callable[[str], ast.expr],
+    numpy: str,
+    spill: Callable[[ast.expr], ast.expr] | None = None,
+) -> ast.expr:
+    """The Python expression for `tree`, which writes its names as `symbol`
+    does, and calls NumPy as `numpy`.
+
+    Each node is built with its depth, and `spill`, if it is given, replaces
+    the deep ones; see :func:`_deepened`.
+    """
+
+    def call(function: str, arguments: Sequence[ast.expr]) -> ast.Call:
+        return _at(ast.Call(_attribute(_name(numpy), function), list(arguments), []))
+
+    def built(node: ast.expr, *parts: _Part) -> _Part:
+        return _deepened(node, parts, spill)
+
+    def expand(node: AST.AST) -> tuple[Sequence[AST.AST], Callable[..., Any]]:
+        if isinstance(node, AST.Literal):
+            value = node.value
+            return (), lambda: built(ast.Constant(value))
+        if isinstance(node, AST.Symbol):
+            name = node.name
+            return (), lambda: (symbol(name), 1)
+        if isinstance(node, AST.UnaryOperator):
+            if node.operator in PYTHON_UNARY_FUNCTIONS:
+                function = PYTHON_UNARY_FUNCTIONS[node.operator]
+                return (node.operand,), lambda operand: built(
+                    call(function, [operand[0]]), operand
+                )
+            unary = _UNARY[node.operator]
+            return (node.operand,), lambda operand: built(
+                ast.UnaryOp(unary(), operand[0]), operand
+            )
+        if isinstance(node, AST.BinaryOperator):
+            operator = node.operator
+            if operator == "multi_out":
+                return node._children(), _outputs(node)
+            if operator in _COMPARISONS:
+                comparison = _COMPARISONS[operator]
+                return node._children(), lambda left, right: built(
+                    ast.Compare(left[0], [comparison()], [right[0]]), left, right
+                )
+            binary = _BINARY[operator]
+            return node._children(), lambda left, right: built(
+                ast.BinOp(left[0], binary(), right[0]), left, right
+            )
+        if isinstance(node, AST.Matrix):
+
+            def index(var: _Part, *indices: _Part) -> _Part:
+                where = (
+                    indices[0][0]
+                    if len(indices) == 1
+                    else _at(ast.Tuple([i for i, _ in indices], ast.Load()))
+                )
+                return built(ast.Subscript(var[0], where, ast.Load()), var, *indices)
+
+            return node._children(), index
+        assert isinstance(node, AST.Call)
+        spelling = PYTHON_FUNCTIONS.get(node.function)
+        if spelling is None:
+            display = FUNCTION_DISPLAY_NAMES.get(node.function, node.function)
+            msg = f'Function "{display}" is not supported in Python.'
+            raise ValueError(msg)
+        return node.arguments, lambda *arguments: built(
+            call(spelling, [argument for argument, _ in arguments]), *arguments
+        )
+
+    expression: ast.expr = fold(tree, expand)[0]
+    return expression
+
+
+def _written(name: str) -> ast.expr:
+    """A name as :meth:`formulate.AST.AST.to_python` writes it: a constant's
+    spelling, or a dotted name as attribute access."""
+    if name in _SPELLED:
+        return copy.deepcopy(_SPELLED[name])
+    first, *attributes = name.split(".")
+    node: ast.expr = _name(first)
+    for attribute in attributes:
+        node = _attribute(node, attribute)
+    return node
+
+
+def to_python_ast(tree: AST.AST) -> ast.Expression:
+    """See :meth:`formulate.AST.AST.to_python_ast`."""
+    return ast.Expression(_built(tree, _written, "np"))
+
+
+def _parameter(name: str) -> str:
+    # As a Symbol renders itself for NumExpr.
+    return AST._encode_name(name) if "." in name else name
+
+
+def _unused(name: str, taken: set[str]) -> str:
+    """`name`, with as many leading underscores as it takes for no name in
+    `taken` to start with it."""
+    while any(other.startswith(name) for other in taken):
+        name = f"_{name}"
+    return name
+
+
+def _numpy(caller: str) -> Any:
+    try:
+        import numpy as np  # noqa: PLC0415 (NumPy is optional)
+    except ImportError as error:
+        msg = f"{caller} needs NumPy, which can be installed with `pip install numpy`"
+        raise ImportError(msg) from error
+    return np
+
+
+def _locals(
+    prefix: str,
+) -> tuple[list[ast.stmt], Callable[[ast.expr], ast.expr]]:
+    """Statements to put before an expression, and the `spill` for
+    :func:`_built` that assigns a node to the next local named `prefix` and
+    a number in them."""
+    statements: list[ast.stmt] = []
+
+    def spill(node: ast.expr) -> ast.expr:
+        local = f"{prefix}{len(statements)}"
+        target = _at(ast.Name(local, ast.Store()))
+        statements.append(_at(ast.Assign([target], node)))
+        return _name(local)
+
+    return statements, spill
+
+
+def _define(
+    parameters: Sequence[str], body: list[ast.stmt], namespace: dict[str, Any]
+) -> Callable[..., Any]:
+    """The function of `parameters` that runs `body`, with `namespace` as its
+    globals."""
+    signature = ast.arguments(
+        posonlyargs=[],
+        args=[_at(ast.arg(parameter)) for parameter in parameters],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+    definition = _at(ast.FunctionDef("expression", signature, body, []))
+    code = compile(ast.Module([definition], []), "<formulate>", "exec")
+    exec(code, namespace)
+    function: Callable[..., Any] = namespace.pop("expression")
+    return function
+
+
+def _function(tree: AST.AST) -> Callable[..., Any]:
+    np = _numpy("compile_python()")
+    parameters = [_parameter(name) for name in tree.variables]
+    taken = set(parameters)
+    numpy = _unused("np", taken)
+    statements, spill = _locals(_unused("_t", taken))
+
+    def symbol(name: str) -> ast.expr:
+        if name in CONSTANT_VALUES:
+            return _at(ast.Constant(CONSTANT_VALUES[name]))
+        return _name(_parameter(name))
+
+    result = _built(tree, symbol, numpy, spill)
+    return _define(parameters, [*statements, _at(ast.Return(result))], {numpy: np})
+
+
+def compile_python(tree: AST.AST, scalar: bool = False) -> Callable[..., Any]:
+    """See :meth:`formulate.AST.AST.compile_python`."""
+    key = (tree.fingerprint(), scalar)
+    with _lock:
+        function = _functions.get(key)
+        if function is not None:
+            _functions.move_to_end(key)
+            return function
+    if scalar:
+        from . import _scalar  # noqa: PLC0415 (it imports this)
+
+        function = _scalar.function(tree)
+    else:
+        function = _function(tree)
+    with _lock:
+        _functions[key] = function
+        while len(_functions) > MAXSIZE:
+            _functions.popitem(last=False)
+    return function
@@ -0,0 +1,324 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""A compiled expression for one event at a time, in plain Python.
+
+What :meth:`~formulate.AST.AST.to_python` writes calls NumPy, which on a single
+float costs a microsecond or so a call, and follows NumPy rather than ROOT:
+``&`` and ``|`` are bitwise and never short-circuit, and ``%`` keeps the
+fractional part. ``expr.compile_python(scalar=True)`` compiles a function for
+an event loop instead, computing as ``TTreeFormula`` does, in doubles:
+
+* ``&&`` and ``||`` stop at the first operand that decides them, and they, the
+  comparisons and ``!`` give ``True`` or ``False``, which count as 1 and 0;
+* ``%`` truncates both operands to integers first, and its result takes the
+  sign of the left one;
+* ``TMath::Min`` and ``TMath::Max`` give their first argument on a tie, and
+  their second if either is NaN;
+* dividing by zero, and a function taken outside its domain, give an infinity
+  or a NaN rather than an error.
+
+The function computes with Python's operators and :mod:`math`, which agree
+with C wherever they give an answer at all, and raise where C gives an infinity
+or a NaN. When they raise, the same expression is computed again with NumPy's
+scalars, which follow C, with NumPy's warnings off. That second function is
+only ever called for such a row, so the first one carries none of its cost.
+"""
+
+import ast
+import math
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from . import AST
+from ._python_ast import (
+    CONSTANT_VALUES,
+    _at,
+    _deepened,
+    _define,
+    _locals,
+    _name,
+    _numpy,
+    _outputs,
+    _parameter,
+    _Part,
+    _unused,
+)
+from ._traversal import fold
+from .identifiers import FUNCTION_DISPLAY_NAMES
+
+_ARITHMETIC = {"add": ast.Add, "sub": ast.Sub, "mul": ast.Mult}
+
+_COMPARISONS = {
+    "lt": ast.Lt,
+    "gt": ast.Gt,
+    "lte": ast.LtE,
+    "gte": ast.GtE,
+    "eq": ast.Eq,
+    "neq": ast.NotEq,
+}
+
+
+def _minimum(a: Any, b: Any) -> Any:
+    # TMath::Min
+    return a if a <= b else b
+
+
+def _maximum(a: Any, b: Any) -> Any:
+    # TMath::Max
+    return a if a >= b else b
+
+
+def _ceil(x: Any) -> float:
+    # TMath::Ceil is a double; math.ceil is an int.
+    return float(math.ceil(x))
+
+
+def _floor(x: Any) -> float:
+    return float(math.floor(x))
+
+
+# What each function, and the operators that are not Python's own, are called
+# with, in the first function. `fmod` and `trunc` make up `%`.
+_FAST: dict[str, Callable[..., Any]] = {
+    "sqrt": math.sqrt,
+    "abs": math.fabs,
+    "pow": math.pow,
+    "log": math.log,
+    "log2": math.log2,
+    "log10": math.log10,
+    "log1p": math.log1p,
+    "exp": math.exp,
+    "expm1": math.expm1,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "arcsin": math.asin,
+    "arccos": math.acos,
+    "arctan": math.atan,
+    "arctan2": math.atan2,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "arcsinh": math.asinh,
+    "arccosh": math.acosh,
+    "arctanh": math.atanh,
+    "ceil": _ceil,
+    "floor": _floor,
+    "tmath_min": _minimum,
+    "tmath_max": _maximum,
+    "sum": sum,
+    "prod": math.prod,
+    "min": min,
+    "max": max,
+    "length": len,
+    "fmod": math.fmod,
+    "trunc": int,
+}
+
+# The NumPy functions standing in for those that can raise, in the second,
+# with division, which the first leaves to Python. float_power computes in
+# doubles whatever it is given, as TMath::Power does.
+_EXACT = {
+    "sqrt": "sqrt",
+    "abs": "fabs",
+    "pow": "float_power",
+    "log": "log",
+    "log2": "log2",
+    "log10": "log10",
+    "log1p": "log1p",
+    "exp": "exp",
+    "expm1": "expm1",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "arcsin": "arcsin",
+    "arccos": "arccos",
+    "arctan": "arctan",
+    "arctan2": "arctan2",
+    "sinh": "sinh",
+    "cosh": "cosh",
+    "tanh": "tanh",
+    "arcsinh": "arcsinh",
+    "arccosh": "arccosh",
+    "arctanh": "arctanh",
+    "ceil": "ceil",
+    "floor": "floor",
+    "fmod": "fmod",
+    "trunc": "trunc",
+    "divide": "true_divide",
+}
+
+# What the first function gives up on.
+_ERRORS = (ArithmeticError, ValueError)
+
+
+def _built(
+    tree: AST.AST,
+    symbol: Callable[[str], ast.expr],
+    function: Callable[[str], str],
+    exact: bool,
+    spill: Callable[[ast.expr], ast.expr],
+) -> ast.expr:
+    """The expression for `tree`, calling each of the functions above by the
+    global name `function` gives it, with division a call too if `exact`."""
+
+    def call(name: str, arguments: Sequence[ast.expr]) -> ast.Call:
+        return _at(ast.Call(_name(function(name)), list(arguments), []))
+
+    def built(node: ast.expr, *parts: _Part) -> _Part:
+        return _deepened(node, parts, spill)
+
+    def truth(node: ast.expr) -> ast.Compare:
+        return _at(ast.Compare(node, [ast.NotEq()], [_at(ast.Constant(0))]))
+
+    def logical(kind: type[ast.boolop]) -> Callable[[_Part, _Part], _Part]:
+        # C++'s a && b: `a and b` stops where C++ does, and is then a number
+        # or b, whose truth is the answer.
+        return lambda left, right: built(
+            truth(_at(ast.BoolOp(kind(), [left[0], right[0]]))), left, right
+        )
+
+    def expand(node: AST.AST) -> tuple[Sequence[AST.AST], Callable[..., Any]]:
+        if isinstance(node, AST.Literal):
+            value = node.value
+            return (), lambda: built(ast.Constant(value))
+        if isinstance(node, AST.Symbol):
+            name = node.name
+            return (), lambda: (symbol(name), 1)
+        if isinstance(node, AST.UnaryOperator):
+            unary = {"pos": ast.UAdd, "neg": ast.USub, "inv": ast.Not}[node.operator]
+            return (node.operand,), lambda operand: built(
+                ast.UnaryOp(unary(), operand[0]), operand
+            )
+        if isinstance(node, AST.BinaryOperator):
+            operator = node.operator
+            children = node._children()
+            if operator == "multi_out":
+                return children, _outputs(node)
+            if operator in _ARITHMETIC:
+                arithmetic = _ARITHMETIC[operator]
+                return children, lambda left, right: built(
+                    ast.BinOp(left[0], arithmetic(), right[0]), left, right
+                )
+            if operator in _COMPARISONS:
+                comparison = _COMPARISONS[operator]
+                return children, lambda left, right: built(
+                    ast.Compare(left[0], [comparison()], [right[0]]), left, right
+                )
+            if operator == "and":
+                return children, logical(ast.And)
+            if operator == "or":
+                return children, logical(ast.Or)
+            if operator == "xor":
+                return children, lambda left, right: built(
+                    ast.Compare(truth(left[0]), [ast.NotEq()], [truth(right[0])]),
+                    left,
+                    right,
+                )
+            if operator == "div":
+                return children, lambda left, right: built(
+                    call("divide", [left[0], right[0]])
+                    if exact
+                    else ast.BinOp(left[0], ast.Div(), right[0]),
+                    left,
+                    right,
+                )
+            if operator == "mod":
+                return children, lambda left, right: built(
+                    call(
+                        "fmod",
+                        [call("trunc", [left[0]]), call("trunc", [right[0]])],
+                    ),
+                    left,
+                    right,
+                )
+            assert operator == "pow"
+            return children, lambda left, right: built(
+                call("pow", [left[0], right[0]]), left, right
+            )
+        if isinstance(node, AST.Matrix):
+
+            def index(var: _Part, *indices: _Part) -> _Part:
+                node: ast.expr = var[0]
+                for where, _ in indices:
+                    node = _at(ast.Subscript(node, where, ast.Load()))
+                return built(node, var, *indices)
+
+            return node._children(), index
+        assert isinstance(node, AST.Call)
+        name = node.function
+        if name == "where":
+            return node.arguments, lambda test, body, orelse: built(
+                ast.IfExp(test[0], body[0], orelse[0]), test, body, orelse
+            )
+        if name not in _FAST:
+            display = FUNCTION_DISPLAY_NAMES.get(name, name)
+            msg = f'Function "{display}" is not supported in scalar Python.'
+            raise ValueError(msg)
+        return node.arguments, lambda *arguments: built(
+            call(name, [argument for argument, _ in arguments]), *arguments
+        )
+
+    expression: ast.expr = fold(tree, expand)[0]
+    return expression
+
+
+def function(tree: AST.AST) -> Callable[..., Any]:
+    """See :meth:`formulate.AST.AST.compile_python`, with ``scalar=True``."""
+    np = _numpy("compile_python(scalar=True)")
+    parameters = [_parameter(name) for name in tree.variables]
+    taken = set(parameters)
+    # The globals both functions call things by, which no parameter can hide.
+    prefix = _unused("_f", taken)
+
+    def global_name(name: str) -> str:
+        return f"{prefix}{name}"
+
+    def symbol(name: str) -> ast.expr:
+        if name in CONSTANT_VALUES:
+            return _at(ast.Constant(CONSTANT_VALUES[name]))
+        return _name(_parameter(name))
+
+    def body(exact: bool) -> list[ast.stmt]:
+        statements, spill = _locals(_unused("_t", taken))
+        result = _built(tree, symbol, global_name, exact, spill)
+        return [*statements, _at(ast.Return(result))]
+
+    exact_namespace = {global_name(name): f for name, f in _FAST.items()}
+    exact_namespace.update(
+        {global_name(name): getattr(np, spelling) for name, spelling in _EXACT.items()}
+    )
+    exact = _define(parameters, body(exact=True), exact_namespace)
+
+    def recompute(*arguments: Any) -> Any:
+        with np.errstate(all="ignore"):
+            return _plain(np, exact(*arguments))
+
+    # try:
+    #     <body>
+    # except _ERRORS:
+    #     return recompute(<parameters>)
+    retry = _at(
+        ast.Return(
+            _at(
+                ast.Call(
+                    _name(global_name("recompute")),
+                    [_name(parameter) for parameter in parameters],
+                    [],
+                )
+            )
+        )
+    )
+    handler = _at(ast.ExceptHandler(_name(global_name("errors")), None, [retry]))
+    attempt = _at(ast.Try(body(exact=False), [handler], [], []))
+    namespace: dict[str, Any] = {global_name(name): f for name, f in _FAST.items()}
+    namespace[global_name("recompute")] = recompute
+    namespace[global_name("errors")] = _ERRORS
+    return _define(parameters, [attempt], namespace)
+
+
+def _plain(np: Any, value: Any) -> Any:
+    """`value`, with NumPy's scalars made Python's."""
+    if isinstance(value, tuple):
+        return tuple(_plain(np, part) for part in value)
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,75 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Parsers generated ahead of time from the grammars, so that lark is not needed.
+
+``root_parser.py`` and ``numexpr_parser.py`` are written by ``nox -s generate``
+with lark's standalone tool: each is a copy of the part of lark's runtime that
+LALR parsing needs, plus the already-compiled tables for one grammar. Loading
+one therefore neither compiles a grammar nor imports lark.
+
+They are a cache, and the grammar in ``resources`` remains the definition. Each
+generated module records a digest of the grammar it was generated from, and one
+that no longer matches -- because the grammar was edited and the parsers not
+regenerated -- is ignored in favour of compiling the grammar as usual.
+"""
+
+import hashlib
+import importlib
+from collections.abc import Callable
+from typing import Any
+
+from ..toast import Parser, ParseTree
+
+
+class StandaloneParser:
+    """A generated parser, whose failures are reported through lark itself.
+
+    The generated modules raise their own copies of lark's exception classes,
+    not the ones :class:`~formulate.ParseError` wraps. A failure is the slow
+    path anyway, so the expression is parsed again by `fallback`, the parser
+    compiled from the grammar, which raises the genuine error.
+
+    :param parser: the generated ``Lark_StandAlone`` instance.
+    :param error: the base exception class of the module it came from.
+    :param fallback: returns the parser compiled from the grammar.
+    """
+
+    def __init__(
+        self, parser: Parser, error: type[Exception], fallback: Callable[[], Parser]
+    ):
+        self._parser = parser
+        self._error = error
+        self._fallback = fallback
+
+    def parse(self, text: str) -> ParseTree:
+        """Parse `text` into a tree, exactly as the compiled grammar would."""
+        try:
+            return self._parser.parse(text)
+        except self._error:
+            pass
+        return self._fallback().parse(text)
+
+
+def load(
+    name: str, grammar: str, fallback: Callable[[], Parser], **options: Any
+) -> StandaloneParser | None:
+    """Load the generated parser for `grammar`, if there is an up-to-date one.
+
+    :param name: which grammar this is, ``"root"`` or ``"numexpr"``.
+    :param grammar: the source of that grammar, as it is now.
+    :param fallback: returns the parser compiled from `grammar`, which reports
+        the errors.
+    :param options: passed on to the generated ``Lark_StandAlone``.
+    :returns: the parser, or None if it is missing or was generated from some
+        other version of `grammar`.
+    """
+    try:
+        module = importlib.import_module(f"{__name__}.{name}_parser")
+    except ImportError:
+        return None
+    digest = hashlib.sha256(grammar.encode()).hexdigest()
+    if digest != module.GRAMMAR_SHA256:
+        return None
+    return StandaloneParser(
+        module.Lark_StandAlone(**options), module.LarkError, fallback
+    )
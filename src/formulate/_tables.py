@@ -0,0 +1,112 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Compiled LALR tables, persisted between processes.
+
+Compiling a grammar into LALR tables takes tens of milliseconds. That is nothing
+once per long-lived process, but it is paid again by every short-lived one, and
+a batch system that starts thousands of them pays it thousands of times. So the
+first process to compile a grammar saves the tables to the user's cache
+directory, and every later one loads them from there instead.
+
+A cache file is named after a digest of everything that could make its contents
+wrong -- the grammar text, the options it was compiled with, and the lark and
+Python versions -- so a grammar change or an upgrade simply misses, rather than
+loading stale tables.
+Anything else that goes wrong, from a read-only directory to a truncated file
+left by a killed process, falls back to compiling: the cache can make the first
+parse faster, but never make it fail.
+
+The directory is ``$FORMULATE_CACHE_DIR`` if that is set, and otherwise the
+platform's per-user cache directory. Setting ``FORMULATE_CACHE_DIR`` to the
+empty string turns the cache off.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import lark
+
+_ENVIRONMENT_VARIABLE = "FORMULATE_CACHE_DIR"
+
+
+def cache_dir() -> Path | None:
+    """The directory compiled tables are kept in, or None if caching is off.
+
+    The directory is not created here; nothing needs it until a cache file is
+    written.
+    """
+    override = os.environ.get(_ENVIRONMENT_VARIABLE)
+    if override is not None:
+        return Path(override) if override else None
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "formulate"
+
+
+def grammar_digest(grammar: str) -> str:
+    """A digest of `grammar` and of everything its compiled tables depend on."""
+    key = "\n".join((grammar, lark.__version__, "{}.{}".format(*sys.version_info[:2])))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def load_parser(
+    name: str, grammar: str, transformer: Any = None, **options: Any
+) -> lark.Lark:
+    """Build an LALR parser for `grammar`, through the cache where possible.
+
+    :param name: what the grammar is called, used to name its cache file.
+    :param grammar: the grammar source.
+    :param transformer: applied on each reduction, as lark's option of that
+        name. It does not change the tables, so it is neither saved nor part of
+        the key, and parsers with and without one share a cache file.
+    :param options: passed on to :class:`lark.Lark`. They are saved along with
+        the tables, and are part of the key through their ``repr``, which must
+        therefore be the same in every process.
+    """
+    directory = cache_dir()
+    if directory is None:
+        return lark.Lark(grammar, parser="lalr", transformer=transformer, **options)
+
+    digest = grammar_digest(f"{grammar}\n{sorted(options.items())!r}")
+    path = directory / f"{name}-{digest[:32]}.lark"
+    try:
+        with path.open("rb") as file:
+            saved = pickle.load(file)
+        # What Lark.load does, except that it takes no options. This is the
+        # entry point the generated standalone parsers load through.
+        # pylint: disable-next=protected-access
+        parser: lark.Lark = lark.Lark._load_from_dict(  # type: ignore[no-untyped-call]
+            saved["data"], saved["memo"], transformer=transformer
+        )
+        return parser
+    # A missing file is the common case, but a corrupt one can fail in any way
+    # unpickling can, and every one of them means the same thing: compile.
+    except Exception:  # pylint: disable=broad-exception-caught
+        pass
+
+    parser = lark.Lark(grammar, parser="lalr", transformer=transformer, **options)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name and renamed into place, so that a
+        # process that starts reading while another is still writing sees
+        # either no file or a whole one.
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                parser.save(file, exclude_options=("transformer",))
+            Path(temporary).replace(path)
+        except BaseException:
+            Path(temporary).unlink()
+            raise
+    except OSError:
+        pass
+    return parser
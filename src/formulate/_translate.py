@@ -0,0 +1,273 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""Translating many expressions, remembering the results between runs.
+
+A nightly job that converts the same library of selections every run redoes
+the same work every run. :class:`TranslationCache` keeps each rendered result,
+or the error it gave, in an sqlite database, keyed on the source language, the
+target and the expression, so that the next run only parses what changed.
+
+Every entry is stamped with the formulate version and a digest of both
+grammars, and only entries with the installed formulate's stamp are read: a new
+version may parse or render differently, and a cache must never answer for a
+translation it would not make. Each version keeps its own entries, so that
+switching between two does not empty the cache for both, until
+:meth:`TranslationCache.prune` drops every other version's.
+"""
+
+import contextlib
+import hashlib
+import os
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from . import AST, _batch, _read_grammar
+from ._version import __version__
+from .exceptions import ParseError
+
+# How each target is rendered. The introspection targets put one name per line.
+_RENDERERS: dict[str, Callable[[AST.AST], str]] = {
+    "root": AST.AST.to_root,
+    "numexpr": AST.AST.to_numexpr,
+    "python": AST.AST.to_python,
+    "variables": lambda expression: "\n".join(expression.variables),
+    "named_constants": lambda expression: "\n".join(expression.named_constants),
+    "unnamed_constants": lambda expression: "\n".join(
+        map(str, expression.unnamed_constants)
+    ),
+}
+
+TARGETS = tuple(_RENDERERS)
+
+# The exceptions a translation can fail with, which are cached by name, and how
+# to make one again from its message. A ParseError read back from the cache
+# has no lark error.
+_ERRORS: dict[str, tuple[type[Exception], Callable[[str], Exception]]] = {
+    "ParseError": (ParseError, lambda message: ParseError(message, None)),
+    "SyntaxError": (SyntaxError, SyntaxError),
+    "ValueError": (ValueError, ValueError),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    stamp TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    expression TEXT NOT NULL,
+    error TEXT,
+    result TEXT NOT NULL,
+    PRIMARY KEY (stamp, source, target, expression)
+) WITHOUT ROWID
+"""
+
+# Well under the oldest sqlite's limit of 999 parameters per statement.
+_LOOKUP = 500
+
+# Translations written before they are committed. A cache loses at most these
+# if the process is killed; committing each one would be far slower.
+_COMMIT_EVERY = 1000
+
+
+def render(expression: AST.AST, target: str) -> str:
+    """Render `expression` as `target`, one of :data:`TARGETS`."""
+    return _RENDERERS[target](expression)
+
+
+def _translate(result: AST.AST | Exception, target: str) -> str | Exception:
+    if isinstance(result, Exception):
+        return result
+    try:
+        return render(result, target)
+    # Some expressions parse but have no equivalent in the target.
+    except ValueError as error:
+        return error
+
+
+def _stamp() -> str:
+    digest = hashlib.sha256()
+    for part in (__version__, _read_grammar("root"), _read_grammar("numexpr")):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return f"{__version__}:{digest.hexdigest()}"
+
+
+class TranslationCache:
+    """Translations kept in an sqlite database at `path`, created if need be.
+
+    A context manager, which saves what has been written and closes the
+    database on exit.
+
+    :param path: the database file. Several processes may share one.
+    """
+
+    def __init__(self, path: "str | os.PathLike[str]") -> None:
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        self._stamp = _stamp()
+        self._connection = sqlite3.connect(path, timeout=60)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def __enter__(self) -> "TranslationCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Save what has been written, and close the database."""
+        self._connection.commit()
+        self._connection.close()
+
+    @property
+    def lookups(self) -> int:
+        """How many translations have been looked for, found or not."""
+        return self.hits + self.misses
+
+    def prune(self) -> int:
+        """Drop the entries written by any other formulate version, or with
+        other grammars, and return how many there were."""
+        with self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM translations WHERE stamp != ?", (self._stamp,)
+            )
+        self._unsaved = 0
+        return cursor.rowcount
+
+    def get_many(
+        self, source: str, target: str, expressions: list[str]
+    ) -> dict[str, str | Exception]:
+        """The cached translations of those `expressions` that have one."""
+        found: dict[str, str | Exception] = {}
+        for i in range(0, len(expressions), _LOOKUP):
+            chunk = expressions[i : i + _LOOKUP]
+            rows = self._connection.execute(
+                "SELECT expression, error, result FROM translations"
+                " WHERE stamp = ? AND source = ? AND target = ?"
+                f" AND expression IN ({', '.join('?' * len(chunk))})",
+                (self._stamp, source, target, *chunk),
+            )
+            for expression, error, result in rows:
+                found[expression] = (
+                    result if error is None else _ERRORS[error][1](result)
+                )
+        self.hits += len(found)
+        self.misses += len(expressions) - len(found)
+        return found
+
+    def put_many(
+        self, source: str, target: str, translations: Iterable[tuple[str, Any]]
+    ) -> None:
+        """Cache each ``(expression, translation or exception)`` pair."""
+        rows = []
+        for expression, translation in translations:
+            error = None
+            if isinstance(translation, Exception):
+                error = next(
+                    name
+                    for name, (kind, _) in _ERRORS.items()
+                    if isinstance(translation, kind)
+                )
+            rows.append(
+                (self._stamp, source, target, expression, error, str(translation))
+            )
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self._unsaved += len(rows)
+        if self._unsaved >= _COMMIT_EVERY:
+            self._connection.commit()
+            self._unsaved = 0
+
+
+def translate_many(
+    source: str,
+    target: str,
+    expressions: Iterable[str],
+    engine: str,
+    jobs: int | None,
+    cache: TranslationCache | None,
+    *,
+    forget: bool = False,
+) -> Iterator[str | Exception]:
+    """Translate each of `expressions`, yielding the result or the exception in
+    order. Each distinct expression is looked up in `cache`, if there is one,
+    and only parsed if it is missing.
+
+    :param forget: see :func:`formulate._batch.deduplicated`.
+    """
+    jobs = _batch.resolve_jobs(jobs)
+    with _batch.Parser(source, engine, jobs) as parser:
+
+        def handle(new: list[str]) -> list[str | Exception]:
+            done = {} if cache is None else cache.get_many(source, target, new)
+            missing = [exp for exp in new if exp not in done]
+            if missing:
+                translated = [
+                    _translate(result, target) for result in parser.parse(missing)
+                ]
+                if cache is not None:
+                    cache.put_many(
+                        source, target, zip(missing, translated, strict=True)
+                    )
+                done.update(zip(missing, translated, strict=True))
+            return [done[exp] for exp in new]
+
+        yield from _batch.deduplicated(expressions, handle, jobs, forget=forget)
+
+
+class Translations(Iterator[str | Exception]):
+    """The translations :func:`formulate.translate_many` yields, in order, and
+    how many of them it found in its cache so far.
+
+    Both counts are of distinct expressions looked up, and stay at zero without
+    a cache.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        target: str,
+        expressions: Iterable[str],
+        engine: str,
+        jobs: int | None,
+        path: "str | os.PathLike[str] | None",
+    ) -> None:
+        self._cache: TranslationCache | None = None
+        self._results = self._translate(source, target, expressions, engine, jobs, path)
+
+    def _translate(
+        self,
+        source: str,
+        target: str,
+        expressions: Iterable[str],
+        engine: str,
+        jobs: int | None,
+        path: "str | os.PathLike[str] | None",
+    ) -> Iterator[str | Exception]:
+        with (
+            TranslationCache(path) if path is not None else contextlib.nullcontext()
+        ) as cache:
+            self._cache = cache
+            yield from translate_many(source, target, expressions, engine, jobs, cache)
+
+    def __next__(self) -> str | Exception:
+        return next(self._results)
+
+    @property
+    def hits(self) -> int:
+        """How many of the expressions looked up were in the cache."""
+        return 0 if self._cache is None else self._cache.hits
+
+    @property
+    def lookups(self) -> int:
+        """How many expressions were looked up in the cache."""
+        return 0 if self._cache is None else self._cache.lookups
+
+
+def prune(path: "str | os.PathLike[str]") -> int:
+    """:meth:`TranslationCache.prune` the cache at `path`."""
+    with TranslationCache(path) as cache:
+        return cache.prune()
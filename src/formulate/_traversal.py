@@ -1,14 +1,16 @@
 # Licensed under a 3-clause BSD style license, see LICENSE.
 
-"""The one tree walk in the package.
+"""The tree walks in the package.
 
 Everything that combines a parse tree or an AST bottom-up goes through `fold`,
-so that depth is bounded by memory rather than by the interpreter stack. Nothing
-here or in its callers may recurse: a long chain of operators comes back from
+and everything that renders one as text through `chunks` or `emit_each`, so that
+depth is bounded by memory rather than by the interpreter stack. Nothing here
+or in its callers may recurse: a long chain of operators comes back from
 `to_root` fully parenthesized, and re-parsing that nests one level per pair.
 """
 
-from collections.abc import Callable, Sequence
+import sys
+from collections.abc import Callable, Container, Iterator, Sequence
 from typing import Any, TypeVar
 
 Node = TypeVar("Node")
@@ -54,3 +56,125 @@ def fold(
         stack.append((build, len(children)))
         stack.extend(reversed(children))
     return results[0]
+
+
+def chunks(
+    fragments: Sequence[str | Node],
+    expand: Callable[[Node], Sequence[str | Node]],
+    size: int,
+) -> Iterator[str]:
+    """Render `fragments` as text, yielding it `size` fragments at a time.
+
+    Fragments are strings, written as they are, and nodes, which `expand`
+    decomposes into fragments of their own: the strings the node writes, in
+    order, with each child in the place its own text goes. Every string is
+    written out once and joined with its neighbours just before it is yielded,
+    where building each node's text from its children's would copy the text of
+    the deepest node once per level above it. As with `fold`, `expand` runs on
+    a node before its children, so errors come out in the order a recursive
+    walk would give -- after the text that precedes them has been yielded.
+
+    Besides the chunk in hand, memory holds the fragments still to come of the
+    nodes being written, never the text already yielded. Nodes therefore must
+    not themselves be strings.
+    """
+    out: list[str] = []
+    stack: list[Any] = list(reversed(fragments))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            if len(out) >= size:
+                yield "".join(out)
+                out.clear()
+        else:
+            # Reversed, so that the fragments pop left to right.
+            stack.extend(reversed(expand(item)))
+    if out:
+        yield "".join(out)
+
+
+def emit(root: Node, expand: Callable[[Node], Sequence[str | Node]]) -> str:
+    """Render a tree as one string, in time linear in its length. See `chunks`."""
+    return "".join(chunks((root,), expand, sys.maxsize))
+
+
+class _Span:
+    """Put on a stack underneath the fragments of a shared node, to note where
+    its text ends once they have all been written."""
+
+    __slots__ = ("key", "start")
+
+    def __init__(self, key: int, start: int) -> None:
+        self.key = key
+        self.start = start
+
+
+def emit_each(
+    fragments: Sequence[Sequence[str | Node]],
+    expands: Sequence[Callable[[Node], Sequence[str | Node]]],
+    errors: tuple[type[Exception], ...],
+    shared: Container[int] = frozenset(),
+) -> list[str | Exception]:
+    """Render one tree several ways in a single walk: ``fragments[i]`` with
+    ``expands[i]``, as `emit` would, for each `i`.
+
+    Every way must list the same nodes in the same order, both in `fragments`
+    and in what it expands each node to; only the text around them differs.
+    Each way writes out its own text up to the next node, which is then
+    expanded once for every way still going. A way whose `expand` raises one
+    of `errors` drops out there, with that exception for its result, just as
+    `emit` would have raised it.
+
+    A node whose ``id`` is in `shared` is expanded only where it is first
+    reached. Each way notes where its text went, joins it the first time the
+    node comes round again, and from then on copies that string, so each
+    occurrence costs one fragment rather than a walk of the subtree.
+    """
+    results: list[str | Exception] = [""] * len(expands)
+    stacks: list[list[Any]] = [list(reversed(each)) for each in fragments]
+    outs: list[list[str]] = [[] for _ in expands]
+    # For each way, each shared node written so far: where its text is in
+    # `out`, until it is needed again and joined.
+    written: list[dict[int, str | tuple[int, int]]] = [{} for _ in expands]
+    live = list(range(len(expands)))
+    while live:
+        node = None
+        for i in live:
+            stack, out = stacks[i], outs[i]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, str):
+                    out.append(item)
+                elif isinstance(item, _Span):
+                    written[i][item.key] = (item.start, len(out))
+                else:
+                    node = item
+                    break
+        # Every way runs out of nodes at the same point: the end of the tree.
+        if node is None:
+            break
+        key = id(node)
+        for i in list(live):
+            stack, out, seen = stacks[i], outs[i], written[i]
+            # A node is done with before it next occurs, never being inside
+            # itself, so its span is complete here.
+            text = seen.get(key)
+            if text is not None:
+                if not isinstance(text, str):
+                    start, end = text
+                    text = seen[key] = "".join(out[start:end])
+                out.append(text)
+                continue
+            try:
+                expanded = expands[i](node)
+            except errors as error:
+                results[i] = error
+                live.remove(i)
+                continue
+            if key in shared:
+                stack.append(_Span(key, len(out)))
+            stack.extend(reversed(expanded))
+    for i in live:
+        results[i] = "".join(outs[i])
+    return results
@@ -6,12 +6,34 @@ One input option says what to parse and one output option says what to print,
 for example::
 
     formulate --from-root '(A && B) || TMath::Sqrt(A)' --to-numexpr
+
+Given ``-`` as the expression, it instead converts standard input line by line::
+
+    formulate --from-root - --to-numexpr < selections.txt > converted.txt
+
+Each input line gives exactly one output line, so the two files stay aligned: a
+blank line gives a blank one, and a line that fails to convert gives an empty
+one, with the error reported on standard error, its later lines indented under
+the first, and the command carries on and exits with status 1. Options
+that print several names print them on the one line, separated by spaces.
+Lines are read and written as they come, so memory does not grow with the
+input and each output line is flushed as soon as it is converted, even into a
+pipe, and ``--jobs N`` converts them in ``N`` worker processes without
+changing the order of the output.
+
+``--cache PATH`` keeps every conversion in an sqlite database at ``PATH``, so
+that the next run with the same database only parses what it has not seen
+before, and reports on standard error how many conversions it found there.
 """
 
 import argparse
+import collections
+import contextlib
 import sys
+from collections.abc import Iterable, Iterator
+from typing import TextIO
 
-from . import from_numexpr, from_root
+from . import _translate
 from ._version import __version__
 
 _EPILOG = """\
@@ -19,18 +41,17 @@ examples:
   formulate --from-root '(A && B) || TMath::Sqrt(A)' --to-numexpr
   formulate --from-numexpr '(A & B) | sqrt(A)' --to-root
   formulate --from-root 'TMath::Sqrt(x) > 5*pi' --variables
+  formulate --from-root - --to-numexpr --jobs 4 < selections.txt
+  formulate --from-root - --to-numexpr --cache ~/.formulate.db < selections.txt
 """
 
+# The expression that stands for standard input, one expression per line.
+_STDIN = "-"
 
-def parse_args(args: list[str]) -> str:
-    """Run one conversion and return what the command should print.
 
-    :param args: the command-line arguments, without the program name.
-    :returns: the converted expression, or the requested names one per line.
-    :raises SystemExit: if `args` are not a valid combination, or ask for
-        ``--help`` or ``--version``.
-    """
+def _arguments(args: list[str], *, stdin: bool) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
+        prog="formulate",
         description="Convert between different styles of expressions.",
         epilog=_EPILOG,
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -41,75 +62,197 @@ def parse_args(args: list[str]) -> str:
 
     from_group = parser.add_mutually_exclusive_group(required=True)
     from_group.add_argument(
-        "--from-root", metavar="EXPRESSION", help="parse a ROOT TTreeFormula expression"
+        "--from-root",
+        metavar="EXPRESSION",
+        help="parse a ROOT TTreeFormula expression, or one per line of standard "
+        "input if EXPRESSION is '-'",
     )
     from_group.add_argument(
-        "--from-numexpr", metavar="EXPRESSION", help="parse a NumExpr expression"
+        "--from-numexpr",
+        metavar="EXPRESSION",
+        help="parse a NumExpr expression, or one per line of standard input if "
+        "EXPRESSION is '-'",
     )
 
     to_group = parser.add_mutually_exclusive_group(required=True)
-    to_group.add_argument(
-        "--to-root", action="store_true", help="print it as a ROOT expression"
-    )
-    to_group.add_argument(
-        "--to-numexpr", action="store_true", help="print it as a NumExpr expression"
-    )
-    to_group.add_argument(
-        "--to-python",
-        action="store_true",
-        help="print it as Python, using NumPy functions",
-    )
-    to_group.add_argument(
-        "--variables",
-        action="store_true",
-        help="print the variables it reads, one per line",
-    )
-    to_group.add_argument(
-        "--named-constants",
-        action="store_true",
-        help="print the named constants it uses, one per line",
+    for target, help_text in (
+        ("root", "print it as a ROOT expression"),
+        ("numexpr", "print it as a NumExpr expression"),
+        ("python", "print it as Python, using NumPy functions"),
+    ):
+        to_group.add_argument(
+            f"--to-{target}",
+            dest="target",
+            action="store_const",
+            const=target,
+            help=help_text,
+        )
+    for target, help_text in (
+        ("variables", "print the variables it reads, one per line"),
+        ("named_constants", "print the named constants it uses, one per line"),
+        ("unnamed_constants", "print the numeric literals it contains, one per line"),
+    ):
+        to_group.add_argument(
+            f"--{target.replace('_', '-')}",
+            dest="target",
+            action="store_const",
+            const=target,
+            help=help_text,
+        )
+
+    parser.add_argument(
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="with '-', convert in N worker processes; the output stays in input order",
     )
-    to_group.add_argument(
-        "--unnamed-constants",
-        action="store_true",
-        help="print the numeric literals it contains, one per line",
+    parser.add_argument(
+        "--cache",
+        metavar="PATH",
+        help="keep conversions in an sqlite database at PATH, and reuse them on "
+        "later runs",
     )
 
     parsed_args = parser.parse_args(args)
-    if parsed_args.from_root is not None:
-        expression = from_root(parsed_args.from_root)
-    elif parsed_args.from_numexpr is not None:
-        expression = from_numexpr(parsed_args.from_numexpr)
-    else:  # pragma: no cover
-        msg = (
-            "This should never happen. "
-            "Please report this issue to the Formulate developers."
-        )
-        raise NotImplementedError(msg)
-
-    if parsed_args.to_root:
-        result = expression.to_root()
-    elif parsed_args.to_numexpr:
-        result = expression.to_numexpr()
-    elif parsed_args.to_python:
-        result = expression.to_python()
-    elif parsed_args.variables:
-        result = "\n".join(expression.variables)
-    elif parsed_args.named_constants:
-        result = "\n".join(expression.named_constants)
-    elif parsed_args.unnamed_constants:
-        result = "\n".join(map(str, expression.unnamed_constants))
-    else:  # pragma: no cover
-        msg = (
-            "This should never happen. "
-            "Please report this issue to the Formulate developers."
+    streaming = _STDIN in (parsed_args.from_root, parsed_args.from_numexpr)
+    if streaming and not stdin:
+        parser.error(
+            "'-' reads standard input, which only the formulate command does; "
+            "use formulate.translate_many instead"
         )
-        raise NotImplementedError(msg)
+    if parsed_args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if parsed_args.jobs != 1 and not streaming:
+        parser.error("--jobs only applies to reading standard input, with '-'")
+    return parsed_args
+
+
+def _source(parsed_args: argparse.Namespace) -> tuple[str, str]:
+    if parsed_args.from_root is not None:
+        return "root", parsed_args.from_root
+    return "numexpr", parsed_args.from_numexpr
+
+
+def _cache(
+    parsed_args: argparse.Namespace,
+) -> contextlib.AbstractContextManager[_translate.TranslationCache | None]:
+    if parsed_args.cache is None:
+        return contextlib.nullcontext()
+    return _translate.TranslationCache(parsed_args.cache)
 
+
+def _convert(
+    parsed_args: argparse.Namespace, cache: _translate.TranslationCache | None
+) -> str:
+    source, expression = _source(parsed_args)
+    [result] = _translate.translate_many(
+        source, parsed_args.target, [expression], "lark", 1, cache
+    )
+    if isinstance(result, Exception):
+        raise result
     return result
 
 
+def _convert_lines(
+    parsed_args: argparse.Namespace,
+    cache: _translate.TranslationCache | None,
+    lines: Iterable[str],
+    out: TextIO,
+    err: TextIO,
+) -> int:
+    """Write one line to `out` per line of `lines`, and return the exit status."""
+    source, _ = _source(parsed_args)
+    # Whether each line read so far is blank, in order. Blank lines are not
+    # expressions, so they are never translated; each result is written after
+    # the blank lines that came before its own.
+    blank: collections.deque[bool] = collections.deque()
+
+    def expressions() -> Iterator[str]:
+        for line in lines:
+            expression = line.rstrip("\r\n")
+            blank.append(not expression.strip())
+            if not blank[-1]:
+                yield expression
+
+    # Throughput is the point here, and the fast engine gives the same results
+    # and the same errors as the default one.
+    results = _translate.translate_many(
+        source,
+        parsed_args.target,
+        expressions(),
+        "fast",
+        parsed_args.jobs,
+        cache,
+        forget=True,
+    )
+
+    status = number = 0
+    for result in results:
+        # This result's line has been read, and any blank ones before it.
+        while blank.popleft():
+            number += 1
+            out.write("\n")
+        number += 1
+        if isinstance(result, Exception):
+            err.write(_report(number, result))
+            status = 1
+            line = ""
+        else:
+            # Several names go on the one line, so that lines stay aligned.
+            line = result.replace("\n", " ")
+        out.write(f"{line}\n")
+        # Whatever reads the output may be waiting on this line, so it must
+        # not sit in the buffer until the next one is ready.
+        out.flush()
+    # Only blank lines are left once every result is in.
+    out.write("\n" * len(blank))
+    out.flush()
+    return status
+
+
+def _report(number: int, error: Exception) -> str:
+    """`error` reported against line `number`, as one entry: a ParseError runs
+    over several lines, which go indented under the first, without the blank
+    ones between them."""
+    first, *rest = [line for line in str(error).splitlines() if line.strip()] or [""]
+    return "".join(
+        [f"formulate: line {number}: {first}\n"] + [f"    {line}\n" for line in rest]
+    )
+
+
+def parse_args(args: list[str]) -> str:
+    """Run one conversion and return what the command should print.
+
+    :param args: the command-line arguments, without the program name.
+    :returns: the converted expression, or the requested names one per line.
+    :raises SystemExit: if `args` are not a valid combination, ask for
+        ``--help`` or ``--version``, or give ``-`` as the expression, which
+        only the command itself reads.
+    """
+    parsed_args = _arguments(args, stdin=False)
+    with _cache(parsed_args) as cache:
+        return _convert(parsed_args, cache)
+
+
 def main() -> None:
     """Entry point of the ``formulate`` command."""
-    sys.stdout.write(parse_args(sys.argv[1:]))
-    sys.stdout.write("\n")
+    parsed_args = _arguments(sys.argv[1:], stdin=True)
+    with _cache(parsed_args) as cache:
+        if _STDIN in (parsed_args.from_root, parsed_args.from_numexpr):
+            status = _convert_lines(
+                parsed_args, cache, sys.stdin, sys.stdout, sys.stderr
+            )
+        else:
+            sys.stdout.write(_convert(parsed_args, cache))
+            sys.stdout.write("\n")
+            status = 0
+        if cache is not None:
+            lookups = cache.lookups
+            rate = f" ({cache.hits / lookups:.0%})" if lookups else ""
+            sys.stderr.write(
+                f"formulate: found {cache.hits} of {lookups} conversions in "
+                f"{parsed_args.cache}{rate}\n"
+            )
+    if status:
+        sys.exit(status)
@@ -0,0 +1,176 @@
+# Licensed under a 3-clause BSD style license, see LICENSE.
+
+"""A parsed expression flattened into a handful of arrays.
+
+An :class:`~formulate.AST.AST` is one Python object per node, and a Python
+object costs several dozen bytes before it holds anything, so a ten-thousand
+term expression takes a couple of megabytes. :class:`CompactAST` holds the same
+tree in postfix order as one byte and one machine integer per node, with every
+name and number stored once, which is what to keep when a great many
+expressions have to stay in memory at once:
+
+.. code-block:: pycon
+
+    >>> import formulate
+    >>> from formulate.compact import CompactAST
+    >>> compact = CompactAST.from_ast(formulate.from_root("x + y * x"))
+    >>> len(compact), compact.names
+    (5, ('add', 'mul', 'x', 'y'))
+    >>> compact.to_numexpr()
+    '(x + (y * x))'
+
+It renders through the AST's own serializers, so the text is identical to what
+the tree it came from gives; the tree is rebuilt for the call and dropped after.
+"""
+
+import sys
+from array import array
+from dataclasses import dataclass
+
+from . import AST
+
+# What each node is, one byte apiece. The operand next to it says which one:
+# an index into `literals` or `names`, or for an index expression, how many
+# indices it has.
+_LITERAL = 0
+_SYMBOL = 1
+_UNARY = 2
+_BINARY = 3
+_MATRIX = 4
+_CALL = 5
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class CompactAST:
+    """An expression tree stored as arrays, in postfix order.
+
+    Build one with :meth:`from_ast`, and get the tree back with :meth:`to_ast`.
+    Each node is an entry in `opcodes`, saying what kind of node it is, and the
+    entry at the same position in `operands`: the position of its value in
+    `literals`, or of its name, operator or function in `names`, or the number
+    of indices of an index expression. A function call's argument count is the
+    next entry of `arities`. A node's children come just before it, so the root
+    is last.
+
+    Like the tree, it is immutable and not comparable; compare renderings.
+    """
+
+    opcodes: "array[int]"
+    operands: "array[int]"
+    arities: "array[int]"
+    names: tuple[str, ...]
+    literals: tuple[int | float, ...]
+
+    __eq__ = AST.AST.__eq__
+    __hash__ = None  # type: ignore[assignment]
+
+    @classmethod
+    def from_ast(cls, tree: AST.AST) -> "CompactAST":
+        """Flatten `tree`, which is left as it is."""
+        opcodes = array("B")
+        operands = array("I")
+        arities = array("I")
+        names: dict[str, int] = {}
+        # Keyed on the spelling, so that 1 and 1.0, which are equal, stay apart.
+        spellings: dict[str, int] = {}
+        literals: list[int | float] = []
+
+        # Parents first, with the children taken right to left, is postfix
+        # order backwards: written out that way and reversed at the end, the
+        # walk is a single loop. It runs every time an expression is pickled.
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, AST.BinaryOperator):
+                opcode, operand = _BINARY, names.setdefault(node.operator, len(names))
+                stack += (node.left, node.right)
+            elif isinstance(node, AST.Symbol):
+                opcode, operand = _SYMBOL, names.setdefault(node.name, len(names))
+            elif isinstance(node, AST.Literal):
+                opcode = _LITERAL
+                operand = spellings.setdefault(repr(node.value), len(literals))
+                if operand == len(literals):
+                    literals.append(node.value)
+            elif isinstance(node, AST.UnaryOperator):
+                opcode, operand = _UNARY, names.setdefault(node.operator, len(names))
+                stack.append(node.operand)
+            elif isinstance(node, AST.Matrix):
+                opcode, operand = _MATRIX, len(node.indices)
+                stack += (node.var, *node.indices)
+            else:
+                assert isinstance(node, AST.Call)
+                opcode, operand = _CALL, names.setdefault(node.function, len(names))
+                arities.append(len(node.arguments))
+                stack += node.arguments
+            opcodes.append(opcode)
+            operands.append(operand)
+        opcodes.reverse()
+        operands.reverse()
+        arities.reverse()
+        return cls(opcodes, operands, arities, tuple(names), tuple(literals))
+
+    def to_ast(self) -> AST.AST:
+        """Rebuild the tree, sharing the names and numbers between its nodes."""
+        names, literals = self.names, self.literals
+        arities = iter(self.arities)
+        stack: list[AST.AST] = []
+        for opcode, operand in zip(self.opcodes, self.operands, strict=True):
+            if opcode == _LITERAL:
+                stack.append(AST.Literal(literals[operand]))
+            elif opcode == _SYMBOL:
+                stack.append(AST.Symbol(names[operand]))
+            elif opcode == _UNARY:
+                stack[-1] = AST.UnaryOperator(names[operand], stack[-1])
+            elif opcode == _BINARY:
+                right = stack.pop()
+                stack[-1] = AST.BinaryOperator(names[operand], stack[-1], right)
+            elif opcode == _MATRIX:
+                indices = _pop(stack, operand)
+                stack[-1] = AST.Matrix(stack[-1], indices)
+            else:
+                stack.append(AST.Call(names[operand], _pop(stack, next(arities))))
+        (tree,) = stack
+        return tree
+
+    def __len__(self) -> int:
+        """The number of nodes."""
+        return len(self.opcodes)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory held by the arrays and the pools, as ``sys.getsizeof`` counts it.
+
+        Names and numbers that other objects share are counted all the same.
+        """
+        return sum(
+            sys.getsizeof(part)
+            for part in (
+                self.opcodes,
+                self.operands,
+                self.arities,
+                self.names,
+                self.literals,
+                *self.names,
+                *self.literals,
+            )
+        )
+
+    def to_root(self, *, parens: str = "full") -> str:
+        """Render as ROOT; see :meth:`formulate.AST.AST.to_root`."""
+        return self.to_ast().to_root(parens=parens)
+
+    def to_numexpr(self, *, parens: str = "full") -> str:
+        """Render as NumExpr; see :meth:`formulate.AST.AST.to_numexpr`."""
+        return self.to_ast().to_numexpr(parens=parens)
+
+    def to_python(self, *, parens: str = "full") -> str:
+        """Render as Python; see :meth:`formulate.AST.AST.to_python`."""
+        return self.to_ast().to_python(parens=parens)
+
+
+def _pop(stack: list[AST.AST], count: int) -> tuple[AST.AST, ...]:
+    """Take the last `count` entries off `stack`, in order."""
+    split = len(stack) - count
+    popped = tuple(stack[split:])
+    del stack[split:]
+    return popped
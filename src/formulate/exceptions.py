@@ -11,8 +11,11 @@ included as well, and kept on the exception as
 """
 
 import re
+import sys
+from typing import TYPE_CHECKING
 
-import lark
+if TYPE_CHECKING:  # pragma: no cover
+    import lark
 
 
 class ParseError(Exception):
@@ -21,19 +24,22 @@ class ParseError(Exception):
     :param message: the human-readable report: where parsing stopped, any
         suggestions, and the underlying lark message.
     :param lark_error: the error raised by lark, kept for programmatic access
-        to details such as the line and column.
+        to details such as the line and column, or None if the error was read
+        back from a translation cache rather than raised by a parse.
     """
 
-    def __init__(self, message: str, lark_error: lark.LarkError):
+    def __init__(self, message: str, lark_error: "lark.LarkError | None"):
         super().__init__(message)
         self.lark_error = lark_error
 
 
 def _build_parse_error(
-    exp: str, error: lark.LarkError, suggestions: list[str]
+    exp: str, error: "lark.LarkError", suggestions: list[str]
 ) -> ParseError:
     msg = ""
-    if isinstance(error, lark.UnexpectedInput):
+    # Catching ParseError must not load lark, so it is not imported above; but
+    # `error` came from lark, which is therefore loaded by now.
+    if isinstance(error, sys.modules["lark"].UnexpectedInput):
         msg += "There was an error parsing the expression at or near this location\n"
         msg += error.get_context(exp)
     if suggestions:
@@ -47,7 +53,7 @@ def _build_parse_error(
     return ParseError(msg, error)
 
 
-def debug_root(exp: str, error: lark.LarkError) -> ParseError:
+def debug_root(exp: str, error: "lark.LarkError") -> ParseError:
     """Turn a lark failure on a ROOT expression into a :class:`ParseError`.
 
     Suggests the ROOT spelling of the logical operators when the expression
@@ -73,7 +79,7 @@ def debug_root(exp: str, error: lark.LarkError) -> ParseError:
     return _build_parse_error(exp, error, suggestions)
 
 
-def debug_numexpr(exp: str, error: lark.LarkError) -> ParseError:
+def debug_numexpr(exp: str, error: "lark.LarkError") -> ParseError:
     """Turn a lark failure on a NumExpr expression into a :class:`ParseError`.
 
     Suggests the NumExpr spelling of the logical operators when the expression
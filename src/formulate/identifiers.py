@@ -13,15 +13,12 @@ may see onto one canonical name, which is what makes ``TMath::ATan2``,
 ``atan2`` and ``arctan2`` the same function, and ``e_num``, ``e_euler`` and
 ``TMath::E()`` the same constant.
 
-Numeric values for the physical constants come from :mod:`hepunits`, so they
+Numeric values for the physical constants are those of :mod:`hepunits`, so they
 agree with the rest of Scikit-HEP.
 """
 
 import math
 
-from hepunits import constants
-from hepunits.units import coulomb, e_SI, electronvolt, joule, kelvin, m, mole, s
-
 UNARY_OPERATORS = {"pos", "neg", "inv"}
 """Canonical names of the operators a :class:`~formulate.AST.UnaryOperator` may use."""
 
@@ -477,14 +474,17 @@ NUMEXPR_CONSTANTS = {
     "log10e": math.log10(math.e),
     "deg2rad": math.pi / 180,
     "rad2deg": 180 / math.pi,
-    "avogadro": constants.Avogadro / (1 / mole),
-    "k_boltzmann": constants.k_Boltzmann / (joule / kelvin),
-    "c_light": constants.c_light / (m / s),
-    "eminus": constants.eminus / (coulomb),
-    "eplus": -constants.eminus / (coulomb),
-    "h_planck": constants.h_Planck / (electronvolt * s / e_SI),
-    "hbar": constants.hbar / (electronvolt * s / e_SI),
-    "hbarc": constants.hbarc / (electronvolt * m / e_SI),
+    # hepunits' values converted to SI, written out rather than computed so that
+    # hepunits is not imported just for these eight numbers. The test suite
+    # recomputes each of them from hepunits and checks they still agree.
+    "avogadro": 6.02214076e23,  # Avogadro / (1 / mole)
+    "k_boltzmann": 1.380649e-23,  # k_Boltzmann / (joule / kelvin)
+    "c_light": 299792458.0,  # c_light / (m / s)
+    "eminus": -1.602176634e-19,  # eminus / coulomb
+    "eplus": 1.602176634e-19,  # -eminus / coulomb
+    "h_planck": 6.62607015e-34,  # h_Planck / (electronvolt * s / e_SI)
+    "hbar": 1.0545718176461565e-34,  # hbar / (electronvolt * s / e_SI)
+    "hbarc": 3.1615267734966903e-26,  # hbarc / (electronvolt * m / e_SI)
 }
 """The value substituted for each constant when rendering to NumExpr, which has no
 symbolic constants of its own."""
@@ -1,6 +1,6 @@
 # Licensed under a 3-clause BSD style license, see LICENSE.
 
-"""Conversion of a lark parse tree into the backend-neutral AST.
+"""Conversion of a parse tree into the backend-neutral AST.
 
 This is where a language's surface syntax stops mattering: namespaces
 (``TMath::``), the trailing ``$`` on ROOT's array functions, and the function
@@ -14,9 +14,7 @@ import math
 from ast import literal_eval
 from collections.abc import Callable, Sequence
 from keyword import iskeyword
-from typing import Any
-
-import lark
+from typing import Any, Protocol
 
 from . import AST
 from ._traversal import fold
@@ -32,14 +30,37 @@ from .identifiers import (
 )
 
 
-def _get_var_name(node: lark.Tree | lark.Token) -> str:
-    while isinstance(node, lark.Tree):
-        node = node.children[0]
-    var_name = str(node)
+class ParseTree:
+    """One node of a parse tree, as both kinds of parser build it.
+
+    Lark's own ``Tree`` is not used, because the generated parsers in
+    :mod:`formulate._standalone` carry a copy of it that is a different class.
+    Both kinds are told to build this instead, which is all `toast` needs.
+
+    :param data: the name of the rule, or of its alias.
+    :param children: the child nodes and tokens, in order.
+    """
+
+    __slots__ = ("children", "data")
+    __match_args__ = ("data", "children")
+
+    def __init__(self, data: str, children: list[Any]):
+        self.data = data
+        self.children = children
+
+
+class Parser(Protocol):
+    """Anything that parses text into a :class:`ParseTree`."""
+
+    def parse(self, text: str) -> ParseTree: ...  # pragma: no cover
+
+
+def _get_var_name(token: Any) -> str:
+    var_name = str(token)
     return CONSTANTS_ALIASES.get(var_name, var_name)
 
 
-def _get_raw_function_name(node: lark.Tree) -> list[str]:
+def _get_raw_function_name(node: ParseTree) -> list[str]:
     parts = []
     while True:
         parts.append(str(node.children[0]))
@@ -49,9 +70,14 @@ def _get_raw_function_name(node: lark.Tree) -> list[str]:
     return parts
 
 
-def _get_function_name(node: lark.Tree) -> str:
+def _resolve_function_name(parts: list[str]) -> str:
+    """The canonical name of the function or constant called as `parts`.
+
+    :param parts: the ``::``-separated pieces of the name as written.
+    :raises ValueError: if it names no known function or constant.
+    """
     pieces = []
-    for part in _get_raw_function_name(node):
+    for part in parts:
         pieces.extend(part.replace(".", "::").split("::"))
     if len(pieces) == 1:
         name = pieces[0]
@@ -82,33 +108,82 @@ def _get_function_name(node: lark.Tree) -> str:
     return name
 
 
+def _get_function_name(node: ParseTree) -> str:
+    return _resolve_function_name(_get_raw_function_name(node))
+
+
+def _symbol(var_name: str) -> AST.AST:
+    """The node for a bare name, which has already had its alias resolved.
+
+    :raises SyntaxError: if `var_name` cannot be a symbol in any backend.
+    """
+    if var_name in ("True", "False"):
+        var_name = var_name.lower()  # This makes it not a keyword
+    # Bare ROOT $ functions (e.g. Length$, Sum$) used without parens
+    if var_name.endswith("$"):
+        func_name = var_name.removesuffix("$").lower()
+        if func_name in FUNCTIONS:
+            return AST.Call(func_name, ())
+    if any(not part.isidentifier() or iskeyword(part) for part in var_name.split(".")):
+        msg = f'The symbol "{var_name}" is not a valid symbol.'
+        raise SyntaxError(msg)
+    return AST.Symbol(var_name)
+
+
+def _literal(text: str) -> AST.AST:
+    """The node for a number as written.
+
+    :raises SyntaxError: if Python does not accept `text` as a number either,
+        such as ``007``.
+    """
+    value = literal_eval(text)
+    # A literal too big for a double overflows to infinity, and there is no way
+    # to write infinity as a *literal* in any of the three languages --
+    # rendering it would emit a bare `inf`, which is not valid input to any of
+    # them. It is exactly the canonical `inf` constant though, which already
+    # knows that ROOT spells it `TMath::Infinity()` and that NumExpr cannot
+    # spell it at all.
+    if isinstance(value, float) and math.isinf(value):
+        return AST.Symbol("inf")
+    return AST.Literal(value)
+
+
+def _arguments_to_constant(name: str) -> SyntaxError:
+    msg = f'The constant "{name}" should not have arguments.'
+    return SyntaxError(msg)
+
+
 def _constant(node: AST.AST) -> Callable[[], AST.AST]:
     """Builder for a parse-tree node that needs no children converted."""
     return lambda: node
 
 
-def _expand(ptnode: lark.Tree) -> tuple[Sequence[Any], Callable[..., AST.AST]]:
+def _expand(ptnode: ParseTree) -> tuple[Sequence[Any], Callable[..., AST.AST]]:
     """Decompose one parse-tree node for `fold`.
 
     Returns the child parse-tree nodes that still need converting, together
     with a builder that assembles the AST node once they have been converted.
     Anything that does not depend on the children — name resolution and the
     errors it raises — happens here, before they are visited.
+
+    There are no pass-through nodes to skip: the grammars inline every rule
+    that would only wrap a single child, so each node is an operator, an atom,
+    or part of one.
     """
     match ptnode:
-        case lark.Tree(data=operator, children=(left, right)) if (
+        case ParseTree(data=operator, children=(left, right)) if (
             operator in BINARY_OPERATORS
         ):
             return (left, right), functools.partial(AST.BinaryOperator, operator)
 
-        case lark.Tree(data=operator, children=operand) if operator in UNARY_OPERATORS:
+        case ParseTree(data=operator, children=operand) if operator in UNARY_OPERATORS:
             return (operand[0],), functools.partial(AST.UnaryOperator, operator)
 
-        case lark.Tree(data="matr", children=(array, *indices)):
+        case ParseTree(data="matr", children=(array, *indices)):
             children = [array, *(elem.children[0] for elem in indices)]
             return children, lambda mat, *ind: AST.Matrix(mat, ind)
 
-        case lark.Tree(data="func", children=(func_name, trailer)):
+        case ParseTree(data="func", children=(func_name, trailer)):
             func_name = _get_function_name(func_name)
 
             # In case the function is actually a constant
@@ -117,51 +192,159 @@ def _expand(ptnode: lark.Tree) -> tuple[Sequence[Any], Callable[..., AST.AST]]:
                     trailer.children[0] is not None
                     and len(trailer.children[0].children) != 0
                 ):
-                    msg = f'The constant "{func_name}" should not have arguments.'
-                    raise SyntaxError(msg)
+                    raise _arguments_to_constant(func_name)
                 return (), _constant(AST.Symbol(func_name))
 
             arg_list = trailer.children[0]
             arguments = () if arg_list is None else tuple(arg_list.children)
             return arguments, lambda *args: AST.Call(func_name, args)
 
-        case lark.Tree(data="symbol", children=children):
-            var_name = _get_var_name(children[0])
-            if var_name in ("True", "False"):
-                var_name = var_name.lower()  # This makes it not a keyword
-            # Bare ROOT $ functions (e.g. Length$, Sum$) used without parens
-            if var_name.endswith("$"):
-                func_name = var_name.removesuffix("$").lower()
-                if func_name in FUNCTIONS:
-                    return (), _constant(AST.Call(func_name, ()))
-            if any(
-                not part.isidentifier() or iskeyword(part)
-                for part in var_name.split(".")
-            ):
-                msg = f'The symbol "{var_name}" is not a valid symbol.'
-                raise SyntaxError(msg)
-            return (), _constant(AST.Symbol(var_name))
-
-        case lark.Tree(data="literal", children=children):
-            value = literal_eval(children[0])
-            # A literal too big for a double overflows to infinity, and there
-            # is no way to write infinity as a *literal* in any of the three
-            # languages -- rendering it would emit a bare `inf`, which is not
-            # valid input to any of them. It is exactly the canonical `inf`
-            # constant though, which already knows that ROOT spells it
-            # `TMath::Infinity()` and that NumExpr cannot spell it at all.
-            if isinstance(value, float) and math.isinf(value):
-                return (), _constant(AST.Symbol("inf"))
-            return (), _constant(AST.Literal(value))
-
-        case lark.Tree(children=(child,)):
-            return (child,), lambda child_exp: child_exp
+        case ParseTree(data="symbol", children=children):
+            return (), _constant(_symbol(_get_var_name(children[0])))
+
+        case ParseTree(data="literal", children=children):
+            return (), _constant(_literal(children[0]))
 
         case _:  # pragma: no cover
             msg = f'Unknown Node Type: "{ptnode!r}".'
             raise TypeError(msg)
 
 
-def toast(ptnode: lark.Tree) -> AST.AST:
-    """Convert a lark parse tree into the backend-neutral AST."""
+def toast(ptnode: ParseTree) -> AST.AST:
+    """Convert a parse tree into the backend-neutral AST."""
     return fold(ptnode, _expand)
+
+
+class _Failed:
+    """A subtree that could not be converted, and the error that says why.
+
+    `Reducer` works bottom-up, but `toast` reports the first error a pre-order
+    walk comes to: a node's own before any of its children's, and a left child's
+    before a right one's. So errors are carried up as values rather than raised.
+    A node with an error of its own becomes one of these, and any other node with
+    a failed child becomes its leftmost one -- whichever a pre-order walk would
+    have reached first.
+    """
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def _first_failure(children: Sequence[Any]) -> _Failed | None:
+    for child in children:
+        if type(child) is _Failed:
+            return child
+    return None
+
+
+def _passthrough(children: list[Any]) -> Any:
+    return children[0]
+
+
+def _binary(operator: str) -> Callable[[list[Any]], Any]:
+    def reduce(children: list[Any]) -> Any:
+        left, right = children
+        return _first_failure(children) or AST.BinaryOperator(operator, left, right)
+
+    return reduce
+
+
+def _unary(operator: str) -> Callable[[list[Any]], Any]:
+    def reduce(children: list[Any]) -> Any:
+        return _first_failure(children) or AST.UnaryOperator(operator, children[0])
+
+    return reduce
+
+
+def _reduce_matr(children: list[Any]) -> Any:
+    array, *indices = children
+    return _first_failure(children) or AST.Matrix(array, tuple(indices))
+
+
+def _reduce_func(children: list[Any]) -> Any:
+    parts, arguments = children
+    try:
+        name = _resolve_function_name(parts)
+    except ValueError as error:
+        return _Failed(error)
+    if name in CONSTANTS:
+        if arguments:
+            return _Failed(_arguments_to_constant(name))
+        return AST.Symbol(name)
+    return _first_failure(arguments) or AST.Call(name, arguments)
+
+
+def _reduce_func_name(children: list[Any]) -> list[str]:
+    if len(children) == 1:
+        return [str(children[0])]
+    return [str(children[0]), *children[1]]
+
+
+def _reduce_trailer(children: list[Any]) -> tuple[Any, ...]:
+    return () if children[0] is None else children[0]
+
+
+def _reduce_symbol(children: list[Any]) -> Any:
+    try:
+        return _symbol(_get_var_name(children[0]))
+    except SyntaxError as error:
+        return _Failed(error)
+
+
+def _reduce_literal(children: list[Any]) -> Any:
+    try:
+        return _literal(str(children[0]))
+    except SyntaxError as error:
+        return _Failed(error)
+
+
+_REDUCTIONS: dict[str, Callable[[list[Any]], Any]] = {
+    **{operator: _binary(operator) for operator in BINARY_OPERATORS},
+    **{operator: _unary(operator) for operator in UNARY_OPERATORS},
+    "matr": _reduce_matr,
+    "func": _reduce_func,
+    "func_name": _reduce_func_name,
+    "trailer": _reduce_trailer,
+    "arglist": tuple,
+    "matpos": _passthrough,
+    "symbol": _reduce_symbol,
+    "literal": _reduce_literal,
+}
+
+
+class Reducer:
+    """Builds the AST while parsing, so that no parse tree is ever kept.
+
+    Given to the parser as its transformer, this is called on each LALR
+    reduction with the already-reduced children, and returns the AST node
+    (or, for the structural rules such as ``func_name`` and ``arglist``, plain
+    Python values) in their place. Each node is built once, straight from the
+    tokens, rather than first as a parse-tree node and then again by `toast`.
+
+    The result is exactly what `toast` would build from the tree, and errors
+    are exactly the ones it would raise, in the same order; see `finish`.
+    """
+
+    def __getattr__(self, rule: str) -> Callable[[list[Any]], Any]:
+        # Lark asks for a callback for every rule, by name, and builds a tree
+        # node for those it is refused. Here those are the `?` rules, which are
+        # only ever reduced with a single child and then pass it up without
+        # asking, and lark's internal rules for repetitions, which are spliced
+        # into their parent straight away.
+        try:
+            return _REDUCTIONS[rule]
+        except KeyError:
+            raise AttributeError(rule) from None
+
+
+def finish(result: Any) -> AST.AST:
+    """The AST a parser with a `Reducer` returned.
+
+    :raises SyntaxError: if `toast` would have raised it for the same tree.
+    :raises ValueError: likewise.
+    """
+    if type(result) is _Failed:
+        raise result.error
+    return result  # type: ignore[no-any-return]
@@ -12,9 +12,9 @@ from __future__ import annotations
 from collections.abc import Hashable
 
 import pytest
-from ordered_set import OrderedSet
 
 import formulate
+from formulate import AST
 from formulate.AST import BinaryOperator, Call, Literal, Matrix, Symbol, UnaryOperator
 
 # --- __str__ is a debugging representation, not backend syntax ---
@@ -91,7 +91,7 @@ def test_nodes_cannot_be_compared():
     computer algebra rather than translation. It raises instead of quietly
     giving the misleading one."""
     left = formulate.from_root("a+b")
-    right = formulate.from_root("a+b")
+    right = formulate.from_root("a+b", cache=False)
     for operation in (
         lambda: left == right,
         lambda: left != right,
@@ -139,68 +139,130 @@ def test_the_two_parsers_build_the_same_tree_for_shared_syntax():
 
 
 def test_symbol_is_a_variable_unless_it_names_a_constant():
-    assert Symbol("x").variables == OrderedSet(["x"])
-    assert Symbol("x").named_constants == OrderedSet()
-    assert Symbol("pi").variables == OrderedSet()
-    assert Symbol("pi").named_constants == OrderedSet(["pi"])
-    assert Symbol("pi").unnamed_constants == OrderedSet()
+    assert list(Symbol("x").variables) == ["x"]
+    assert list(Symbol("x").named_constants) == []
+    assert list(Symbol("pi").variables) == []
+    assert list(Symbol("pi").named_constants) == ["pi"]
+    assert list(Symbol("pi").unnamed_constants) == []
 
 
 def test_literal_is_an_unnamed_constant():
-    assert Literal(5.0).unnamed_constants == OrderedSet([5.0])
-    assert Literal(5.0).variables == OrderedSet()
-    assert Literal(5.0).named_constants == OrderedSet()
+    assert list(Literal(5.0).unnamed_constants) == [5.0]
+    assert list(Literal(5.0).variables) == []
+    assert list(Literal(5.0).named_constants) == []
 
 
 # --- Properties recurse through every child ---
 
 
 def test_unary_operator_delegates_to_its_operand():
-    assert UnaryOperator("neg", Symbol("x")).variables == OrderedSet(["x"])
-    assert UnaryOperator("inv", Symbol("pi")).named_constants == OrderedSet(["pi"])
-    assert UnaryOperator("pos", Literal(5.0)).unnamed_constants == OrderedSet([5.0])
+    assert list(UnaryOperator("neg", Symbol("x")).variables) == ["x"]
+    assert list(UnaryOperator("inv", Symbol("pi")).named_constants) == ["pi"]
+    assert list(UnaryOperator("pos", Literal(5.0)).unnamed_constants) == [5.0]
 
 
 def test_binary_operator_unions_both_sides():
     node = BinaryOperator(
         "add", Symbol("a"), BinaryOperator("mul", Symbol("b"), Literal(2))
     )
-    assert node.variables == OrderedSet(["a", "b"])
-    assert node.unnamed_constants == OrderedSet([2])
+    assert list(node.variables) == ["a", "b"]
+    assert list(node.unnamed_constants) == [2]
 
 
 def test_matrix_covers_the_base_and_every_index():
     node = Matrix(Symbol("a"), (Symbol("i"), Literal(3), Symbol("pi")))
-    assert node.variables == OrderedSet(["a", "i"])
-    assert node.named_constants == OrderedSet(["pi"])
-    assert node.unnamed_constants == OrderedSet([3])
+    assert list(node.variables) == ["a", "i"]
+    assert list(node.named_constants) == ["pi"]
+    assert list(node.unnamed_constants) == [3]
 
 
 def test_matrix_with_no_indices():
     node = Matrix(Symbol("a"), ())
-    assert node.variables == OrderedSet(["a"])
-    assert node.named_constants == OrderedSet()
-    assert node.unnamed_constants == OrderedSet()
+    assert list(node.variables) == ["a"]
+    assert list(node.named_constants) == []
+    assert list(node.unnamed_constants) == []
 
 
 def test_matrix_base_can_itself_hold_constants():
-    assert Matrix(Literal(3.14), (Symbol("i"),)).unnamed_constants == OrderedSet([3.14])
-    assert formulate.from_root("pi[0]").named_constants == OrderedSet(["pi"])
+    assert list(Matrix(Literal(3.14), (Symbol("i"),)).unnamed_constants) == [3.14]
+    assert list(formulate.from_root("pi[0]").named_constants) == ["pi"]
 
 
 def test_call_covers_every_argument():
     node = Call(
         "arctan2", (Symbol("a"), BinaryOperator("add", Symbol("b"), Literal(1)))
     )
-    assert node.variables == OrderedSet(["a", "b"])
-    assert node.unnamed_constants == OrderedSet([1])
+    assert list(node.variables) == ["a", "b"]
+    assert list(node.unnamed_constants) == [1]
 
 
 def test_call_with_no_arguments_has_no_symbols():
     node = Call("length", ())
-    assert node.variables == OrderedSet()
-    assert node.named_constants == OrderedSet()
-    assert node.unnamed_constants == OrderedSet()
+    assert list(node.variables) == []
+    assert list(node.named_constants) == []
+    assert list(node.unnamed_constants) == []
+
+
+# --- One walk answers them all, once ---
+
+
+def test_properties_are_found_in_one_walk_and_kept(monkeypatch):
+    node = formulate.from_root("sqrt(x**2 + y**2) > pi * 2 && x[1] < 2.5", cache=False)
+    walks = []
+    children = BinaryOperator._children
+
+    def counting(self):
+        walks.append(self)
+        return children(self)
+
+    monkeypatch.setattr(BinaryOperator, "_children", counting)
+    assert list(node.variables) == ["x", "y"]
+    assert list(node.named_constants) == ["pi"]
+    assert list(node.unnamed_constants) == [2, 1, 2.5]
+    assert node.node_count == 18
+    assert node.depth == 6
+    assert len(walks) == 7
+    assert node.variables is node.variables
+
+
+def test_what_is_kept_goes_with_the_node():
+    node = formulate.from_root("a + b * pi", cache=False)
+    key = id(node)
+    assert key not in AST._KEPT
+    assert list(node.variables) == ["a", "b"]
+    assert AST._KEPT[key]() is node
+    del node
+    assert key not in AST._KEPT
+
+
+def test_properties_are_read_only_views():
+    node = formulate.from_root("a + b * pi", cache=False)
+    assert "a" in node.variables
+    assert "pi" not in node.variables
+    assert node.variables & {"b", "c"} == {"b"}
+    assert node.variables | node.named_constants == {"a", "b", "pi"}
+    assert node.variables == {"b", "a"}
+    with pytest.raises(AttributeError):
+        node.variables.add("c")
+
+
+def test_node_count_and_depth():
+    assert Symbol("x").node_count == 1
+    assert Symbol("x").depth == 1
+    assert Call("length", ()).depth == 1
+    node = Matrix(Symbol("a"), (Symbol("i"), UnaryOperator("neg", Literal(3))))
+    assert node.node_count == 5
+    assert node.depth == 3
+    chain = formulate.from_root(" + ".join(["a"] * 1_000), cache=False)
+    assert chain.node_count == 1_999
+    assert chain.depth == 1_000
+
+
+def test_shared_subtrees_count_every_time():
+    node = formulate.from_root("sqrt(a) + sqrt(a)", intern=True, cache=False)
+    assert node.left is node.right
+    assert node.node_count == 5
+    formulate.intern_clear()
 
 
 # --- True/False are lowercased to canonical constant names ---
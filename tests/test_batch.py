@@ -0,0 +1,214 @@
+"""Parsing many expressions at once."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import itertools
+import tracemalloc
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import formulate
+from formulate import _batch
+
+# Deeper than pickle could recurse before an AST was pickled flat.
+DEEP_NESTING = 3000
+
+ROOT_BATCH = [
+    "a && b",
+    "TMath::Sqrt(x**2 + y**2) > 10",
+    "a &",
+    "a && b",
+    "foo(x)",
+    "class",
+    "Length$(x) : y[0][1]",
+    "a &",
+    "a && b",
+]
+
+
+def _outcome(result):
+    if isinstance(result, Exception):
+        return type(result), str(result)
+    return str(result)
+
+
+def _one_at_a_time(parse, expressions):
+    outcomes = []
+    for exp in expressions:
+        try:
+            outcomes.append(str(parse(exp, cache=False)))
+        except Exception as error:
+            outcomes.append((type(error), str(error)))
+    return outcomes
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("engine", ["lark", "reduce", "fast"])
+def test_results_match_parsing_one_at_a_time(jobs, engine):
+    results = list(formulate.from_root_many(ROOT_BATCH, engine=engine, jobs=jobs))
+    assert [_outcome(r) for r in results] == _one_at_a_time(
+        formulate.from_root, ROOT_BATCH
+    )
+    # Every occurrence of a duplicate gets the one result.
+    assert results[0] is results[3] is results[8]
+    assert results[2] is results[7]
+    assert isinstance(results[2], formulate.ParseError)
+    assert isinstance(results[4], ValueError)
+    assert isinstance(results[5], SyntaxError)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_numexpr(jobs):
+    batch = ["a & b", "a && b", "where(a, b, c)", "a < b < c", "a & b"]
+    results = list(formulate.from_numexpr_many(batch, jobs=jobs))
+    assert [_outcome(r) for r in results] == _one_at_a_time(
+        formulate.from_numexpr, batch
+    )
+
+
+def test_failures_from_a_pool_keep_their_lark_error():
+    [error] = formulate.from_root_many(["a &"], jobs=2)
+    assert error.lark_error.column == 3
+
+
+def test_duplicates_are_parsed_once(monkeypatch):
+    parsed = []
+    parse = formulate._parse_root
+
+    def counting(exp, engine):
+        parsed.append(exp)
+        return parse(exp, engine)
+
+    monkeypatch.setattr(formulate, "_parse_root", counting)
+    list(formulate.from_root_many(ROOT_BATCH))
+    assert sorted(parsed) == sorted(set(ROOT_BATCH))
+
+
+def test_blocks_are_parsed_as_they_are_read(monkeypatch):
+    """Input is read a block at a time, in a pool as without one, so an endless
+    iterable can be consumed as far as needed; duplicates that span blocks are
+    still only sent to a worker once."""
+    monkeypatch.setattr(_batch, "BLOCK", 3)
+    names = itertools.cycle(["a", "b", "c", "d"])
+    results = formulate.from_root_many(names, jobs=2)
+    first = list(itertools.islice(results, 10))
+    assert [str(r) for r in first] == list("abcdabcdab")
+    assert first[0] is first[4] is first[8]
+
+
+def test_deep_results_are_sent_back(monkeypatch):
+    """An AST pickles flat, so however deep it is, a worker can return it."""
+
+    def parse_here(_parser, _exp):
+        pytest.fail("the result was parsed again here")
+
+    monkeypatch.setattr(_batch.Parser, "_parse_here", parse_here)
+    deep = "sqrt(" * DEEP_NESTING + "a" + ")" * DEEP_NESTING
+    [result] = formulate.from_root_many([deep], jobs=2)
+    assert str(result).count("sqrt") == DEEP_NESTING
+
+
+class _LostPool(concurrent.futures.Executor):
+    """A pool whose every task fails to come back."""
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    def submit(self, *_args, **_kwargs):
+        future = concurrent.futures.Future()
+        future.set_exception(BrokenProcessPool("the worker died"))
+        return future
+
+
+def test_results_that_cannot_be_sent_back_are_parsed_here(monkeypatch):
+    """If a worker cannot return its chunk, the chunk is parsed in this process
+    instead, with the same result."""
+    monkeypatch.setattr(_batch, "ProcessPoolExecutor", _LostPool)
+    results = formulate.from_root_many(ROOT_BATCH, jobs=2)
+    assert [_outcome(r) for r in results] == [
+        _outcome(r) for r in formulate.from_root_many(ROOT_BATCH)
+    ]
+
+
+def _until_broken(pool):
+    while True:
+        pool.submit(int).result()
+
+
+@pytest.mark.parametrize("wait", [False, True])
+def test_a_worker_dying_loses_nothing(monkeypatch, wait):
+    """A worker dying breaks the pool for good. The rest of the batch, however
+    many blocks it has left, is parsed here."""
+    monkeypatch.setattr(_batch, "BLOCK", 100)
+    expressions = [f"x{i} + y{i % 7}" for i in range(350)]
+    with _batch.Parser("root", "fast", 2) as parser:
+        results = _batch.deduplicated(expressions, parser.parse, 2)
+        first = list(itertools.islice(results, 100))
+        pool = parser._pool
+        process = next(iter(pool._processes.values()))
+        process.kill()
+        process.join()
+        if wait:
+            # Until the pool notices, it takes work it will never finish;
+            # once it has, it refuses any more.
+            with pytest.raises(BrokenProcessPool):
+                _until_broken(pool)
+        rest = list(results)
+        assert parser._pool is None
+    assert [str(r) for r in first + rest] == [
+        str(r) for r in formulate.from_root_many(expressions)
+    ]
+
+
+def test_a_chunk_reports_failures_as_none():
+    ok, failed = _batch.parse_chunk("root", "fast", ["a", "a &"])
+    assert str(ok) == "a"
+    assert failed is None
+
+
+def test_bugs_are_not_reported_as_values():
+    with pytest.raises(TypeError):
+        list(formulate.from_root_many([None]))  # type: ignore[list-item]
+
+
+def test_one_job_per_cpu(monkeypatch):
+    monkeypatch.setattr(_batch.os, "cpu_count", lambda: None)
+    assert [str(r) for r in formulate.from_root_many(["a", "b"], jobs=None)] == [
+        "a",
+        "b",
+    ]
+
+
+@pytest.mark.parametrize(
+    "parse", [formulate.from_root_many, formulate.from_numexpr_many]
+)
+def test_arguments_are_checked_straight_away(parse):
+    with pytest.raises(ValueError, match="jobs must be at least 1"):
+        parse(["a"], jobs=0)
+    with pytest.raises(ValueError, match="Unknown engine"):
+        parse(["a"], engine="earley")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_forgetting_bounds_memory(monkeypatch, jobs):
+    """With `forget`, as the command-line interface streams, duplicates are only
+    recognised within a block, and what is kept does not grow with the input."""
+    monkeypatch.setattr(_batch, "BLOCK", 100)
+    expressions = [f"x{i} + y{i % 7}" for i in range(2000)] + ["x0 + y0"]
+
+    def peak(forget):
+        with _batch.Parser("root", "fast", jobs) as parser:
+            tracemalloc.start()
+            try:
+                for result in _batch.deduplicated(
+                    expressions, parser.parse, jobs, forget=forget
+                ):
+                    assert not isinstance(result, Exception)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    peak(forget=True)  # start up outside the measurement
+    assert peak(forget=True) < peak(forget=False) / 2
@@ -0,0 +1,153 @@
+"""The in-process cache of parsed expressions."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import formulate
+from formulate import _cache
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    formulate.cache_clear()
+    yield _cache.PARSED
+    formulate.cache_configure(maxsize=_cache.DEFAULT_MAXSIZE, maxbytes=None)
+    formulate.cache_clear()
+
+
+def test_repeated_source_returns_the_same_object():
+    first = formulate.from_root("a && b")
+    assert formulate.from_root("a && b") is first
+    assert formulate.cache_info()[:4] == (1, 1, _cache.DEFAULT_MAXSIZE, 1)
+
+
+def test_whitespace_is_normalized():
+    first = formulate.from_root("a + b")
+    assert formulate.from_root(" a  +\tb\n") is first
+    assert formulate.cache_info().hits == 1
+    assert formulate.cache_info().currbytes == len("a + b")
+
+
+def test_whitespace_still_separates_tokens():
+    formulate.from_root("a ** b")
+    assert formulate.from_root("a**b") is not formulate.from_root("a ** b")
+    assert formulate.cache_info().currsize == 2
+    # The space survives normalization, so the error does too.
+    with pytest.raises(formulate.ParseError):
+        formulate.from_root("a  * * b")
+
+
+def test_whitespace_the_grammar_rejects_is_not_normalized():
+    formulate.from_root("a + b")
+    with pytest.raises(formulate.ParseError):
+        formulate.from_root("a\u00a0+ b")
+
+
+def test_languages_are_cached_separately():
+    root = formulate.from_root("a ^ b")
+    numexpr = formulate.from_numexpr("a ^ b")
+    assert root.to_root() == "(a ** b)"
+    assert numexpr.to_numexpr() == "(a ^ b)"
+    assert formulate.cache_info().currsize == 2
+
+
+def test_every_engine_shares_the_cache():
+    first = formulate.from_numexpr("where(a, b, c)", engine="fast")
+    assert formulate.from_numexpr("where(a, b, c)", engine="lark") is first
+    assert formulate.from_numexpr("where(a, b, c)", engine="reduce") is first
+
+
+def test_errors_are_not_cached():
+    for _ in range(2):
+        with pytest.raises(formulate.ParseError, match=r"column 4"):
+            formulate.from_root("a  +")
+    info = formulate.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 2, 0)
+
+
+def test_cache_can_be_bypassed():
+    first = formulate.from_root("a", cache=False)
+    assert formulate.from_root("a", cache=False) is not first
+    assert formulate.cache_info()[:2] == (0, 0)
+
+
+def test_least_recently_used_is_evicted_first():
+    formulate.cache_configure(maxsize=2)
+    a = formulate.from_root("a")
+    formulate.from_root("b")
+    assert formulate.from_root("a") is a
+    formulate.from_root("c")
+    assert formulate.from_root("a") is a
+    info = formulate.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 3, 2)
+    formulate.from_root("b")
+    assert formulate.cache_info().misses == 4
+
+
+def test_byte_budget():
+    formulate.cache_configure(maxsize=None, maxbytes=10)
+    formulate.from_root("alpha")
+    formulate.from_root("beta")
+    assert formulate.cache_info()[3:] == (2, 10, 9)
+    formulate.from_root("gamma")
+    assert formulate.cache_info()[3:] == (2, 10, 9)
+    # An expression over the whole budget is parsed, but not kept.
+    assert formulate.from_root("a_long_name").to_root() == "a_long_name"
+    assert formulate.cache_info()[3:] == (0, 10, 0)
+
+
+def test_shrinking_evicts_straight_away():
+    for name in "abcd":
+        formulate.from_root(name)
+    formulate.cache_configure(maxsize=1)
+    assert formulate.cache_info().currsize == 1
+    formulate.cache_configure(maxsize=0)
+    assert formulate.cache_info().currsize == 0
+    formulate.from_root("a")
+    assert formulate.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize("bounds", [{"maxsize": -1}, {"maxsize": 1, "maxbytes": -1}])
+def test_negative_bounds_are_rejected(bounds):
+    with pytest.raises(ValueError, match="must be non-negative"):
+        formulate.cache_configure(**bounds)
+
+
+def test_concurrent_misses_keep_one_entry(cache):
+    """Two threads that miss on the same source both parse it; the second to
+    finish replaces the first's entry rather than adding another."""
+
+    def parse(exp):
+        if parse.racing:
+            parse.racing = False
+            cache.lookup("root", exp, parse)
+        return formulate.from_root(exp, cache=False)
+
+    parse.racing = True
+    node = cache.lookup("root", "a + b", parse)
+    assert formulate.from_root("a + b") is node
+    assert formulate.cache_info()[3:] == (1, None, 5)
+
+
+def test_threads_share_the_cache():
+    expressions = [f"x{i % 16} > {i % 16}" for i in range(2000)]
+    barrier = threading.Barrier(8)
+
+    def parse(chunk):
+        barrier.wait()
+        return [formulate.from_root(exp) for exp in chunk]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = pool.map(parse, [expressions[i::8] for i in range(8)])
+        nodes = [node for chunk in results for node in chunk]
+
+    assert {str(node) for node in nodes} == {
+        str(formulate.from_root(exp, cache=False)) for exp in expressions
+    }
+    info = formulate.cache_info()
+    assert info.currsize == 16
+    assert info.hits + info.misses == len(expressions)
@@ -1,11 +1,13 @@
 # Licensed under a 3-clause BSD style license, see LICENSE.
 from __future__ import annotations
 
+import io
 import sys
 
 import pytest
 
 import formulate
+from formulate import _translate
 from formulate.cli import main, parse_args
 
 
@@ -124,3 +126,180 @@ def test_main_writes_result_to_stdout(monkeypatch, capsys):
     main()
     captured = capsys.readouterr()
     assert captured.out == "TMath::Sqrt(A)\n"
+
+
+def _stream(monkeypatch, capsys, args, text):
+    monkeypatch.setattr(sys, "argv", ["formulate", *args])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(text))
+    try:
+        main()
+        status = 0
+    except SystemExit as exit_:
+        status = exit_.code
+    captured = capsys.readouterr()
+    return status, captured.out, captured.err
+
+
+LINES = "a && b\r\na &\nTMath::Min(a, b)\n  pi * x\na && b\n"
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_stdin_is_converted_line_by_line(monkeypatch, capsys, jobs):
+    """Output stays aligned with the input: a failure is an empty line, and is
+    reported on stderr with its line number, without stopping the rest."""
+    status, out, err = _stream(
+        monkeypatch, capsys, ["--from-root", "-", "--to-numexpr", "--jobs", jobs], LINES
+    )
+    assert status == 1
+    assert out.splitlines() == ["(a & b)", "", "", "(3.141592653589793 * x)", "(a & b)"]
+    assert err.startswith("formulate: line 2: There was an error parsing")
+    assert 'formulate: line 3: Function "TMath::Min" is not supported' in err
+    assert "line 1:" not in err
+    assert "line 4:" not in err
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_blank_lines_are_kept_and_not_converted(monkeypatch, capsys, jobs):
+    status, out, err = _stream(
+        monkeypatch,
+        capsys,
+        ["--from-root", "-", "--to-numexpr", "--jobs", jobs],
+        "\n  \na && b\n\t\r\n\na &\n \n",
+    )
+    assert status == 1
+    assert out.split("\n") == ["", "", "(a & b)", "", "", "", "", ""]
+    assert err.startswith("formulate: line 6: There was an error parsing")
+
+
+def test_a_parse_error_is_one_entry_per_line(monkeypatch, capsys):
+    status, _, err = _stream(
+        monkeypatch, capsys, ["--from-root", "-", "--to-root"], "a &\nb\nx +\n"
+    )
+    assert status == 1
+    entries = err.splitlines()
+    assert [line for line in entries if not line.startswith("    ")] == [
+        entries[0],
+        next(line for line in entries if line.startswith("formulate: line 3:")),
+    ]
+    assert entries[0].startswith("formulate: line 1: There was an error parsing")
+    # The expression and the caret under it keep their alignment.
+    assert entries[1:3] == ["    a &", "      ^"]
+    assert all(line.strip() for line in entries)
+
+
+def test_an_error_without_a_message(monkeypatch, capsys):
+    def translate(_source, _target, expressions, *_args, **_kwargs):
+        return (ValueError() for _ in expressions)
+
+    monkeypatch.setattr(_translate, "translate_many", translate)
+    status, out, err = _stream(
+        monkeypatch, capsys, ["--from-root", "-", "--to-root"], "a\n"
+    )
+    assert (status, out, err) == (1, "\n", "formulate: line 1: \n")
+
+
+class _Flushed(io.StringIO):
+    """Standard output that remembers what had been written at each flush."""
+
+    def __init__(self):
+        super().__init__()
+        self.flushed = []
+
+    def flush(self):
+        super().flush()
+        self.flushed.append(self.getvalue())
+
+
+def test_each_line_is_flushed_as_it_is_written(monkeypatch, capsys):
+    out = _Flushed()
+    monkeypatch.setattr(sys, "stdout", out)
+    status, _, err = _stream(
+        monkeypatch, capsys, ["--from-root", "-", "--to-root"], "a\n\nb &\nc\n\n"
+    )
+    assert status == 1
+    assert err.startswith("formulate: line 3:")
+    # A reader of the output never waits on a line the command has finished.
+    assert out.flushed == ["a\n", "a\n\n\n", "a\n\n\nc\n", "a\n\n\nc\n\n"]
+
+
+def test_stdin_success_exits_zero(monkeypatch, capsys):
+    status, out, err = _stream(
+        monkeypatch, capsys, ["--from-numexpr=-", "--variables"], "a & b\nsqrt(c)\n3\n"
+    )
+    assert (status, out, err) == (0, "a b\nc\n\n", "")
+
+
+def test_stdin_can_be_empty(monkeypatch, capsys):
+    assert _stream(monkeypatch, capsys, ["--from-root", "-", "--to-root"], "") == (
+        0,
+        "",
+        "",
+    )
+
+
+def test_only_the_command_reads_stdin():
+    with pytest.raises(SystemExit):
+        parse_args(["--from-root", "-", "--to-root"])
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--from-root", "-", "--to-root", "--jobs", "0"],
+        # --jobs only makes sense for many expressions.
+        ["--from-root", "a", "--to-root", "--jobs", "2"],
+    ],
+)
+def test_invalid_jobs_exit(monkeypatch, args):
+    monkeypatch.setattr(sys, "argv", ["formulate", *args])
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 2
+
+
+def test_cache_is_used_and_reported(monkeypatch, capsys, tmp_path):
+    path = str(tmp_path / "cache.db")
+    args = ["--from-root", "-", "--to-numexpr", "--cache", path]
+    first = _stream(monkeypatch, capsys, args, LINES)
+    assert first[2].endswith(f"formulate: found 0 of 4 conversions in {path} (0%)\n")
+
+    second = _stream(monkeypatch, capsys, args, LINES)
+    assert second[:2] == first[:2]
+    assert second[2].endswith(f"formulate: found 4 of 4 conversions in {path} (100%)\n")
+    # Failures are cached too, and still reported against their line.
+    assert "formulate: line 2: There was an error parsing" in second[2]
+
+
+def test_cache_with_a_single_expression(monkeypatch, capsys, tmp_path):
+    path = str(tmp_path / "cache.db")
+    for found in (0, 1):
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["formulate", "--from-root", "a && b", "--variables", "--cache", path],
+        )
+        main()
+        captured = capsys.readouterr()
+        assert captured.out == "a\nb\n"
+        assert (
+            captured.err
+            == f"formulate: found {found} of 1 conversions in {path} ({found:.0%})\n"
+        )
+
+    assert (
+        parse_args(["--from-root", "a && b", "--to-root", "--cache", path])
+        == "(a && b)"
+    )
+    for _ in range(2):
+        with pytest.raises(formulate.ParseError):
+            parse_args(["--from-root", "a &", "--to-root", "--cache", path])
+
+
+def test_cache_report_without_lookups(monkeypatch, capsys, tmp_path):
+    path = str(tmp_path / "cache.db")
+    args = ["--from-numexpr", "-", "--to-root", "--cache", path]
+    assert _stream(monkeypatch, capsys, args, "") == (
+        0,
+        "",
+        f"formulate: found 0 of 0 conversions in {path}\n",
+    )
@@ -0,0 +1,111 @@
+"""Expressions flattened into arrays, with ``formulate.compact``."""
+
+from __future__ import annotations
+
+import pickle
+
+import pytest
+
+import formulate
+from formulate.AST import BinaryOperator, Call, Literal, Matrix, Symbol
+from formulate.compact import CompactAST
+
+EXPRESSIONS = [
+    "a + b * c",
+    "TMath::Sqrt(x**2 + y**2) > 10 && !flag",
+    "-(a - b) ** 2 / c",
+    "x[0][i + 1] + TMath::Infinity()",
+    "TMath::Min(a, b) : c",
+    "pow(a, b) - Length$()",
+    "1 + 1.0 + 1e300 * -0.0",
+]
+
+
+def _outcome(render):
+    try:
+        return render()
+    except ValueError as error:
+        return str(error)
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_round_trip(source):
+    expr = formulate.from_root(source)
+    compact = CompactAST.from_ast(expr)
+    assert len(compact) == sum(1 for _ in expr._walk())
+    assert str(compact.to_ast()) == str(expr)
+    assert str(CompactAST.from_ast(compact.to_ast())) == str(compact)
+
+
+@pytest.mark.parametrize("parens", ["full", "minimal"])
+@pytest.mark.parametrize("backend", ["root", "numexpr", "python"])
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_renders_as_the_tree_does(source, backend, parens):
+    expr = formulate.from_root(source)
+    compact = CompactAST.from_ast(expr)
+    assert _outcome(
+        lambda: getattr(compact, f"to_{backend}")(parens=parens)
+    ) == _outcome(lambda: getattr(expr, f"to_{backend}")(parens=parens))
+
+
+def test_names_and_numbers_are_stored_once():
+    compact = CompactAST.from_ast(formulate.from_root("x * 2 + x * 2.0 + y * 2"))
+    assert compact.names == ("add", "mul", "y", "x")
+    # Equal, but not the same number, so both are kept.
+    assert compact.literals == (2, 2.0)
+    assert [type(value) for value in compact.literals] == [int, float]
+    tree = compact.to_ast()
+    assert {id(node.name) for node in tree._walk() if isinstance(node, Symbol)} == {
+        id(name) for name in compact.names[2:]
+    }
+
+
+def test_children_come_first():
+    compact = CompactAST.from_ast(
+        Call("f", (Matrix(Symbol("v"), (Literal(1), Literal(2))), Symbol("w")))
+    )
+    assert list(compact.opcodes) == [1, 0, 0, 4, 1, 5]
+    assert list(compact.operands) == [2, 1, 0, 2, 1, 0]
+    assert list(compact.arities) == [2]
+    assert compact.names == ("f", "w", "v")
+
+
+def test_calls_read_their_argument_counts_in_order():
+    a, b, c = Symbol("a"), Symbol("b"), Symbol("c")
+    expr = Call("f", (Call("g", ()), Call("h", (a, b, c)), Call("k", (a,))))
+    compact = CompactAST.from_ast(expr)
+    assert list(compact.arities) == [0, 3, 1, 3]
+    assert str(compact.to_ast()) == str(expr)
+
+
+def test_deep_and_long_expressions():
+    depth = 1_000
+    nested = formulate.from_root("sqrt(" * depth + "a" + ")" * depth)
+    assert CompactAST.from_ast(nested).to_root() == nested.to_root()
+    length = 10_000
+    chain = Symbol("a")
+    for _ in range(length):
+        chain = BinaryOperator("add", chain, Symbol("b"))
+    compact = CompactAST.from_ast(chain)
+    assert len(compact) == 2 * length + 1
+    assert compact.to_ast().to_python() == chain.to_python()
+
+
+def test_size():
+    compact = CompactAST.from_ast(formulate.from_root("a + b"))
+    assert len(compact) == 3
+    assert compact.nbytes > len(compact)
+    assert compact.opcodes.itemsize == 1
+
+
+def test_not_comparable():
+    compact = CompactAST.from_ast(formulate.from_root("a + b"))
+    with pytest.raises(TypeError, match="cannot be compared"):
+        compact == compact  # noqa: B015
+    with pytest.raises(TypeError, match="unhashable"):
+        hash(compact)
+
+
+def test_pickles():
+    compact = CompactAST.from_ast(formulate.from_root("TMath::Min(a, b) : c"))
+    assert str(pickle.loads(pickle.dumps(compact))) == str(compact)
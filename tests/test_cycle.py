@@ -19,6 +19,8 @@ comes back as the literal ``3.141592653589793``.
 
 from __future__ import annotations
 
+import ast
+
 import pytest
 from hypothesis import given, settings
 from hypothesis import strategies as st
@@ -255,6 +257,89 @@ def test_generated_expression_preserves_symbols(expr):
     assert reparsed.named_constants == parsed.named_constants
 
 
+# --- Minimal parentheses ---
+
+
+@pytest.mark.parametrize(
+    "parse,render,expr,expected",
+    [
+        ("from_root", "to_root", "a + b * c", "a + b * c"),
+        ("from_root", "to_root", "(a + b) * c", "(a + b) * c"),
+        ("from_root", "to_root", "a - (b - c)", "a - (b - c)"),
+        ("from_root", "to_root", "(a ** b) ** c", "(a ** b) ** c"),
+        ("from_root", "to_root", "a ** b ** c", "a ** b ** c"),
+        ("from_root", "to_root", "-a ** 2", "-a ** 2"),
+        ("from_root", "to_root", "(-a) ** 2", "(-a) ** 2"),
+        ("from_root", "to_root", "a * -b", "a * -b"),
+        ("from_root", "to_root", "--a", "-(-a)"),
+        ("from_root", "to_root", "a < b == c", "a < b == c"),
+        ("from_root", "to_root", "a == (b < c)", "a == b < c"),
+        ("from_root", "to_root", "!(a && b) || c", "!(a && b) || c"),
+        ("from_root", "to_root", "x[(a > b)][i + 1]", "x[(a > b)][i + 1]"),
+        ("from_root", "to_root", "(a + b)[0]", "(a + b)[0]"),
+        ("from_root", "to_root", "a + 1 : b * 2", "a + 1 : b * 2"),
+        ("from_root", "to_python", "x[(a > b)][i + 1]", "x[a > b, i + 1]"),
+        ("from_root", "to_python", "a < b == c", "(a < b) == c"),
+        ("from_root", "to_python", "!(a && b)", "np.logical_not(a & b)"),
+        ("from_root", "to_python", "a:b", "a, b"),
+        ("from_numexpr", "to_numexpr", "(a < b) < c", "(a < b) < c"),
+        ("from_numexpr", "to_numexpr", "a & (b | c)", "a & (b | c)"),
+        ("from_numexpr", "to_numexpr", "a ^ b & c", "a ^ b & c"),
+        ("from_numexpr", "to_numexpr", "pow(a, b) ** c", "(a ** b) ** c"),
+        ("from_numexpr", "to_numexpr", "~(a | b)", "~(a | b)"),
+    ],
+)
+def test_minimal_parentheses(parse, render, expr, expected):
+    tree = getattr(formulate, parse)(expr)
+    assert getattr(tree, render)(parens="minimal") == expected
+
+
+def _assert_minimal_reads_back(parse, render, expr):
+    """The minimal rendering is the same tree as the fully parenthesized one,
+    and so reads back to itself."""
+    tree = parse(expr)
+    minimal = getattr(tree, render)(parens="minimal")
+    reparsed = parse(minimal)
+    assert getattr(reparsed, render)() == getattr(tree, render)()
+    assert getattr(reparsed, render)(parens="minimal") == minimal
+
+
+@pytest.mark.parametrize("expr", NUMEXPR_EXPRESSIONS, ids=lambda x: x)
+def test_minimal_numexpr_is_a_fixed_point(expr):
+    _assert_minimal_reads_back(formulate.from_numexpr, "to_numexpr", expr)
+
+
+@pytest.mark.parametrize(
+    "expr", ROOT_EXPRESSIONS + ROOT_ONLY_EXPRESSIONS, ids=lambda x: x
+)
+def test_minimal_root_is_a_fixed_point(expr):
+    _assert_minimal_reads_back(formulate.from_root, "to_root", expr)
+
+
+@pytest.mark.parametrize("expr", NUMEXPR_EXPRESSIONS, ids=lambda x: x)
+def test_minimal_python_is_the_same_python(expr):
+    """Python's own parser drops redundant parentheses, so both renderings must
+    give it the same tree."""
+    tree = formulate.from_numexpr(expr)
+    assert ast.dump(ast.parse(tree.to_python(parens="minimal"))) == ast.dump(
+        ast.parse(tree.to_python())
+    )
+
+
+@given(expr=GENERATED_NUMEXPR)
+@settings(max_examples=300)
+def test_generated_minimal_rendering_is_a_fixed_point(expr):
+    _assert_minimal_reads_back(formulate.from_numexpr, "to_numexpr", expr)
+    _assert_minimal_reads_back(
+        formulate.from_root, "to_root", formulate.from_numexpr(expr).to_root()
+    )
+
+
+def test_unknown_parens_are_rejected():
+    with pytest.raises(ValueError, match="Unknown parens 'some'"):
+        formulate.from_root("a").to_root(parens="some")
+
+
 # --- Conversions that are expected to fail ---
 
 
@@ -0,0 +1,213 @@
+"""The fast engine, tested against the reference.
+
+`engine="fast"` parses with the operator-precedence parsers of
+`formulate._pratt` rather than with the grammar. Every test here parses the same
+text both ways and compares what comes out: the ASTs through `str()`, which
+spells out the whole tree including how an index was grouped, and failures
+through their type and message, hints included. The "reduce" engine is the
+lark parser building the AST during its reductions, and is compared the same
+way.
+"""
+
+from __future__ import annotations
+
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import formulate
+from formulate import _pratt
+
+
+def _outcome(parse, text, engine):
+    try:
+        return str(parse(text, engine=engine, cache=False))
+    except Exception as error:
+        # Lark lists the tokens it expected in set order, which differs from one
+        # parser instance to the next, so compare the lines of the message
+        # rather than their order.
+        return type(error), sorted(str(error).splitlines())
+
+
+def _assert_same(parse, text):
+    reference = _outcome(parse, text, "lark")
+    assert _outcome(parse, text, "reduce") == reference
+    assert _outcome(parse, text, "fast") == reference
+
+
+ROOT_EXPRESSIONS = [
+    # Precedence and associativity, level by level.
+    "a || b && c",
+    "a && b || c && !d",
+    "a == b != c",
+    "a < b <= c > d >= e",
+    "a + b - c * d / e % f",
+    "-a ** b",
+    "a ** -b * c",
+    "a ^ b ** c ^ d",
+    "!a == b",
+    "+-!a",
+    "a:b:c",
+    "a > 1 : b + 2",
+    # Indexing: consecutive indices are one Matrix, a parenthesized one two.
+    "a[0][1][2]",
+    "(a[0])[1]",
+    "a[0] ** 2",
+    "-a[i + 1]",
+    "a[(b > 1)]",
+    "f(x)[0]",
+    "Sum$(x[0] * y[1])",
+    # Calls, namespaces and constants.
+    "TMath::Sqrt(px**2 + py**2) > 10",
+    "TMath :: Abs(x)",
+    "TMath::Max(a, b,)",
+    "TMath::Pi()",
+    "pi()",
+    "Length$",
+    "Length$()",
+    "sqrt(sqrt(a))",
+    "true && False",
+    # Numbers and names.
+    "1 + 1. + .5 + 1e3 + 1.5E-3 + 1e999",
+    "tree.branch_1 * x.y.z",
+    " \t(a)\n ",
+    "(((a)))",
+    # Syntax errors, reported by lark.
+    "",
+    "a +",
+    "a b",
+    "1 2",
+    "(a",
+    "a)",
+    "(a]",
+    "a[0",
+    "a[0)",
+    "a[b > 1]",
+    "(a:b)",
+    "f(a:b)",
+    "a, b",
+    "(a, b)",
+    "f(,)",
+    "f(a,,)",
+    "()",
+    "a & b",
+    "a | b",
+    "~a",
+    "a ! b",
+    "a ? b",
+    "?",
+    "TMath::",
+    "TMath::Abs",
+    "a = b",
+    # Semantic errors, raised by `toast`.
+    "007",
+    "pi(1)",
+    "foo(x)",
+    "foo::sqrt(a)",
+    "A::B::C(a)",
+    "class",
+    "tree.class",
+    "foo$",
+    # Several errors at once: `toast` reports the first one a pre-order walk
+    # reaches, a node's own before its children's and left before right, and a
+    # syntax error before any of them.
+    "foo(bar(x))",
+    "bar(x) + foo$",
+    "tree.class + 007",
+    "a[007] * class",
+    "pi(foo(x))",
+    "sqrt(007, class)",
+    "-class / foo(1)",
+    "foo(x) +",
+]
+
+NUMEXPR_EXPRESSIONS = [
+    "a < b",
+    "(a < b) < c",
+    "a | b & c ^ d",
+    "a & b | c",
+    "~a ** -b",
+    "a ** b ** c",
+    "-a * b",
+    "where(a > 0, b, c)",
+    "arctan2(y, x,)",
+    "True | False",
+    "pi",
+    "x.y.z + 1e-3",
+    # Errors.
+    "a < b < c",
+    "a == b != c",
+    "a && b",
+    "a || b",
+    "!a",
+    "a[0]",
+    "a]",
+    "TMath::Abs(x)",
+    "a : b",
+    "pi(1)",
+    "unknown(x)",
+    "foo(bar(x))",
+    "class + 007",
+    "(a < 007) < b",
+    "foo(x) < b < c",
+]
+
+
+@pytest.mark.parametrize("text", ROOT_EXPRESSIONS)
+def test_root_engines_agree(text):
+    _assert_same(formulate.from_root, text)
+
+
+@pytest.mark.parametrize("text", NUMEXPR_EXPRESSIONS)
+def test_numexpr_engines_agree(text):
+    _assert_same(formulate.from_numexpr, text)
+
+
+def test_valid_expressions_are_not_handed_back_to_lark():
+    """Agreeing is not enough: the fast engine should actually be the one that
+    parses valid expressions, or it is only ever a slower lark."""
+    assert _pratt.parse_root("TMath::Abs(x[0]) > 2 && y < 3 : z") is not None
+    assert _pratt.parse_numexpr("abs(x) > 2 & (y < 3)") is not None
+
+
+def test_parse_errors_keep_their_hints():
+    with pytest.raises(formulate.ParseError, match="Use '&&' instead of '&'"):
+        formulate.from_root("a & b", engine="fast")
+    with pytest.raises(formulate.ParseError, match="Use '&' instead of '&&'"):
+        formulate.from_numexpr("a && b", engine="fast")
+
+
+@pytest.mark.parametrize("parse", [formulate.from_root, formulate.from_numexpr])
+def test_unknown_engine_is_rejected(parse):
+    with pytest.raises(ValueError, match="Unknown engine 'earley'"):
+        parse("a", engine="earley")
+
+
+# Token soup: mostly nonsense, but short runs of it are often valid, and every
+# token either language treats specially is in here.
+ROOT_TOKENS = [
+    *("a", "x.y", "Length$", "TMath", "TMath::Abs", "sqrt", "pi", "True"),
+    *("1", "2.5", ".5", "1e3", "007"),
+    *("(", ")", "[", "]", ",", ":", "::", " "),
+    *("+", "-", "*", "/", "%", "**", "^", "!", "~", "&", "&&", "||"),
+    *("==", "!=", "<", ">", "<=", ">="),
+]
+NUMEXPR_TOKENS = [
+    *("a", "x.y", "abs", "where", "pi", "True"),
+    *("1", "2.5", ".5", "1e3", "007"),
+    *("(", ")", "[", "]", ",", " "),
+    *("+", "-", "*", "/", "%", "**", "^", "!", "~", "&", "|", "&&"),
+    *("==", "!=", "<", ">", "<=", ">="),
+]
+
+
+@given(st.lists(st.sampled_from(ROOT_TOKENS), max_size=12).map("".join))
+@settings(max_examples=500)
+def test_root_engines_agree_on_token_soup(text):
+    _assert_same(formulate.from_root, text)
+
+
+@given(st.lists(st.sampled_from(NUMEXPR_TOKENS), max_size=12).map("".join))
+@settings(max_examples=500)
+def test_numexpr_engines_agree_on_token_soup(text):
+    _assert_same(formulate.from_numexpr, text)
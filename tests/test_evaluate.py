@@ -0,0 +1,240 @@
+"""Evaluating expressions over NumPy arrays, with ``AST.evaluate``."""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import formulate
+from formulate import _evaluate, identifiers
+
+ROWS = 1000
+# Long enough that every intermediate array is worth reusing.
+LONG_ROWS = 1 << 16
+
+EXPRESSIONS = [
+    "x + y * 2 - z / 3",
+    "(x > 0.5 && y < 0.5) || !(z >= 0.25)",
+    "-x ** 2 + +y % 0.3",
+    "TMath::Sqrt(x**2 + y**2) * TMath::Pi() - TMath::E()",
+    "TMath::ATan2(y, x) + TMath::Log10(z + 1) + abs(x - y)",
+    "TMath::Min(x, y) - TMath::Max(y, z) + pow(x, 2)",
+    "x == y || x != z",
+    "n * 3 + n / 2 - n % 4",
+    "sinh(x) + cosh(y) + tanh(z) + exp(x) + log(y + 1) + ceil(z) + floor(x)",
+    "sqrt2 * TMath::InvPi() + TMath::Infinity() * 0 + hbarc",
+    "x[0] + y[n[1]]",
+    "Sum$(x) + Min$(y) * Max$(z)",
+]
+
+NUMEXPR_EXPRESSIONS = [
+    "where(x > y, x, y) + log1p(z) - expm1(x)",
+    "(n & 6) | (n ^ 3)",
+    "~(x > y)",
+    "real(x) + imag(y) + conj(z)",
+    "prod(x) + sum(y)",
+]
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "x": rng.random(ROWS),
+        "y": rng.random(ROWS),
+        "z": rng.random(ROWS),
+        "n": rng.integers(1, 100, ROWS),
+    }
+
+
+def _through_python(expr, arrays):
+    return eval(expr.to_python(), {"np": np, **arrays})
+
+
+def _assert_same(result, expected):
+    assert type(result) is type(expected)
+    if isinstance(expected, tuple):
+        assert len(result) == len(expected)
+        for each, one in zip(result, expected, strict=True):
+            _assert_same(each, one)
+        return
+    np.testing.assert_array_equal(result, expected)
+    assert np.result_type(result) == np.result_type(expected)
+
+
+@pytest.mark.parametrize(
+    ("parse", "source"),
+    [(formulate.from_root, source) for source in EXPRESSIONS]
+    + [(formulate.from_numexpr, source) for source in NUMEXPR_EXPRESSIONS],
+)
+def test_matches_the_python_rendering(parse, source, arrays):
+    expr = parse(source)
+    _assert_same(expr.evaluate(arrays), _through_python(expr, arrays))
+
+
+def test_tables_cover_python():
+    operators = set(identifiers.PYTHON_OPERATOR_SYMBOLS) - {"multi_out"}
+    assert set(_evaluate._BINARY) | set(_evaluate._UNARY) >= operators
+    assert set(_evaluate._UNARY) == identifiers.UNARY_OPERATORS
+    assert set(_evaluate.CONSTANT_VALUES) == set(identifiers.PYTHON_CONSTANTS)
+    assert _evaluate._REDUCTIONS <= identifiers.FUNCTIONS
+
+
+@pytest.mark.parametrize("name", sorted(identifiers.PYTHON_CONSTANTS))
+def test_constants_match_the_python_rendering(name):
+    expr = formulate.AST.Symbol(name)
+    _assert_same(expr.evaluate({}), _through_python(expr, {}))
+
+
+def test_scalars():
+    assert formulate.from_root("a * 2 + 1").evaluate({"a": 3}) == 7
+    assert formulate.from_root("2 ** 10").evaluate({}) == 1024
+
+
+def test_separated_parts_are_a_tuple(arrays):
+    expr = formulate.from_root("x : y + 1 : z")
+    result = expr.evaluate(arrays)
+    _assert_same(result, _through_python(expr, arrays))
+    assert len(result) == 3
+
+
+def test_missing_variable():
+    with pytest.raises(KeyError, match="No array named 'y'"):
+        formulate.from_root("x + y").evaluate({"x": 1})
+
+
+def test_unsupported_function_is_refused_as_by_to_python():
+    expr = formulate.from_root("TMath::Erf(x)")
+    with pytest.raises(ValueError, match="not supported in Python") as rendering:
+        expr.to_python()
+    with pytest.raises(ValueError, match="not supported in Python") as evaluation:
+        expr.evaluate({"x": 1.0})
+    assert str(evaluation.value) == str(rendering.value)
+
+
+def test_inputs_are_never_overwritten():
+    rng = np.random.default_rng(1)
+    arrays = {name: rng.random(LONG_ROWS) for name in "xyz"}
+    copies = {name: array.copy() for name, array in arrays.items()}
+    expr = formulate.from_root("-(x + 1) * y - z / x + TMath::Sqrt(z) * x")
+    _assert_same(expr.evaluate(arrays), _through_python(expr, arrays))
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(array, copies[name])
+
+
+@pytest.mark.parametrize(
+    "source",
+    ["real(x) + 1", "real(y) * 2 + real(y)", "imag(x) + real(y) * 3 + conj(z)"],
+)
+def test_views_of_inputs_are_never_overwritten(source):
+    # np.real of a real array is the array itself, seen through a view.
+    rng = np.random.default_rng(1)
+    arrays = {name: rng.random(LONG_ROWS) for name in "xyz"}
+    copies = {name: array.copy() for name, array in arrays.items()}
+    expr = formulate.from_numexpr(source)
+    _assert_same(expr.evaluate(arrays), _through_python(expr, copies))
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(array, copies[name])
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "n + 1 - n * 2",  # integers stay integers
+        "(n + 1) / 2",  # until divided
+        "(n * 2 > 50) && (n - 1 < 80)",  # comparisons make booleans
+        "!(n + 1 > 3)",
+        "x * 2 + n",  # float temporaries absorb integers
+        "(n * 2) * x",  # but integer ones do not hold floats
+        "(x * 2)[0] + x * 3",  # a temporary that is indexed is left alone
+    ],
+)
+def test_temporaries_are_only_reused_for_their_own_dtype(source):
+    rng = np.random.default_rng(2)
+    arrays = {"x": rng.random(LONG_ROWS), "n": rng.integers(1, 100, LONG_ROWS)}
+    expr = formulate.from_root(source)
+    _assert_same(expr.evaluate(arrays), _through_python(expr, arrays))
+
+
+def test_temporaries_are_reused_in_place():
+    x = np.arange(LONG_ROWS, dtype=float)
+    expr = formulate.from_root("-(TMath::Sqrt(x * 2 + 1) + 2) * 3")
+    tracemalloc.start()
+    try:
+        result = expr.evaluate({"x": x})
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    np.testing.assert_array_equal(result, -(np.sqrt(x * 2 + 1) + 2) * 3)
+    # One array, written over by every step: without reuse, each step would
+    # hold its operand and its result at once.
+    assert peak < 1.5 * x.nbytes
+
+
+def test_shared_subtrees_are_computed_apart():
+    x = np.arange(LONG_ROWS, dtype=float)
+    expr = formulate.from_root("(x * 2 + 1) * (x * 2 + 1)", cache=False, intern=True)
+    assert expr.left is expr.right
+    np.testing.assert_array_equal(expr.evaluate({"x": x}), (x * 2 + 1) ** 2)
+    formulate.intern_clear()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 333, ROWS - 1])
+@pytest.mark.parametrize(
+    "source",
+    [
+        "x + y * 2 - z / 3",
+        "(x > 0.5 && y < 0.5) || !(z >= 0.25)",
+        "n * 3 + n / 2 - n % 4",
+        "x : n + 1 : z > 0.5",
+        "x * scale + 1",
+        "TMath::Pi() * 0 + x : 2",
+    ],
+)
+def test_chunks_give_the_same_result(source, chunk_size, arrays):
+    arrays = {**arrays, "scale": 2.0}
+    expr = formulate.from_root(source)
+    whole = expr.evaluate(arrays)
+    chunked = expr.evaluate(arrays, chunk_size=chunk_size)
+    if source.endswith(": 2"):
+        # A part that is the same for every row is given for every row.
+        assert chunked[1].shape == (ROWS,)
+        np.testing.assert_array_equal(chunked[1], whole[1])
+        whole, chunked = whole[0], chunked[0]
+    _assert_same(chunked, whole)
+
+
+@pytest.mark.parametrize("chunk_size", [ROWS, ROWS + 1])
+def test_short_inputs_are_evaluated_whole(chunk_size, arrays):
+    expr = formulate.from_root("x + 1")
+    _assert_same(expr.evaluate(arrays, chunk_size=chunk_size), arrays["x"] + 1)
+    assert formulate.from_root("2 * 3").evaluate({}, chunk_size=1) == 6
+
+
+@pytest.mark.parametrize("source", ["x[0] + y", "Sum$(x) + y", "x + Length$(y)"])
+def test_chunks_refuse_what_reads_across_rows(source, arrays):
+    with pytest.raises(ValueError, match="reads across rows"):
+        formulate.from_root(source).evaluate(arrays, chunk_size=10)
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1])
+def test_chunk_size_must_be_positive(chunk_size, arrays):
+    with pytest.raises(ValueError, match="chunk_size must be positive"):
+        formulate.from_root("x").evaluate(arrays, chunk_size=chunk_size)
+
+
+def test_chunks_need_one_length(arrays):
+    arrays = {**arrays, "y": arrays["y"][:-1]}
+    with pytest.raises(ValueError, match="different lengths"):
+        formulate.from_root("x + y").evaluate(arrays, chunk_size=10)
+
+
+def test_needs_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.delitem(sys.modules, "formulate._evaluate")
+    with pytest.raises(ImportError, match="evaluate\\(\\) needs NumPy"):
+        importlib.import_module("formulate._evaluate")
@@ -0,0 +1,133 @@
+"""Fingerprints, with ``AST.fingerprint``."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import itertools
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+import formulate
+from formulate import AST
+from formulate.AST import BinaryOperator, Call, Literal, Matrix, Symbol
+
+SOURCE = "sqrt(x**2 + y**2) > 1.5 && !flag[0]"
+# Written down once: a fingerprint that changed would invalidate every cache
+# keyed on one.
+FINGERPRINT = "bba44af4ba394097e85e814b48b6a9a9"
+
+EXPRESSIONS = [
+    "a + b",
+    "b + a",
+    "(a + b) + c",
+    "a + (b + c)",
+    "a * 1",
+    "a * 1.0",
+    "a",
+    "a[0]",
+    "a[0][1]",
+    "TMath::Pi()",
+    "pi",
+    "x : y",
+    "-x",
+    "+x",
+    "-0.0",
+    "0.0",
+    "sqrt(a)",
+    "sqrt(a) + 0",
+]
+
+
+def test_stable():
+    assert formulate.from_root(SOURCE).fingerprint() == FINGERPRINT
+
+
+def test_stable_across_processes():
+    script = f"import formulate; print(formulate.from_root({SOURCE!r}).fingerprint())"
+    for seed in ("0", "1"):
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+        )
+        assert result.stdout.strip() == FINGERPRINT
+
+
+def test_the_same_whatever_the_language():
+    assert (
+        formulate.from_root("TMath::Abs(x) < 2 && y == 1").fingerprint()
+        == formulate.from_numexpr("(abs(x) < 2) & (y == 1)").fingerprint()
+    )
+
+
+@pytest.mark.parametrize(
+    ("first", "second"), list(itertools.combinations(EXPRESSIONS, 2))
+)
+def test_the_same_exactly_when_str_is(first, second):
+    a = formulate.from_root(first, cache=False)
+    b = formulate.from_root(second, cache=False)
+    assert (a.fingerprint() == b.fingerprint()) == (str(a) == str(b))
+
+
+def test_fields_cannot_run_into_each_other():
+    trees = [
+        Symbol("f"),
+        Call("f", ()),
+        Call("f", (Symbol("a"),)),
+        Call("fa", ()),
+        Matrix(Symbol("f"), (Symbol("a"),)),
+        BinaryOperator("add", Symbol("a"), Symbol("b")),
+        BinaryOperator("add", Symbol("ab"), Symbol("")),
+        BinaryOperator("ad", Symbol("da"), Symbol("b")),
+        Literal(1),
+        Literal(1.0),
+        Literal(True),
+        Literal(float("inf")),
+        Symbol("1"),
+    ]
+    fingerprints = {tree.fingerprint() for tree in trees}
+    assert len(fingerprints) == len(trees)
+    assert all(len(fingerprint) == 32 for fingerprint in fingerprints)
+
+
+def test_remembered_by_the_nodes_asked(monkeypatch):
+    expr = formulate.from_root(SOURCE, cache=False)
+    subtree = expr.left
+    inner = subtree.fingerprint()
+    fingerprint = expr.fingerprint()
+    hashed = []
+    blake2b = hashlib.blake2b
+
+    def counting(data, **options):
+        hashed.append(data)
+        return blake2b(data, **options)
+
+    monkeypatch.setattr("hashlib.blake2b", counting)
+    assert expr.fingerprint() == fingerprint
+    assert subtree.fingerprint() == inner
+    assert hashed == []
+    # Only the nodes asked keep theirs; a node inside is hashed again.
+    assert subtree.left.fingerprint()
+    assert hashed
+
+
+def test_not_carried_by_copies():
+    expr = formulate.from_root(SOURCE, cache=False)
+    fingerprint = expr.fingerprint()
+    for clone in (pickle.loads(pickle.dumps(expr)), copy.deepcopy(expr)):
+        assert id(clone) not in AST._KEPT
+        assert clone.fingerprint() == fingerprint
+
+
+def test_deep_and_long_expressions():
+    depth = 1_000
+    nested = formulate.from_root("sqrt(" * depth + "a" + ")" * depth, cache=False)
+    chain = formulate.from_root(" + ".join(["a"] * 10_000), cache=False)
+    assert nested.fingerprint() != chain.fingerprint()
@@ -236,6 +236,28 @@ def test_every_numexpr_constant_is_inlined_as_a_literal(canonical):
     assert rendered == expected
 
 
+@pytest.mark.parametrize(
+    "canonical,from_hepunits",
+    [
+        ("avogadro", lambda c, u: c.Avogadro / (1 / u.mole)),
+        ("k_boltzmann", lambda c, u: c.k_Boltzmann / (u.joule / u.kelvin)),
+        ("c_light", lambda c, u: c.c_light / (u.m / u.s)),
+        ("eminus", lambda c, u: c.eminus / u.coulomb),
+        ("eplus", lambda c, u: -c.eminus / u.coulomb),
+        ("h_planck", lambda c, u: c.h_Planck / (u.electronvolt * u.s / u.e_SI)),
+        ("hbar", lambda c, u: c.hbar / (u.electronvolt * u.s / u.e_SI)),
+        ("hbarc", lambda c, u: c.hbarc / (u.electronvolt * u.m / u.e_SI)),
+    ],
+)
+def test_physical_constants_agree_with_hepunits(canonical, from_hepunits):
+    """The values are written out in identifiers.py rather than imported, so
+    that hepunits is not a runtime dependency. If this fails, hepunits has
+    changed a value and the table should be updated to match."""
+    constants = pytest.importorskip("hepunits.constants")
+    units = pytest.importorskip("hepunits.units")
+    assert NUMEXPR_CONSTANTS[canonical] == from_hepunits(constants, units)
+
+
 @pytest.mark.parametrize("canonical", sorted(CONSTANTS_MISSING_FROM_NUMEXPR))
 def test_constants_absent_from_numexpr_raise_a_clear_error(canonical):
     with pytest.raises(ValueError, match="not supported in NumExpr"):
@@ -0,0 +1,174 @@
+"""Sharing identical subtrees between expressions, with ``intern=True``."""
+
+from __future__ import annotations
+
+import gc
+import io
+
+import pytest
+
+import formulate
+from formulate import AST
+from formulate._intern import DEFAULT_MAXSIZE, POOL
+
+PT = "sqrt(px**2 + py**2)"
+
+
+@pytest.fixture(autouse=True)
+def _empty_pool():
+    formulate.intern_clear()
+    yield
+    formulate.intern_configure(maxsize=DEFAULT_MAXSIZE)
+    formulate.intern_clear()
+
+
+def _nodes(expr):
+    return list(expr._walk())
+
+
+def test_subtrees_are_shared_within_and_across_expressions():
+    cut = formulate.from_root(f"{PT} > 20 && {PT} < 200", intern=True)
+    assert cut.left.left is cut.right.left
+    pt = formulate.from_numexpr(PT, intern=True, cache=False)
+    assert pt is cut.left.left
+    # The second `2`, then every node of the second and third square roots.
+    assert formulate.intern_info().hits == 1 + 2 * len(_nodes(pt))
+
+
+def test_sharing_changes_nothing_but_identity():
+    source = f"{PT} > 20 && {PT} < 200 || -{PT} * x[0] == 1"
+    plain = formulate.from_root(source, cache=False)
+    interned = formulate.from_root(source, intern=True)
+    assert str(interned) == str(plain)
+    assert len({id(node) for node in _nodes(interned)}) < len(_nodes(interned))
+    with pytest.raises(TypeError):
+        interned == plain  # noqa: B015
+    with pytest.raises(TypeError):
+        hash(interned)
+
+
+def test_interning_is_off_by_default():
+    first = formulate.from_root(f"{PT} + 1", cache=False)
+    second = formulate.from_root(f"{PT} + 2", cache=False)
+    assert first.left is not second.left
+    assert formulate.intern_info().misses == 0
+
+
+def test_cached_expressions_come_back_interned():
+    product = formulate.from_root("b * c", intern=True)
+    plain = formulate.from_root("a + b * c")
+    assert plain.right is not product
+    interned = formulate.from_root("a + b * c", intern=True)
+    assert interned.right is product
+    assert formulate.from_root("a + b * c", intern=True) is interned
+    assert POOL.owns(interned)
+    assert not POOL.owns(plain)
+    # Cached interned, so a later lookup returns it without walking it again.
+    formulate.cache_clear()
+    fresh = formulate.from_root("x - y", intern=True)
+    misses = formulate.intern_info().misses
+    assert formulate.from_root("x - y", intern=True) is fresh
+    assert formulate.intern_info().misses == misses
+
+
+def test_equal_numbers_are_kept_apart():
+    values = [1, 1.0, True, 0.0, -0.0]
+    interned = [POOL.intern(AST.Literal(value)) for value in values]
+    assert [node.value for node in interned] == values
+    assert [repr(node.value) for node in interned] == list(map(repr, values))
+    assert POOL.intern(AST.Literal(1.0)) is interned[1]
+
+
+def test_nodes_are_dropped_with_the_last_expression_using_them():
+    expr = formulate.from_root(f"{PT} > 20", intern=True, cache=False)
+    assert formulate.intern_info().currsize == len(_nodes(expr)) - 1
+    del expr
+    gc.collect()
+    assert formulate.intern_info().currsize == 0
+
+
+def test_the_pool_is_bounded():
+    formulate.intern_configure(maxsize=3)
+    expr = formulate.from_root(f"{PT} > 20", intern=True, cache=False)
+    assert formulate.intern_info().currsize == 3
+    assert str(expr) == str(formulate.from_root(f"{PT} > 20", cache=False))
+    # The leaves were pooled, and are shared even by nodes that are not.
+    again = formulate.from_root(f"{PT} > 20", intern=True, cache=False)
+    assert again is not expr
+    assert again.left.arguments[0].left.left is expr.left.arguments[0].left.left
+
+    formulate.intern_configure(maxsize=0)
+    formulate.intern_clear()
+    formulate.from_root("a", intern=True, cache=False)
+    assert formulate.intern_info().currsize == 0
+
+    with pytest.raises(ValueError, match="maxsize must be non-negative"):
+        formulate.intern_configure(maxsize=-1)
+
+
+def test_deep_and_long_expressions():
+    depth = 1_000
+    nested = formulate.from_root("sqrt(" * depth + "a" + ")" * depth, intern=True)
+    assert nested.to_root().count("TMath::Sqrt") == depth
+    chain = formulate.from_root(" + ".join(["a"] * 10_000), intern=True)
+    assert len({id(node) for node in _nodes(chain)}) == 10_000
+    assert (
+        chain.to_python()
+        == formulate.from_root(" + ".join(["a"] * 10_000), cache=False).to_python()
+    )
+
+
+# --- Rendering ---
+
+SHARED = [
+    f"{PT} > 20 && {PT} < 200",
+    f"({PT}) ** ({PT}) + x[{PT}]",
+    "a : a : a",
+    "TMath::Min(a, a) + x[0] + x[0]",
+]
+
+
+@pytest.mark.parametrize("parens", ["full", "minimal"])
+@pytest.mark.parametrize("source", SHARED)
+def test_shared_subtrees_render_as_before(source, parens):
+    plain = formulate.from_root(source, cache=False)
+    interned = formulate.from_root(source, intern=True, cache=False)
+
+    def outcome(expr, backend):
+        try:
+            return "".join(getattr(expr, f"iter_{backend}")(parens=parens))
+        except ValueError as error:
+            return str(error)
+
+    for backend in ("root", "numexpr", "python"):
+        assert outcome(interned, backend) == outcome(plain, backend)
+    assert {
+        name: str(result) for name, result in interned.render(parens=parens).items()
+    } == {name: str(result) for name, result in plain.render(parens=parens).items()}
+
+
+def test_a_shared_subtree_is_rendered_once(monkeypatch):
+    calls = []
+    serialize = AST.Call._serialize
+
+    def counting(self, backend, minimal):
+        calls.append(self.function)
+        return serialize(self, backend, minimal)
+
+    monkeypatch.setattr(AST.Call, "_serialize", counting)
+    source = " + ".join([PT] * 50)
+    formulate.from_root(source, cache=False).to_root()
+    assert len(calls) == 50
+    calls.clear()
+    formulate.from_root(source, intern=True, cache=False).to_root()
+    assert len(calls) == 1
+
+
+def test_errors_in_a_shared_subtree_still_come_in_order(monkeypatch):
+    monkeypatch.setattr(AST, "_CHUNK_FRAGMENTS", 1)
+    expr = formulate.from_root("(a + x[0]) * x[0]", intern=True, cache=False)
+    out = io.StringIO()
+    with pytest.raises(ValueError, match="Matrix operations are forbidden"):
+        expr.write_numexpr(out)
+    assert out.getvalue() == "((a + "
+    assert isinstance(expr.render()["numexpr"], ValueError)
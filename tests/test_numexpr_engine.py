@@ -0,0 +1,181 @@
+"""Evaluating with NumExpr, through ``AST.evaluate(..., engine="numexpr")``."""
+
+from __future__ import annotations
+
+import importlib
+import sys
+
+import numexpr
+import numpy as np
+import pytest
+
+import formulate
+from formulate import AST, _numexpr
+
+ROWS = 1000
+
+EXPRESSIONS = [
+    "x + y * 2 - z / 3",
+    "(x > 0.5 && y < 0.5) || !(z >= 0.25)",
+    "-x ** 2 + y % 0.3",
+    "TMath::Sqrt(x**2 + y**2) * TMath::Pi() - TMath::E()",
+    "TMath::ATan2(y, x) + TMath::Log10(z + 1) + abs(x - y)",
+    "n * 3 + n / 2 - n % 4",
+    "Sum$(x * y)",
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_programs():
+    _numexpr._programs.clear()
+    yield
+    _numexpr._programs.clear()
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "x": rng.random(ROWS),
+        "y": rng.random(ROWS),
+        "z": rng.random(ROWS),
+        "n": rng.integers(1, 100, ROWS),
+    }
+
+
+@pytest.fixture
+def compilations(monkeypatch):
+    """The expressions NumExpr is asked to compile."""
+    compile_ = _numexpr.necompiler.NumExpr
+    texts = []
+
+    def recording(text, *args, **kwargs):
+        texts.append(text)
+        return compile_(text, *args, **kwargs)
+
+    monkeypatch.setattr(_numexpr.necompiler, "NumExpr", recording)
+    return texts
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_matches_numexpr_on_the_rendering(source, arrays):
+    expr = formulate.from_root(source)
+    expected = numexpr.evaluate(expr.to_numexpr(), local_dict=arrays)
+    result = expr.evaluate(arrays, engine="numexpr")
+    np.testing.assert_array_equal(result, expected)
+    assert result.dtype == expected.dtype
+
+
+def test_numexpr_spellings(arrays):
+    expr = formulate.from_numexpr("where(x > y, x, y) + log1p(z) + (n & 6)")
+    np.testing.assert_array_equal(
+        expr.evaluate(arrays, engine="numexpr"),
+        numexpr.evaluate(expr.to_numexpr(), local_dict=arrays),
+    )
+
+
+def test_dotted_names_are_bound_for_the_caller():
+    expr = formulate.from_root("Muon.pt * 2 + Muon.eta")
+    arrays = {"Muon.pt": np.arange(5.0), "Muon.eta": np.ones(5)}
+    assert "Muon_2e_pt" in expr.to_numexpr()
+    np.testing.assert_array_equal(
+        expr.evaluate(arrays, engine="numexpr"), np.arange(5.0) * 2 + 1
+    )
+
+
+def test_scalars():
+    expr = formulate.from_root("a * 2 + 1")
+    assert expr.evaluate({"a": 3}, engine="numexpr") == 7
+
+
+def test_compiled_once_for_every_chunk_and_call(compilations, arrays, monkeypatch):
+    expr = formulate.from_root("x * 2 + y")
+    first = expr.evaluate(arrays, engine="numexpr")
+    # Nothing is rendered again, either.
+    monkeypatch.setattr(AST.AST, "to_numexpr", None)
+    again = expr.evaluate(arrays, engine="numexpr")
+    chunked = expr.evaluate(arrays, engine="numexpr", chunk_size=100)
+    np.testing.assert_array_equal(again, first)
+    np.testing.assert_array_equal(chunked, first)
+    assert compilations == ["((x * 2) + y)"]
+
+
+def test_kept_for_the_expression_not_the_object(compilations, arrays):
+    for _ in range(2):
+        formulate.from_root("x + y", cache=False).evaluate(arrays, engine="numexpr")
+    formulate.from_numexpr("x + y", cache=False).evaluate(arrays, engine="numexpr")
+    assert len(compilations) == 1
+
+
+def test_compiled_again_for_other_types(compilations, arrays):
+    expr = formulate.from_root("x + n")
+    expr.evaluate(arrays, engine="numexpr")
+    as_floats = {**arrays, "n": arrays["n"].astype(float)}
+    result = expr.evaluate(as_floats, engine="numexpr")
+    np.testing.assert_array_equal(result, arrays["x"] + arrays["n"])
+    assert len(compilations) == 2
+
+
+def test_least_recently_used_programs_are_dropped(monkeypatch, arrays):
+    monkeypatch.setattr(_numexpr, "MAXSIZE", 2)
+    for source in ["x + 1", "x + 2", "x + 1", "x + 3"]:
+        formulate.from_root(source).evaluate(arrays, engine="numexpr")
+    kept = {fingerprint for fingerprint, _ in _numexpr._programs}
+    assert kept == {
+        formulate.from_root(source).fingerprint() for source in ["x + 1", "x + 3"]
+    }
+
+
+def test_threads_are_set_for_the_call(monkeypatch, arrays):
+    settings = []
+    set_num_threads = numexpr.set_num_threads
+
+    def recording(count):
+        settings.append(count)
+        return set_num_threads(count)
+
+    monkeypatch.setattr(numexpr, "set_num_threads", recording)
+    before = numexpr.get_num_threads()
+    formulate.from_root("x + y").evaluate(arrays, engine="numexpr", threads=3)
+    assert settings == [3, before]
+    assert numexpr.get_num_threads() == before
+
+
+def test_threads_are_restored_after_an_error(arrays):
+    before = numexpr.get_num_threads()
+    with pytest.raises(KeyError):
+        formulate.from_root("w").evaluate(arrays, engine="numexpr", threads=2)
+    assert numexpr.get_num_threads() == before
+
+
+@pytest.mark.parametrize("count", [0, -1])
+def test_threads_must_be_positive(count, arrays):
+    with pytest.raises(ValueError, match="threads must be positive"):
+        formulate.from_root("x").evaluate(arrays, engine="numexpr", threads=count)
+
+
+def test_threads_are_for_numexpr(arrays):
+    with pytest.raises(ValueError, match="threads only applies"):
+        formulate.from_root("x").evaluate(arrays, threads=2)
+
+
+def test_unknown_engine(arrays):
+    with pytest.raises(ValueError, match="Unknown engine 'numba'"):
+        formulate.from_root("x").evaluate(arrays, engine="numba")
+
+
+def test_refuses_what_to_numexpr_refuses(arrays):
+    with pytest.raises(ValueError, match="forbidden in NumExpr"):
+        formulate.from_root("x[0]").evaluate(arrays, engine="numexpr")
+
+
+def test_missing_variable(arrays):
+    with pytest.raises(KeyError, match="No array named 'w'"):
+        formulate.from_root("x + w").evaluate(arrays, engine="numexpr")
+
+
+def test_needs_numexpr(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numexpr", None)
+    monkeypatch.delitem(sys.modules, "formulate._numexpr", raising=False)
+    with pytest.raises(ImportError, match="needs NumExpr"):
+        importlib.import_module("formulate._numexpr")
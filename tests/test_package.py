@@ -1,7 +1,80 @@
 from __future__ import annotations
 
+import os
+import subprocess
+import sys
+
+import pytest
+
 import formulate
 
 
 def test_version():
     assert formulate.__version__
+
+
+def test_submodules_load_on_first_access(monkeypatch):
+    # The rest of the suite has imported everything, so undo that for AST.
+    monkeypatch.delattr(formulate, "AST")
+    assert formulate.ParseError is formulate.exceptions.ParseError
+    assert formulate.AST.AST.__module__ == "formulate.AST"
+    assert {"AST", "ParseError", "compact", "from_root", "toast"} <= set(dir(formulate))
+
+
+def test_unknown_attribute_is_an_attribute_error():
+    with pytest.raises(AttributeError, match="no_such_thing"):
+        formulate.no_such_thing  # noqa: B018
+
+
+def _imported_by(code):
+    """The modules a fresh interpreter imports to run `code`, besides those it
+    starts with."""
+    script = (
+        "import sys\n"
+        "before = set(sys.modules)\n"
+        f"{code}\n"
+        "print(' '.join(sorted(set(sys.modules) - before)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "FORMULATE_CACHE_DIR": ""},
+    )
+    return set(result.stdout.split())
+
+
+def test_import_loads_only_the_package_and_its_version():
+    """The parsers, and lark with them, are loaded by the first parse."""
+    imported = _imported_by("import formulate")
+    assert {name for name in imported if name.startswith("formulate")} == {
+        "formulate",
+        "formulate._version",
+    }
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import formulate",
+        "from formulate import ParseError",
+        "import formulate; formulate.from_root('a + b').to_numexpr()",
+        "import formulate; formulate.from_numexpr('a & b').to_python()",
+    ],
+)
+def test_import_and_first_parse_do_not_load_lark(code):
+    loaded = _imported_by(code)
+    assert "formulate" in loaded
+    assert not {"lark", "hepunits", "importlib.resources", "numpy", "numexpr"} & loaded
+
+
+def test_parse_errors_still_come_from_lark():
+    loaded = _imported_by(
+        "import formulate\n"
+        "try:\n"
+        "    formulate.from_root('a &')\n"
+        "except formulate.ParseError as e:\n"
+        "    assert type(e.lark_error).__module__.startswith('lark')"
+    )
+    assert "lark" in loaded
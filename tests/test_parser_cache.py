@@ -0,0 +1,158 @@
+"""The on-disk cache of compiled LALR tables.
+
+A cache can only ever make the first parse faster: every way it can be missing,
+stale, unwritable or corrupt has to fall back to compiling the grammar, and the
+parser that comes back has to be indistinguishable from a freshly compiled one.
+"""
+
+from __future__ import annotations
+
+import importlib.resources
+from pathlib import Path
+
+import lark
+import pytest
+
+import formulate
+from formulate import _tables, toast
+
+
+def _grammar(name: str) -> str:
+    return (
+        importlib.resources.files(formulate) / "resources" / f"{name}_grammar.lark"
+    ).read_text()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+# --- Where the cache lives ---
+
+
+def test_environment_variable_overrides_the_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", str(tmp_path))
+    assert _tables.cache_dir() == tmp_path
+
+
+def test_empty_environment_variable_turns_the_cache_off(monkeypatch, tmp_path):
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", "")
+    monkeypatch.chdir(tmp_path)
+    assert _tables.cache_dir() is None
+
+    parser = _tables.load_parser("root", _grammar("root"))
+    assert parser.parse("a + b")
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize(
+    "platform,variable,expected",
+    [
+        ("linux", "XDG_CACHE_HOME", Path("/xdg/formulate")),
+        ("linux", None, Path.home() / ".cache" / "formulate"),
+        ("darwin", None, Path.home() / "Library" / "Caches" / "formulate"),
+        ("win32", "LOCALAPPDATA", Path("/xdg/formulate")),
+        ("win32", None, Path.home() / "AppData" / "Local" / "formulate"),
+    ],
+)
+def test_default_directory_follows_the_platform(
+    monkeypatch, platform, variable, expected
+):
+    monkeypatch.delenv("FORMULATE_CACHE_DIR", raising=False)
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setattr("sys.platform", platform)
+    if variable is not None:
+        monkeypatch.setenv(variable, "/xdg")
+    assert _tables.cache_dir() == expected
+
+
+# --- What the key depends on ---
+
+
+def test_digest_changes_with_the_grammar_and_the_lark_version(monkeypatch):
+    grammar = _grammar("root")
+    digest = _tables.grammar_digest(grammar)
+
+    assert _tables.grammar_digest(grammar) == digest
+    assert _tables.grammar_digest(grammar + "\n") != digest
+
+    monkeypatch.setattr(lark, "__version__", "0.0.0")
+    assert _tables.grammar_digest(grammar) != digest
+
+
+# --- Loading and saving ---
+
+
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_second_load_comes_from_the_cache(cache, monkeypatch, name):
+    grammar = _grammar(name)
+    compiled = _tables.load_parser(name, grammar)
+    (saved,) = cache.iterdir()
+
+    # Loading bypasses __init__, which is where the grammar is compiled.
+    def refuse(*_args, **_kwargs):
+        msg = "compiled despite a cache hit"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(lark.Lark, "__init__", refuse)
+    loaded = _tables.load_parser(name, grammar)
+
+    assert loaded is not compiled
+    assert list(cache.iterdir()) == [saved]
+    assert loaded.parse("a + b * c") == compiled.parse("a + b * c")
+
+
+def test_stale_entries_are_not_loaded(cache):
+    _tables.load_parser("root", _grammar("root"))
+    # Same name, different grammar: a different file, not a wrong parser.
+    parser = _tables.load_parser("root", _grammar("numexpr"))
+
+    assert len(list(cache.iterdir())) == 2
+    assert parser.parse("a & b")
+
+
+def test_corrupt_entry_is_recompiled_and_replaced(cache):
+    grammar = _grammar("root")
+    _tables.load_parser("root", grammar)
+    (saved,) = cache.iterdir()
+    saved.write_bytes(b"not a pickle")
+
+    assert _tables.load_parser("root", grammar).parse("a && b")
+    assert saved.read_bytes() != b"not a pickle"
+
+
+def test_unwritable_directory_falls_back_to_compiling(monkeypatch, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    # A directory underneath a regular file can never be created.
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", str(blocker / "cache"))
+
+    assert _tables.load_parser("root", _grammar("root")).parse("a || b")
+
+
+def test_failed_save_leaves_no_partial_file(cache, monkeypatch):
+    def fail(*_args, **_kwargs):
+        msg = "disk full"
+        raise OSError(msg)
+
+    monkeypatch.setattr(lark.Lark, "save", fail)
+
+    assert _tables.load_parser("root", _grammar("root")).parse("a")
+    assert not list(cache.iterdir())
+
+
+def test_transformer_is_applied_but_not_cached(cache):
+    grammar = _grammar("root")
+    plain = _tables.load_parser("root", grammar, tree_class=toast.ParseTree)
+    (saved,) = cache.iterdir()
+
+    # Loaded from the file the plain parser wrote, and still reduces to an AST.
+    reducing = _tables.load_parser(
+        "root", grammar, transformer=toast.Reducer(), tree_class=toast.ParseTree
+    )
+    assert list(cache.iterdir()) == [saved]
+    assert str(toast.finish(reducing.parse("a + 1"))) == "add(a, 1)"
+    assert str(toast.toast(plain.parse("a + 1"))) == "add(a, 1)"
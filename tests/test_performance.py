@@ -12,15 +12,42 @@ serializer.
 
 from __future__ import annotations
 
+import collections
+import copy
+import dataclasses
+import gc
+import importlib.resources
+import os
+import pickle
 import random
+import re
+import struct
+import subprocess
+import sys
 import time
+import tracemalloc
 
+import lark
+import numexpr
+import numpy as np
 import pytest
+from numexpr import necompiler
 
 import formulate
+from formulate import AST, _numexpr, _tables, toast
+from formulate._traversal import fold
+from formulate.compact import CompactAST
 
 EXPRESSION_LENGTH = 10_000
 TIME_LIMIT_SECONDS = 3.0
+# What `import formulate` may cost.
+IMPORT_BUDGET_SECONDS = 0.05
+
+# Tests that only mean something on a quiet machine, which ``nox -s bench`` runs.
+BENCHMARK = pytest.mark.skipif(
+    not os.environ.get("FORMULATE_BENCHMARKS"),
+    reason="a benchmark; set FORMULATE_BENCHMARKS=1 or run nox -s bench",
+)
 
 VARIABLES = ["a", "b", "c", "d", "x", "y", "z"]
 CONSTANTS = ["1.0", "2.0", "3.14", "42.0", "0.5"]
@@ -68,6 +95,11 @@ def test_every_walk_handles_a_long_expression():
 # Windows/3.10 under coverage, so keep them modest.
 DEEP_NESTING = 1_000
 
+# Levels of the chains that rendering is timed on, and four times as many. Big
+# enough that copying the text of each level into the next, as building every
+# node's string from its children's strings does, outweighs the per-node work.
+SCALING_DEPTH = 10_000
+
 # Redundant parentheses, which the parser has to chew through but which leave
 # nothing behind in the AST.
 NESTING_DEPTH = 100
@@ -97,6 +129,59 @@ def test_deeply_nested_calls_survive_every_walk():
     assert parsed.variables == {"a"}
 
 
+def test_deep_trees_pickle_and_copy():
+    """Pickling flattens the tree first, so depth costs it nothing either."""
+    parsed = formulate.from_root("sqrt(" * DEEP_NESTING + "a" + ")" * DEEP_NESTING)
+
+    for clone in (pickle.loads(pickle.dumps(parsed)), copy.deepcopy(parsed)):
+        assert str(clone).count("sqrt") == DEEP_NESTING
+        assert list(clone.variables) == ["a"]
+
+
+def test_pickles_are_smaller_than_the_dataclasses(monkeypatch):
+    # Shallow enough for the dataclasses' own pickling, which recurses.
+    parsed = formulate.from_root(generate_long_expression(500), engine="fast")
+    flat = pickle.dumps(parsed)
+    assert str(pickle.loads(flat)) == str(parsed)
+
+    monkeypatch.delattr(AST.AST, "__reduce__")
+    nested = pickle.dumps(parsed)
+    assert str(pickle.loads(nested)) == str(parsed)
+
+    assert len(flat) < len(nested) / 2, f"{len(flat)}B flat, {len(nested)}B nested"
+
+
+def _left_chain(length):
+    """``x + x + ... + x``, which nests one level per operator to the left."""
+    node = AST.Symbol("long_branch_name")
+    for _ in range(length):
+        node = AST.BinaryOperator("add", node, AST.Symbol("long_branch_name"))
+    return node
+
+
+@pytest.mark.parametrize(
+    "render", [str, AST.AST.to_root, AST.AST.to_numexpr, AST.AST.to_python]
+)
+def test_rendering_is_linear_in_the_output(render):
+    """Four times the depth takes about four times as long to render, where
+    quadratic growth would take sixteen."""
+    small, large = _left_chain(SCALING_DEPTH), _left_chain(4 * SCALING_DEPTH)
+    assert len(render(large)) < 4.1 * len(render(small))
+    ratio = _best_of(3, lambda: render(large)) / _best_of(3, lambda: render(small))
+    assert ratio < 8
+
+
+@pytest.mark.parametrize("parse", [formulate.from_root, formulate.from_numexpr])
+def test_fast_engine_survives_deep_nesting_and_long_chains(parse):
+    """The fast engine keeps its pending operators and open brackets on a list,
+    so it has the same guarantees as the walks above."""
+    nested = parse("sqrt(" * DEEP_NESTING + "a" + ")" * DEEP_NESTING, engine="fast")
+    assert str(nested).count("sqrt") == DEEP_NESTING
+
+    expr = generate_long_expression(EXPRESSION_LENGTH)
+    assert str(parse(expr, engine="fast", cache=False)) == str(parse(expr))
+
+
 @pytest.mark.parametrize(
     "name,length,parse,serialize",
     [
@@ -110,7 +195,7 @@ def test_parse_and_convert_stay_within_the_time_limit(name, length, parse, seria
     expr = generate_long_expression(length)
 
     start = time.perf_counter()
-    converted = getattr(parse(expr), serialize)()
+    converted = getattr(parse(expr, cache=False), serialize)()
     elapsed = time.perf_counter() - start
 
     assert converted
@@ -120,6 +205,25 @@ def test_parse_and_convert_stay_within_the_time_limit(name, length, parse, seria
     )
 
 
+@pytest.mark.parametrize(
+    "parse,render",
+    [
+        (formulate.from_root, "to_root"),
+        (formulate.from_numexpr, "to_numexpr"),
+    ],
+)
+def test_minimal_parentheses_are_shorter_to_read_back(parse, render):
+    """What `parens="minimal"` is for: the engine downstream has less to parse,
+    and a fraction of the nesting, for the same tree."""
+    tree = parse(generate_long_expression(ROUND_TRIP_LENGTH * 5), cache=False)
+    full = getattr(tree, render)()
+    minimal = getattr(tree, render)(parens="minimal")
+
+    assert len(minimal) < 0.8 * len(full)
+    assert minimal.count("(") < full.count("(") / 2
+    assert str(parse(minimal, cache=False)) == str(tree)
+
+
 @pytest.mark.parametrize(
     "name,forward,backward",
     [
@@ -139,3 +243,492 @@ def test_long_expressions_survive_a_full_round_trip(name, forward, backward):
     canonical = getattr(first_parse(expr), forward)()
     round_tripped = getattr(second_parse(canonical), backward)()
     assert getattr(first_parse(round_tripped), forward)() == canonical
+
+
+def _best_of(repeat, function):
+    """The fastest of `repeat` timings, which is the least noisy estimate."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_cached_tables_cut_the_cold_start(tmp_path, monkeypatch, name):
+    """What a new process pays for its first parser: compiling the grammar,
+    which takes tens of milliseconds, unless an earlier process left the tables
+    in the cache, when loading them is all. Counted rather than timed, since a
+    loaded CI machine makes any ratio of timings unreliable."""
+    grammar = (
+        importlib.resources.files(formulate) / "resources" / f"{name}_grammar.lark"
+    ).read_text()
+    compiled = []
+    compile_grammar = lark.Lark.__init__
+
+    def counted(self, *args, **kwargs):
+        compiled.append(name)
+        compile_grammar(self, *args, **kwargs)
+
+    monkeypatch.setattr(lark.Lark, "__init__", counted)
+
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", "")
+    for _ in range(2):
+        _tables.load_parser(name, grammar)
+    assert len(compiled) == 2
+
+    monkeypatch.setenv("FORMULATE_CACHE_DIR", str(tmp_path))
+    for _ in range(3):
+        _tables.load_parser(name, grammar)
+    assert len(compiled) == 3, "compiled again despite the cached tables"
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def _import_time(module):
+    """The cumulative import time of `module` in a fresh interpreter, as
+    reported by ``python -X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        # Not measured for coverage, if this process is.
+        env={k: v for k, v in os.environ.items() if not k.startswith("COV_CORE")},
+    )
+    # The last line is the module itself; its second column includes
+    # everything it imported. Times are in microseconds.
+    cumulative = result.stderr.strip().splitlines()[-1].split("|")[1]
+    return int(cumulative) / 1e6
+
+
+@pytest.mark.parametrize("parse", [formulate.from_root, formulate.from_numexpr])
+def test_fast_engine_never_falls_back_to_lark(parse, monkeypatch):
+    """The point of the fast engine, which measures several times faster than
+    lark on expressions of any size: it builds the AST itself, and only falls
+    back to lark's LALR parser for what it cannot parse. A valid expression
+    never reaches lark, which is checked here rather than timed."""
+    expr = generate_long_expression(1000)
+    expected = str(parse(expr, engine="lark", cache=False))
+    fallbacks = []
+    get_parser = formulate._get_parser
+
+    def counted(*args):
+        fallbacks.append(args)
+        return get_parser(*args)
+
+    monkeypatch.setattr(formulate, "_get_parser", counted)
+    assert str(parse(expr, engine="fast", cache=False)) == expected
+    assert fallbacks == []
+    parse(expr, engine="lark", cache=False)
+    assert len(fallbacks) == 1
+
+
+def _peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("parse", [formulate.from_root, formulate.from_numexpr])
+def test_reduce_engine_keeps_no_parse_tree(parse):
+    """Building the AST during the reductions means the parse tree, several
+    nodes per token, never exists. Allocation is deterministic, unlike timing,
+    but the peak is only asserted to halve; it measures several times lower."""
+    expr = generate_long_expression(EXPRESSION_LENGTH)
+    parse(expr, engine="reduce")  # load the parser outside the measurement
+
+    tree = _peak_memory(lambda: parse(expr, engine="lark", cache=False))
+    reduced = _peak_memory(lambda: parse(expr, engine="reduce", cache=False))
+
+    assert reduced < tree / 2, (
+        f"parsing with engine='reduce' peaked at {reduced / 1e6:.1f}MB, against "
+        f"{tree / 1e6:.1f}MB with the parse tree"
+    )
+
+
+def test_streaming_keeps_less_than_the_string():
+    """`write_*` holds neither the output nor the list of its fragments, only
+    what is still to come of the nodes being written: for a long chain, a few
+    references per level."""
+
+    class Discard:
+        def write(self, text):
+            pass
+
+    expr = formulate.from_root(
+        generate_long_expression(EXPRESSION_LENGTH * 10), engine="fast", cache=False
+    )
+    expr.write_root(Discard())  # start up outside the measurement
+    whole = _peak_memory(expr.to_root)
+    streamed = _peak_memory(lambda: expr.write_root(Discard()))
+
+    assert streamed < whole / 2, (
+        f"write_root peaked at {streamed / 1e6:.1f}MB, against "
+        f"{whole / 1e6:.1f}MB for to_root"
+    )
+
+
+def test_evaluation_keeps_a_chunk_of_temporaries():
+    """Whole, an expression holds its result and a temporary or two the size of
+    its input; in chunks, the result and a chunk's worth."""
+    rows = 1 << 20
+    rng = np.random.default_rng(0)
+    arrays = {name: rng.random(rows) + 1 for name in VARIABLES}
+    expr = formulate.from_root(generate_long_expression(200), engine="fast")
+    column = arrays["a"].nbytes
+
+    whole = _peak_memory(lambda: expr.evaluate(arrays))
+    chunked = _peak_memory(lambda: expr.evaluate(arrays, chunk_size=1 << 14))
+    assert whole < 3 * column, f"{whole / column:.1f} columns whole"
+    assert chunked < 1.5 * column, f"{chunked / column:.1f} columns in chunks"
+
+
+def test_numexpr_chunks_run_the_compiled_program(monkeypatch):
+    """Rendering and handing NumExpr each chunk pays for the rendering and its
+    checks every time; the engine does both once, for every chunk of every
+    call, which is checked by counting the programs NumExpr compiles."""
+    rows, chunk = 1 << 18, 1 << 12
+    rng = np.random.default_rng(0)
+    arrays = {name: rng.random(rows) + 1 for name in VARIABLES}
+    expr = formulate.from_root(generate_long_expression(200), engine="fast")
+    expected = numexpr.evaluate(expr.to_numexpr(), local_dict=arrays)
+    _numexpr._programs.clear()
+    programs = []
+    compile_program = necompiler.NumExpr
+
+    def counted(*args, **kwargs):
+        programs.append(args[0])
+        return compile_program(*args, **kwargs)
+
+    monkeypatch.setattr(necompiler, "NumExpr", counted)
+    for _ in range(2):
+        result = expr.evaluate(arrays, engine="numexpr", chunk_size=chunk)
+    np.testing.assert_allclose(result, expected)
+    assert programs == [expr.to_numexpr()]
+    _numexpr._programs.clear()
+
+
+def test_short_circuit_skips_the_rows_a_trigger_rejects(monkeypatch):
+    """A cheap cut that rejects nearly every row, in front of kinematics that
+    cost ten operations a row: short-circuited, those run on what is left,
+    which is checked by the rows they are computed for rather than timed."""
+    rows = 1 << 20
+    rng = np.random.default_rng(0)
+    arrays = {name: rng.normal(size=rows) for name in ("px", "py", "pz")}
+    arrays["trigger"] = rng.random(rows) < 0.01
+    expr = formulate.from_root(
+        "trigger && TMath::Sqrt(px**2 + py**2 + pz**2) * TMath::Exp(-px) > 0.5"
+    )
+    expected = expr.evaluate(arrays)
+    computed = []
+    exp = np.exp
+
+    def counted(x, *args, **kwargs):
+        computed.append(np.size(x))
+        return exp(x, *args, **kwargs)
+
+    monkeypatch.setattr(np, "exp", counted)
+    strategies = []
+    result = expr.evaluate(arrays, short_circuit=True, strategies=strategies)
+    np.testing.assert_array_equal(result, expected)
+
+    kept = int(np.count_nonzero(arrays["trigger"]))
+    assert [(s.rows, s.undecided, s.strategy) for s in strategies] == [
+        (rows, kept, "compact")
+    ]
+    assert computed == [kept]
+
+
+def test_compiled_python_is_kept_and_compiles_at_any_depth():
+    """CPython will not even parse the rendering of a long expression, which
+    nests a parenthesis per operator; the compiled function is built from the
+    tree at any depth, and asking for it again is a lookup."""
+    deep = formulate.from_root(generate_long_expression(2_000), engine="fast")
+    with pytest.raises(SyntaxError, match="too many nested parentheses"):
+        compile(deep.to_python(), "<deep>", "eval")
+    values = np.arange(1.0, 1.0 + len(deep.variables))
+    arrays = dict(zip(deep.variables, values, strict=True))
+    np.testing.assert_allclose(deep.compile_python()(*values), deep.evaluate(arrays))
+
+    function = deep.compile_python()
+    assert deep.compile_python() is function
+    # Kept by fingerprint, so an equal expression parsed afresh finds it too.
+    again = formulate.from_root(
+        generate_long_expression(2_000), engine="fast", cache=False
+    )
+    assert again.compile_python() is function
+
+
+def test_scalar_functions_run_an_event_loop():
+    """Each NumPy function costs a microsecond or so on one float, where its
+    counterpart in math costs a few dozen nanoseconds, so the scalar function
+    calls no NumPy at all for an ordinary event. What it computes, event by
+    event, is checked against ROOT's meaning rather than timed."""
+    expr = formulate.from_root(
+        "TMath::Sqrt(px**2 + py**2) > 20 && abs(eta) < 2.4 && TMath::Cos(phi) > 0"
+    )
+    rng = np.random.default_rng(0)
+    px, py, eta, phi = rng.normal(20, 10, (4, 20_000))
+    cut = expr.compile_python(scalar=True)
+    called = [cut.__globals__[name] for name in cut.__code__.co_names]
+    assert not any(isinstance(function, np.ufunc) for function in called)
+
+    passed = [cut(*map(float, event)) for event in zip(px, py, eta, phi, strict=True)]
+    expected = (np.hypot(px, py) > 20) & (np.abs(eta) < 2.4) & (np.cos(phi) > 0)
+    assert passed == expected.tolist()
+    # && stops at the first operand that fails, as in C++: the rest are never
+    # computed, so they may be anything at all.
+    assert cut(0.0, 0.0, None, None) is False
+
+
+def _retained_memory(function):
+    """What the result of `function` holds on to once it has returned."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        # A full collection also empties the interpreter's free lists, which
+        # would otherwise count the temporaries that built the result.
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def test_compact_form_is_a_fraction_of_the_tree():
+    """A dataclass node costs about fifty bytes; a compact one, five. The
+    rebuilt tree shares its names, as a parsed one may not, so the comparison
+    favours the tree."""
+    expr = formulate.from_root(generate_long_expression(EXPRESSION_LENGTH))
+    compact = CompactAST.from_ast(expr)
+    packed, _ = _retained_memory(lambda: CompactAST.from_ast(expr))
+    tree, _ = _retained_memory(compact.to_ast)
+
+    per_node = {
+        name: size / len(compact)
+        for name, size in [("tree", tree), ("compact", packed)]
+    }
+    assert packed < tree / 5, f"bytes per node: {per_node}"
+
+
+PT = "sqrt(px**2 + py**2)"
+
+NODE_TYPES = [
+    AST.Literal,
+    AST.Symbol,
+    AST.UnaryOperator,
+    AST.BinaryOperator,
+    AST.Matrix,
+    AST.Call,
+]
+# One of each, with its properties, fingerprint and interning all asked for.
+NODES = {
+    type(node): node
+    for node in formulate.from_root(
+        f"-x[0] + TMath::Sqrt(2) * {PT}", intern=True, cache=False
+    )._walk()
+}
+for _node in NODES.values():
+    _node.fingerprint(), _node.variables
+CUTS = [
+    f"{PT} > 20",
+    "abs(eta) < 2.4",
+    "q == 1",
+    "nJet >= 2",
+    "sqrt(px**2 + py**2 + pz**2) < 1000",
+    "TMath::Abs(dz) < 0.5 && TMath::Abs(dxy) < 0.2",
+    "iso / pt < 0.15",
+    "mass > 60 && mass < 120",
+]
+
+
+def test_interned_selections_share_their_cuts():
+    """A library of selections built from the same few cuts keeps one copy of
+    each. It measures at about two and a half times smaller."""
+    rng = random.Random(0)
+    selections = [
+        " && ".join([*rng.sample(CUTS, 4), f"run > {i}"]) for i in range(2000)
+    ]
+
+    def library(intern):
+        return [
+            formulate.from_root(s, engine="fast", cache=False, intern=intern)
+            for s in selections
+        ]
+
+    formulate.intern_clear()
+    plain, _ = _retained_memory(lambda: library(False))
+    interned, _ = _retained_memory(lambda: library(True))
+    formulate.intern_clear()
+
+    assert interned < plain / 1.5, (
+        f"{interned / 1e6:.1f}MB interned, {plain / 1e6:.1f}MB not"
+    )
+
+
+def test_shared_subtrees_render_once(monkeypatch):
+    source = " + ".join([f"{PT} * {PT}"] * 1000)
+    plain = formulate.from_root(source, engine="fast", cache=False)
+    interned = formulate.from_root(source, engine="fast", cache=False, intern=True)
+    expected = plain.to_root()
+
+    serialized = collections.Counter()
+    for cls in NODE_TYPES:
+
+        def counting(self, backend, minimal, serialize=cls._serialize):
+            serialized[id(self)] += 1
+            return serialize(self, backend, minimal)
+
+        monkeypatch.setattr(cls, "_serialize", counting)
+
+    assert interned.to_root() == expected
+    assert max(serialized.values()) == 1
+    distinct = len(serialized)
+    # The sum and its 999 additions are all that differ; the rest is one node.
+    assert distinct < 1010
+
+    # Streamed, the text is gone by the time it comes round again.
+    serialized.clear()
+    assert "".join(interned.iter_root()) == expected
+    assert sum(serialized.values()) == plain.node_count
+
+    serialized.clear()
+    rendered = interned.render()
+    assert rendered["root"] == expected
+    assert len(serialized) == distinct
+    assert set(serialized.values()) == {3}
+    formulate.intern_clear()
+
+
+def test_properties_are_walked_for_once(monkeypatch):
+    expression = formulate.from_root(
+        generate_long_expression(EXPRESSION_LENGTH), engine="fast", cache=False
+    )
+    walked = []
+    for cls in NODE_TYPES:
+
+        def counting(self, children=cls._children):
+            walked.append(self)
+            return children(self)
+
+        monkeypatch.setattr(cls, "_children", counting)
+
+    def inspect():
+        return (
+            expression.variables,
+            expression.named_constants,
+            expression.unnamed_constants,
+            expression.node_count,
+            expression.depth,
+        )
+
+    first = inspect()
+    # Each node with children is expanded once, leaves not at all.
+    assert 0 < len(walked) < expression.node_count
+    assert len({id(node) for node in walked}) == len(walked)
+    walked.clear()
+    for _ in range(1000):
+        assert inspect() == first
+    assert walked == []
+
+
+@pytest.mark.parametrize("cls", NODE_TYPES)
+def test_nodes_carry_their_fields_and_a_weak_reference(cls):
+    """What is worked out about a node, its properties, its fingerprint or
+    whether it was interned, is kept beside it rather than in slots every node
+    of every tree would pay for."""
+
+    class Bare:
+        __slots__ = ()
+
+    pointer = struct.calcsize("P")
+    fields = len(dataclasses.fields(cls))
+    # And the weak reference, for the intern pool.
+    assert sys.getsizeof(NODES[cls]) == sys.getsizeof(Bare()) + pointer * (fields + 1)
+
+
+def _count_nodes(tree):
+    count, stack = 0, [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, toast.ParseTree):
+            count += 1
+            stack.extend(node.children)
+    return count
+
+
+def _chained(name):
+    """A parser for the grammar as it was before its unit rules were inlined,
+    and the conversion that went with it, which had to step through every
+    level of each chain."""
+    # `var_name` is left inlined: it is part of a name, not a level of a chain,
+    # and `toast` only reads it off a token.
+    grammar = formulate._read_grammar(name)
+    chain = r"^\?(?!var_name)(\w+):"
+    unit_rules = set(re.findall(chain, grammar, flags=re.MULTILINE))
+    parser = lark.Lark(
+        re.sub(chain, r"\1:", grammar, flags=re.MULTILINE),
+        parser="lalr",
+        tree_class=toast.ParseTree,
+    )
+
+    def expand(node):
+        if node.data in unit_rules:
+            return node.children, lambda child: child
+        return toast._expand(node)
+
+    return parser, lambda tree: fold(tree, expand)
+
+
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_inlined_unit_rules_shrink_the_tree(name):
+    """Every operand used to be wrapped in one node per precedence level it
+    passed through. With those rules inlined there is one node per operator and
+    per operand -- a third as many for ROOT -- and converting has that much
+    less to walk."""
+    expr = generate_long_expression(EXPRESSION_LENGTH)
+    parser = formulate._get_lark_parser(name, False)
+    chained_parser, chained_toast = _chained(name)
+
+    tree = parser.parse(expr)
+    chained_tree = chained_parser.parse(expr)
+    assert _count_nodes(tree) * 2 < _count_nodes(chained_tree)
+    assert str(toast.toast(tree)) == str(chained_toast(chained_tree))
+
+
+@BENCHMARK
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_inlined_unit_rules_parse_and_convert_faster(name, capsys):
+    """Reports, without asserting anything, what inlining the unit rules saves
+    in parsing and converting a long expression, alongside the node counts
+    `test_inlined_unit_rules_shrink_the_tree` checks."""
+    expr = generate_long_expression(EXPRESSION_LENGTH)
+    parser = formulate._get_lark_parser(name, False)
+    chained_parser, chained_toast = _chained(name)
+
+    now = _best_of(3, lambda: toast.toast(parser.parse(expr)))
+    before = _best_of(3, lambda: chained_toast(chained_parser.parse(expr)))
+    with capsys.disabled():
+        print(
+            f"\n{name}: parse and convert {now * 1e3:.0f}ms with the unit rules "
+            f"inlined, {before * 1e3:.0f}ms without ({now / before:.0%}); "
+            f"{_count_nodes(parser.parse(expr))} nodes against "
+            f"{_count_nodes(chained_parser.parse(expr))}"
+        )
+
+
+@BENCHMARK
+def test_import_stays_within_its_budget():
+    """Importing the package must stay cheap enough to ignore in a short script.
+    It measures about 20ms, most of it the standard library; lark alone takes
+    several times that, so this fails if something heavy is back. What it
+    imports is checked on every run, in test_package.py."""
+    cost = min(_import_time("formulate") for _ in range(5))
+    assert cost < IMPORT_BUDGET_SECONDS, (
+        f"import formulate took {cost * 1e3:.1f}ms, over the budget of "
+        f"{IMPORT_BUDGET_SECONDS * 1e3:.0f}ms; see python -X importtime"
+    )
@@ -0,0 +1,65 @@
+"""Pickling and copying expressions, which go through their flat form."""
+
+from __future__ import annotations
+
+import copy
+import pickle
+
+import pytest
+
+import formulate
+from formulate.compact import CompactAST
+
+EXPRESSIONS = [
+    "a + b * c",
+    "TMath::Sqrt(x**2 + y**2) > 10 && !flag",
+    "-(a - b) ** 2 / c",
+    "x[0][i + 1] + TMath::Infinity()",
+    "TMath::Min(a, b) : c",
+    "pow(a, b) - Length$()",
+    "1 + 1.0 + 1e300 * -0.0",
+]
+
+
+@pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_round_trip(source, protocol):
+    expr = formulate.from_root(source)
+    clone = pickle.loads(pickle.dumps(expr, protocol))
+    assert clone is not expr
+    assert str(clone) == str(expr)
+    assert [type(node) for node in clone._walk()] == [
+        type(node) for node in expr._walk()
+    ]
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_copies(source):
+    expr = formulate.from_root(source)
+    for clone in (copy.copy(expr), copy.deepcopy(expr)):
+        assert clone is not expr
+        assert str(clone) == str(expr)
+
+
+def test_subtrees_pickle_on_their_own():
+    expr = formulate.from_root("sqrt(x**2 + y**2) > 1")
+    [subtree] = [node for node in expr._walk() if str(node).startswith("add")]
+    assert str(pickle.loads(pickle.dumps(subtree))) == str(subtree)
+
+
+def test_pickled_as_the_flat_form():
+    expr = formulate.from_root("a + b * c")
+    function, (compact,) = expr.__reduce__()
+    assert function == CompactAST.to_ast
+    assert isinstance(compact, CompactAST)
+    assert str(function(compact)) == str(expr)
+
+
+def test_shared_subtrees_come_back_apart():
+    """Interning is a property of the process that did it, like the pool."""
+    expr = formulate.from_root("(a + b) * (a + b)", cache=False, intern=True)
+    assert expr.left is expr.right
+    clone = pickle.loads(pickle.dumps(expr))
+    assert clone.left is not clone.right
+    assert str(clone) == str(expr)
+    formulate.intern_clear()
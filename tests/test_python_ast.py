@@ -0,0 +1,193 @@
+"""Python syntax trees and compiled functions, with ``AST.to_python_ast`` and
+``AST.compile_python``."""
+
+from __future__ import annotations
+
+import ast
+import inspect
+import sys
+
+import numpy as np
+import pytest
+
+import formulate
+from formulate import AST, _python_ast, identifiers
+
+ROWS = 100
+
+EXPRESSIONS = [
+    "x + y * 2 - z / 3",
+    "(x > 0.5 && y < 0.5) || !(z >= 0.25)",
+    "-x ** 2 + +y % 0.3",
+    "2 ** -x",
+    "-(-x)",
+    "TMath::Sqrt(x**2 + y**2) * TMath::Pi() - TMath::E()",
+    "TMath::ATan2(y, x) + TMath::Log10(z + 1) + abs(x - y)",
+    "x == y || x != z",
+    "n * 3 + n / 2 - n % 4",
+    "sqrt2 * TMath::InvPi() + TMath::Infinity() * 0 + hbarc + eminus",
+    "x[0] + y[n[1]] + m[1][2]",
+    "Sum$(x) + Min$(y) * Max$(z)",
+    "x : y + 1 : z",
+    "Muon.pt * 2 + Muon.p4.eta",
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_functions():
+    _python_ast._functions.clear()
+    yield
+    _python_ast._functions.clear()
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "x": rng.random(ROWS),
+        "y": rng.random(ROWS),
+        "z": rng.random(ROWS),
+        "n": rng.integers(1, 3, ROWS),
+        "m": rng.random((4, 4)),
+    }
+
+
+def _assert_same(result, expected):
+    assert type(result) is type(expected)
+    if isinstance(expected, tuple):
+        assert len(result) == len(expected)
+        for each, one in zip(result, expected, strict=True):
+            _assert_same(each, one)
+        return
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_tables_cover_python():
+    operators = set(identifiers.PYTHON_OPERATOR_SYMBOLS) - {"multi_out"}
+    assert set(_python_ast._BINARY) | set(_python_ast._COMPARISONS) | set(
+        _python_ast._UNARY
+    ) | set(identifiers.PYTHON_UNARY_FUNCTIONS) == operators | {"pos", "neg", "inv"}
+    assert set(_python_ast.CONSTANT_VALUES) == set(identifiers.PYTHON_CONSTANTS)
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+@pytest.mark.parametrize("parens", ["full", "minimal"])
+def test_is_the_parsed_rendering(source, parens):
+    expr = formulate.from_root(source)
+    parsed = ast.parse(expr.to_python(parens=parens), mode="eval")
+    assert ast.dump(expr.to_python_ast()) == ast.dump(parsed)
+
+
+@pytest.mark.parametrize("name", sorted(identifiers.PYTHON_CONSTANTS))
+def test_constants_are_the_parsed_rendering(name):
+    expr = AST.Symbol(name)
+    parsed = ast.parse(expr.to_python(), mode="eval")
+    assert ast.dump(expr.to_python_ast()) == ast.dump(parsed)
+
+
+def test_constants_are_copied():
+    tree = formulate.from_root("TMath::Infinity()").to_python_ast()
+    tree.body.args[0].value = "nan"
+    again = formulate.from_root("TMath::Infinity()").to_python_ast()
+    assert ast.unparse(again) == "float('inf')"
+
+
+def test_compiles_as_it_is(arrays):
+    expr = formulate.from_root(EXPRESSIONS[0])
+    code = compile(expr.to_python_ast(), "<test>", "eval")
+    _assert_same(eval(code, {"np": np, **arrays}), expr.evaluate(arrays))
+
+
+def test_unsupported_function():
+    expr = formulate.from_numexpr("contains(x, y)")
+    with pytest.raises(ValueError, match='Function "contains" is not supported'):
+        expr.to_python_ast()
+    with pytest.raises(ValueError, match='Function "contains" is not supported'):
+        expr.compile_python()
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS[:-1])
+def test_function_matches_evaluate(source, arrays):
+    expr = formulate.from_root(source)
+    function = expr.compile_python()
+    result = function(*[arrays[name] for name in expr.variables])
+    _assert_same(result, expr.evaluate(arrays))
+
+
+def test_parameters_are_the_variables():
+    expr = formulate.from_root("Muon.pt * 2 + Muon.p4.eta - x")
+    parameters = inspect.signature(expr.compile_python()).parameters
+    assert list(parameters) == ["Muon_2e_pt", "Muon_2e_p4_2e_eta", "x"]
+    assert expr.compile_python()(1.0, 2.0, 3.0) == 1.0
+
+
+def test_dotted_names_are_not_attributes():
+    class Muon:
+        pt = 100.0
+
+    function = formulate.from_root("Muon.pt * 2").compile_python()
+    assert function(3.0) == 6.0
+    with pytest.raises(TypeError):
+        function(Muon)
+
+
+def test_names_that_clash_with_its_own():
+    # Deep enough to need locals, which must not be called _t0 either.
+    terms = " + ".join(["np"] * 200)
+    expr = formulate.from_root(f"TMath::Sqrt(np) + _t0 * ({terms})")
+    assert expr.compile_python()(4.0, 2.0) == 2.0 + 2.0 * 4.0 * 200
+
+
+def test_constants_are_values():
+    function = formulate.from_root("TMath::Infinity() + eminus * x").compile_python()
+    code = function.__code__
+    assert np.inf in code.co_consts
+    assert "float" not in code.co_names
+    assert function(0.0) == np.inf
+
+
+def test_function_is_kept():
+    first = formulate.from_root("x + y").compile_python()
+    assert formulate.from_numexpr("x + y").compile_python() is first
+    assert formulate.from_root("x - y").compile_python() is not first
+
+
+def test_functions_are_bounded(monkeypatch):
+    monkeypatch.setattr(_python_ast, "MAXSIZE", 2)
+    first = formulate.from_root("x + 1").compile_python()
+    formulate.from_root("x + 2").compile_python()
+    assert formulate.from_root("x + 1").compile_python() is first
+    formulate.from_root("x + 3").compile_python()
+    # The least recently used one went.
+    assert list(_python_ast._functions) == [
+        (formulate.from_root(source).fingerprint(), False)
+        for source in ("x + 1", "x + 3")
+    ]
+    assert formulate.from_root("x + 1").compile_python() is first
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        " + ".join(f"x{i % 7}" for i in range(5_000)),
+        "-" * 3_000 + "x0",
+        "TMath::Sqrt(" * 1_000 + "x0" + ")" * 1_000,
+    ],
+)
+def test_deep_trees_compile(source):
+    expr = formulate.from_root(source)
+    assert expr.depth > 1_000
+    values = np.arange(1.0, 1.0 + len(expr.variables))
+    arrays = dict(zip(expr.variables, values, strict=True))
+    result = expr.compile_python()(*values)
+    np.testing.assert_allclose(result, expr.evaluate(arrays))
+    # The expression itself builds at any depth, however far compile() goes.
+    assert isinstance(expr.to_python_ast(), ast.Expression)
+
+
+def test_needs_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(ImportError, match="compile_python\\(\\) needs NumPy"):
+        formulate.from_root("x + 1").compile_python()
+    # Building the syntax tree does not.
+    assert ast.unparse(formulate.from_root("x + 1").to_python_ast()) == "x + 1"
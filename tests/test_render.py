@@ -0,0 +1,83 @@
+"""Rendering several backends in one walk, with ``AST.render``."""
+
+from __future__ import annotations
+
+import pytest
+
+import formulate
+from formulate.AST import BinaryOperator, Symbol
+
+EXPRESSIONS = [
+    "a + b * c",
+    "TMath::Sqrt(x**2 + y**2) > 10 && !flag",
+    "-(a - b) ** 2 / c",
+    "x[0] + TMath::Infinity()",
+    "TMath::Min(a, b) : c",
+    "pow(a, b)",
+]
+
+
+def _outcome(result):
+    if isinstance(result, Exception):
+        return type(result), str(result)
+    return result
+
+
+def _one_at_a_time(expr, backend, parens):
+    try:
+        return getattr(expr, f"to_{backend}")(parens=parens)
+    except ValueError as error:
+        return error
+
+
+@pytest.mark.parametrize("parens", ["full", "minimal"])
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_same_as_rendering_one_backend_at_a_time(source, parens):
+    expr = formulate.from_root(source)
+    rendered = expr.render(parens=parens)
+    assert list(rendered) == ["root", "numexpr", "python"]
+    assert {name: _outcome(result) for name, result in rendered.items()} == {
+        name: _outcome(_one_at_a_time(expr, name, parens)) for name in rendered
+    }
+
+
+def test_a_failing_backend_does_not_stop_the_others():
+    rendered = formulate.from_numexpr("a ^ b").render()
+    assert rendered["numexpr"] == "(a ^ b)"
+    assert rendered["python"] == "(a ^ b)"
+    assert isinstance(rendered["root"], ValueError)
+    assert str(rendered["root"]) == 'Operator "xor" is not supported in ROOT.'
+
+
+def test_every_backend_can_fail():
+    rendered = BinaryOperator("bogus", Symbol("a"), Symbol("b")).render()
+    assert all(isinstance(result, ValueError) for result in rendered.values())
+
+
+def test_backends_are_chosen_by_name():
+    expr = formulate.from_root("a && b")
+    assert expr.render(["python", "root", "python"]) == {
+        "python": "(a & b)",
+        "root": "(a && b)",
+    }
+    assert expr.render([]) == {}
+
+
+def test_deep_nesting():
+    depth = 1_000
+    expr = formulate.from_root("sqrt(" * depth + "a" + ")" * depth)
+    rendered = expr.render()
+    assert rendered["python"].count("np.sqrt") == depth
+    assert rendered["root"] == expr.to_root()
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        ({"backends": ["latex"]}, "Unknown backend 'latex'"),
+        ({"parens": "some"}, "Unknown parens 'some'"),
+    ],
+)
+def test_arguments_are_checked_straight_away(options, message):
+    with pytest.raises(ValueError, match=message):
+        formulate.from_root("a").render(**options)
@@ -0,0 +1,218 @@
+"""Compiling for one event at a time, with ``AST.compile_python(scalar=True)``."""
+
+from __future__ import annotations
+
+import math
+import sys
+
+import numpy as np
+import pytest
+
+import formulate
+from formulate import _python_ast, _scalar, identifiers
+
+ROWS = 50
+
+EXPRESSIONS = [
+    "x + y * 2 - z / 3",
+    "-x ** 2 + +y * 0.3",
+    "TMath::Sqrt(x**2 + y**2) * TMath::Pi() - TMath::E()",
+    "TMath::ATan2(y, x) + TMath::Log10(z + 1) + abs(x - y)",
+    "TMath::Min(x, y) - TMath::Max(y, z) + pow(x, 2)",
+    "sin(x) + cos(y) + tan(z) + asin(x) + acos(y) + atan(z)",
+    "sinh(x) + cosh(y) + tanh(z) + asinh(x) + acosh(y + 1) + atanh(z / 2)",
+    "exp(x) + log(y) + ceil(z * 10) + floor(x * 10)",
+    "sqrt2 * TMath::InvPi() + hbarc * x",
+    "x > 0.5 && y < 0.5 || !(z >= 0.25)",
+    "x == y || x != z",
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_functions():
+    _python_ast._functions.clear()
+    yield
+    _python_ast._functions.clear()
+
+
+def _compiled(source, parse=formulate.from_root):
+    return parse(source).compile_python(scalar=True)
+
+
+def test_tables_cover_python():
+    functions = set(identifiers.PYTHON_FUNCTIONS) - {"conj", "real", "imag", "where"}
+    assert functions | {"log2", "length", "fmod", "trunc"} == set(_scalar._FAST)
+    assert set(_scalar._EXACT) - {"divide"} <= set(_scalar._FAST)
+    assert all(hasattr(np, name) for name in _scalar._EXACT.values())
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_matches_evaluate_row_by_row(source):
+    rng = np.random.default_rng(0)
+    expr = formulate.from_root(source)
+    arrays = {name: rng.random(ROWS) for name in expr.variables}
+    expected = expr.evaluate(arrays)
+    function = expr.compile_python(scalar=True)
+    for row in range(ROWS):
+        values = [float(arrays[name][row]) for name in expr.variables]
+        assert function(*values) == pytest.approx(expected[row], rel=1e-12)
+
+
+def test_results_are_python_values():
+    function = _compiled("x > 1 && y > 1")
+    assert function(2.0, 2.0) is True
+    assert function(0.0, 2.0) is False
+    assert type(_compiled("x * 2")(1.0)) is float
+
+
+def test_and_and_or_short_circuit():
+    # Sum$ of None would raise, if it were ever computed.
+    function = _compiled("x > 0 && Sum$(v) > 1")
+    assert function(-1.0, None) is False
+    assert function(1.0, [1.0, 2.0]) is True
+    function = _compiled("x > 0 || Sum$(v) > 1")
+    assert function(1.0, None) is True
+
+
+@pytest.mark.parametrize(
+    ("source", "values", "expected"),
+    [
+        # Any number but zero is true, NaN included, as in C++.
+        ("x && y", (2.0, -0.5), True),
+        ("x && y", (math.nan, 1.0), True),
+        ("x || y", (0.0, 0.0), False),
+        ("!x", (math.nan,), False),
+        ("!x", (0.0,), True),
+        ("x ^ y", (1.0, 0.0), True),
+        ("x ^ y", (3.0, 2.0), False),
+    ],
+)
+def test_logic_is_on_truth(source, values, expected):
+    parse = formulate.from_numexpr if "^" in source else formulate.from_root
+    assert _compiled(source, parse)(*values) is expected
+
+
+@pytest.mark.parametrize(
+    ("x", "y", "expected"),
+    [(7.9, 2.1, 1.0), (-7.0, 2.0, -1.0), (7.0, -2.0, 1.0), (-7.5, 2.9, -1.0)],
+)
+def test_modulo_truncates_its_operands(x, y, expected):
+    result = _compiled("x % y")(x, y)
+    assert result == expected
+    assert type(result) is float
+
+
+@pytest.mark.parametrize(
+    ("source", "values", "expected"),
+    [
+        ("x / y", (1.0, 0.0), math.inf),
+        ("x / y", (-1.0, 0.0), -math.inf),
+        ("x / y", (1.0, -0.0), -math.inf),
+        ("x / y", (0.0, 0.0), math.nan),
+        ("x / y", (1, 0), math.inf),
+        ("x % y", (1.0, 0.0), math.nan),
+        ("x % y", (math.inf, 2.0), math.nan),
+        ("TMath::Sqrt(x)", (-1.0,), math.nan),
+        ("TMath::Log(x)", (0.0,), -math.inf),
+        ("TMath::Log(x)", (-1.0,), math.nan),
+        ("x ** y", (-8.0, 1 / 3), math.nan),
+        ("x ** y", (0.0, -1.0), math.inf),
+        ("x ** y", (10.0, 400.0), math.inf),
+        ("x ** y", (2, -1), 0.5),
+        ("TMath::Exp(x)", (1000.0,), math.inf),
+        ("TMath::CosH(x)", (-1000.0,), math.inf),
+        ("TMath::ASin(x)", (2.0,), math.nan),
+        ("TMath::ATanH(x)", (1.0,), math.inf),
+        ("TMath::Ceil(x)", (math.inf,), math.inf),
+        ("TMath::Floor(x)", (math.nan,), math.nan),
+    ],
+)
+def test_arithmetic_follows_c_rather_than_raising(source, values, expected):
+    result = _compiled(source)(*values)
+    assert type(result) is float
+    if math.isnan(expected):
+        assert math.isnan(result)
+    else:
+        assert result == expected
+
+
+def test_errors_are_recomputed_as_a_whole():
+    function = _compiled("x / y > 1 : TMath::Sqrt(y) : y % 2")
+    assert function(1.0, 0.0)[0] is True
+    assert math.isnan(function(1.0, -4.0)[1])
+    assert function(1.0, 3.0) == (False, math.sqrt(3.0), 1.0)
+
+
+def test_min_and_max_follow_tmath():
+    assert _compiled("TMath::Min(a, b)")(1.0, 2.0) == 1.0
+    assert math.isnan(_compiled("TMath::Min(a, b)")(1.0, math.nan))
+    assert _compiled("TMath::Min(a, b)")(math.nan, 1.0) == 1.0
+    assert _compiled("TMath::Max(a, b)")(math.nan, 1.0) == 1.0
+    assert _compiled("TMath::Max(a, b)")(2.0, 1.0) == 2.0
+
+
+def test_log2():
+    # Which NumPy has, and to_python() does not write.
+    assert _compiled("TMath::Log2(x)")(8.0) == 3.0
+    assert _compiled("TMath::Log2(x)")(0.0) == -math.inf
+
+
+def test_ceil_and_floor_are_doubles():
+    assert type(_compiled("TMath::Ceil(x) + TMath::Floor(x)")(1.5)) is float
+
+
+def test_arrays_of_one_event():
+    function = _compiled("Sum$(x) + Length$(x) + Max$(x) + Min$(x) + x[1] + m[1][0]")
+    assert function([1.0, 2.0, 4.0], [[0.0], [8.0]]) == 7 + 3 + 4 + 1 + 2 + 8
+    assert _compiled("Sum$(x)")([]) == 0
+    with pytest.raises(ValueError, match="empty"):
+        _compiled("Max$(x)")([])
+
+
+def test_where():
+    function = _compiled("where(x > 0, x, -x)", formulate.from_numexpr)
+    assert function(-2.0) == 2.0
+    assert function(3.0) == 3.0
+
+
+def test_constants():
+    assert _compiled("TMath::Infinity() - x")(1.0) == math.inf
+    assert _compiled("TMath::Pi() * x")(1.0) == math.pi
+
+
+def test_dotted_names_and_names_that_clash():
+    expr = formulate.from_root("Muon.pt * 2 + _fsqrt + TMath::Sqrt(_f)")
+    assert expr.compile_python(scalar=True)(1.0, 2.0, 4.0) == 6.0
+
+
+def test_unsupported_function():
+    with pytest.raises(ValueError, match='"erf" is not supported in scalar'):
+        _compiled("TMath::Erf(x)")
+    with pytest.raises(ValueError, match='"conj" is not supported in scalar'):
+        _compiled("conj(x)", formulate.from_numexpr)
+
+
+def test_kept_apart_from_the_numpy_function():
+    expr = formulate.from_root("x / 2")
+    scalar = expr.compile_python(scalar=True)
+    assert expr.compile_python(scalar=True) is scalar
+    assert expr.compile_python() is not scalar
+
+
+def test_deep_trees_compile():
+    terms = [f"x{i % 7}" for i in range(3_000)]
+    expr = formulate.from_root(" / ".join(terms))
+    assert expr.depth > 1_000
+    function = expr.compile_python(scalar=True)
+    values = [float(value) for value in range(1, 8)]
+    assert function(*values) == pytest.approx(
+        expr.evaluate(dict(zip(expr.variables, values, strict=True)))
+    )
+    values[3] = 0.0
+    assert function(*values) == math.inf
+
+
+def test_needs_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(ImportError, match="compile_python\\(scalar=True\\) needs"):
+        _compiled("x + 1")
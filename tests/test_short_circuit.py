@@ -0,0 +1,256 @@
+"""Short-circuiting ``&&`` and ``||`` over arrays, with
+``AST.evaluate(short_circuit=True)``."""
+
+from __future__ import annotations
+
+import functools
+
+import numpy as np
+import pytest
+
+import formulate
+from formulate import AST, _evaluate
+
+ROWS = 10_000
+
+# Enough operations for taking the rows to be worth it.
+COSTLY = "TMath::Sqrt(px**2 + py**2 + pz**2) * TMath::Exp(-px) > 0.5"
+
+EXPRESSIONS = [
+    f"t < 0.05 && {COSTLY}",
+    f"t < 0.95 || {COSTLY}",
+    f"t < 0.5 && u < 0.1 && {COSTLY}",
+    f"t < 0.1 && (u < 0.9 || {COSTLY})",
+    f"t < 0.6 && {COSTLY}",
+    "t < 0.05 && py < 0.5",
+    f"t < 0.05 && {COSTLY} && c > 1",
+    f"!(t < 0.05 && {COSTLY}) || t > 0.99",
+]
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "t": rng.random(ROWS),
+        "u": rng.random(ROWS),
+        "px": rng.normal(size=ROWS),
+        "py": rng.normal(size=ROWS),
+        "pz": rng.normal(size=ROWS),
+        "c": 2.0,
+    }
+
+
+def _strategies(expr, arrays, **options):
+    strategies = []
+    result = expr.evaluate(arrays, short_circuit=True, strategies=strategies, **options)
+    return result, [(str(s.node), s.undecided, s.strategy) for s in strategies]
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_matches_dense_evaluation(source, arrays):
+    expr = formulate.from_root(source)
+    result = expr.evaluate(arrays, short_circuit=True)
+    expected = expr.evaluate(arrays)
+    assert result.dtype == expected.dtype
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_right_operand_is_taken_for_undecided_rows(arrays):
+    expr = formulate.from_root(EXPRESSIONS[0])
+    _, strategies = _strategies(expr, arrays)
+    assert strategies == [
+        (str(expr), int(np.count_nonzero(arrays["t"] < 0.05)), "compact")
+    ]
+
+
+def test_or_leaves_the_false_rows(arrays):
+    expr = formulate.from_root(EXPRESSIONS[1])
+    _, strategies = _strategies(expr, arrays)
+    assert strategies == [
+        (str(expr), int(np.count_nonzero(arrays["t"] >= 0.95)), "compact")
+    ]
+
+
+def test_a_record_for_each_operator_as_it_finishes(arrays):
+    expr = formulate.from_root(EXPRESSIONS[3])
+    _, strategies = _strategies(expr, arrays)
+    # The || is computed on the rows the && took, after which the && is done.
+    kept = arrays["t"] < 0.1
+    assert strategies == [
+        (str(expr.right), int(np.count_nonzero(arrays["u"][kept] >= 0.9)), "compact"),
+        (str(expr), int(np.count_nonzero(kept)), "compact"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("source", "why"),
+    [
+        (EXPRESSIONS[4], "too few rows decided"),
+        (EXPRESSIONS[5], "too cheap a right operand"),
+        (f"t < 0.05 && Sum$(px) + {COSTLY}", "reads across rows"),
+        (f"t < 0.05 && px[0] + {COSTLY}", "reads across rows"),
+        ("t < 0.05 && c > 1", "no row of any input"),
+    ],
+)
+def test_dense_when_compacting_does_not_pay(source, why, arrays):
+    _, strategies = _strategies(formulate.from_root(source), arrays)
+    assert [strategy for _, _, strategy in strategies] == ["dense"], why
+
+
+def test_inputs_for_every_row_are_kept_whole(arrays):
+    expr = formulate.from_root(f"t < 0.05 && c * {COSTLY}")
+    result, strategies = _strategies(expr, arrays)
+    np.testing.assert_array_equal(result, expr.evaluate(arrays))
+    assert strategies[0][2] == "compact"
+
+
+def test_dense_for_inputs_of_other_shapes(arrays):
+    # One value broadcast to every row, which taking rows would not know.
+    arrays["pz"] = np.ones(1)
+    _, strategies = _strategies(formulate.from_root(EXPRESSIONS[0]), arrays)
+    assert strategies[0][2] == "dense"
+
+
+def test_dense_when_the_left_operand_is_not_booleans(arrays):
+    arrays["n"] = np.arange(ROWS) % 2
+    expr = formulate.from_root(f"n && {COSTLY}")
+    result, strategies = _strategies(expr, arrays)
+    np.testing.assert_array_equal(result, expr.evaluate(arrays))
+    assert strategies == [(str(expr), ROWS, "dense")]
+    _, strategies = _strategies(formulate.from_root(f"1 && {COSTLY}"), arrays)
+    assert strategies[0][1:] == (1, "dense")
+
+
+def test_right_operand_that_is_not_booleans(arrays):
+    # Combining it with the decided rows needs every row of it after all.
+    arrays["n"] = np.arange(ROWS)
+    expr = formulate.from_root("t < 0.05 && n * 2 * 3 * 4 * 5 * 6 * 7 + n")
+    result, strategies = _strategies(expr, arrays)
+    assert result.dtype == np.int64
+    np.testing.assert_array_equal(result, expr.evaluate(arrays))
+    assert strategies[0][2] == "dense"
+
+
+def test_a_right_operand_that_is_not_booleans_is_computed_once(arrays, monkeypatch):
+    # Bitwise & of booleans and floats raises, as it would without
+    # short_circuit, after the square roots have been taken once, of every row.
+    sizes = []
+    sqrt = np.sqrt
+
+    def counting(x, *args, **kwargs):
+        sizes.append(np.size(x))
+        return sqrt(x, *args, **kwargs)
+
+    monkeypatch.setattr(np, "sqrt", counting)
+    arrays["px"] = np.abs(arrays["px"])
+    expr = formulate.from_root(f"t < 0.05 && sqrt(px) * {COSTLY[:-6]}")
+    strategies = []
+    with pytest.raises(TypeError):
+        expr.evaluate(arrays, short_circuit=True, strategies=strategies)
+    assert sizes == [ROWS, ROWS]
+    assert strategies == [
+        (expr, ROWS, int(np.count_nonzero(arrays["t"] < 0.05)), "dense")
+    ]
+
+
+@pytest.mark.parametrize(
+    ("right", "truth"),
+    [
+        ("flag", True),
+        ("!flag || true", True),
+        ("!(px > 0 && py > 0) || false", True),
+        ("px", False),
+        ("!px", False),
+        ("-(px > 0)", False),
+        ("flag && px", False),
+        ("n", False),
+        ("pi", False),
+        ("1", False),
+    ],
+)
+def test_truth_values_are_told_before_computing(right, truth, arrays):
+    arrays["flag"] = arrays["t"] < 0.5
+    arrays["n"] = np.arange(ROWS)
+    node = formulate.from_root(right)
+    assert _evaluate._gives_truth(node, arrays) is truth
+
+
+def test_xor_and_boolean_literals_give_truth_values(arrays):
+    node = formulate.from_numexpr("(px > 0) ^ (py > 0)")
+    assert _evaluate._gives_truth(node, arrays)
+    assert _evaluate._gives_truth(AST.Literal(True), arrays)
+    assert not _evaluate._gives_truth(node.left.right, arrays)
+
+
+def test_decided_rows_are_never_computed(arrays):
+    # A NaN for every row rejected, which, computed, would warn.
+    arrays["px"] = np.where(arrays["t"] < 0.05, 1.0, -1.0)
+    expr = formulate.from_root(f"t < 0.05 && TMath::Log(px) + {COSTLY}")
+    with pytest.warns(RuntimeWarning, match="invalid value"):
+        expected = expr.evaluate(arrays)
+    np.testing.assert_array_equal(expr.evaluate(arrays, short_circuit=True), expected)
+
+
+def test_nothing_undecided(arrays):
+    expr = formulate.from_root(f"t > 2 && {COSTLY}")
+    result, strategies = _strategies(expr, arrays)
+    assert not result.any()
+    assert strategies == [(str(expr), 0, "compact")]
+    with pytest.raises(KeyError, match="No array named 'w'"):
+        formulate.from_root(f"t > 2 && w + {COSTLY}").evaluate(
+            arrays, short_circuit=True
+        )
+
+
+def test_inputs_are_never_overwritten(arrays):
+    arrays["flag"] = arrays["t"] < 0.05
+    copy = arrays["flag"].copy()
+    expr = formulate.from_root(f"flag && {COSTLY}")
+    result, strategies = _strategies(expr, arrays)
+    assert strategies[0][2] == "compact"
+    np.testing.assert_array_equal(arrays["flag"], copy)
+    assert result is not arrays["flag"]
+
+
+def test_temporaries_are_reused():
+    rng = np.random.default_rng(0)
+    rows = _evaluate._REUSE_BYTES
+    arrays = {name: rng.random(rows) for name in ("t", "px", "py", "pz")}
+    expr = formulate.from_root(f"t < 0.05 && {COSTLY}")
+    np.testing.assert_array_equal(
+        expr.evaluate(arrays, short_circuit=True), expr.evaluate(arrays)
+    )
+
+
+def test_chunks_are_decided_each_on_their_own(arrays):
+    expr = formulate.from_root(EXPRESSIONS[0])
+    result, strategies = _strategies(expr, arrays, chunk_size=ROWS // 4)
+    np.testing.assert_array_equal(result, expr.evaluate(arrays))
+    assert len(strategies) == 4
+    assert sum(undecided for _, undecided, _ in strategies) == np.count_nonzero(
+        arrays["t"] < 0.05
+    )
+
+
+def test_deep_right_operands(arrays):
+    # a && (b && (c && ...)), deeper than a walk that recursed could go.
+    terms = [
+        AST.BinaryOperator("lt", AST.Symbol("t"), AST.Literal(0.999 - i / 10_000))
+        for i in range(1_500)
+    ]
+    expr = functools.reduce(
+        lambda right, left: AST.BinaryOperator("and", left, right), reversed(terms)
+    )
+    strategies = []
+    result = expr.evaluate(arrays, short_circuit=True, strategies=strategies)
+    np.testing.assert_array_equal(result, arrays["t"] < 0.999 - 1_499 / 10_000)
+    assert len(strategies) == _evaluate._NESTING
+
+
+def test_options(arrays):
+    expr = formulate.from_root("t < 0.5 && u < 0.5")
+    with pytest.raises(ValueError, match="only reported with short_circuit=True"):
+        expr.evaluate(arrays, strategies=[])
+    with pytest.raises(ValueError, match='short_circuit only applies to engine="nu'):
+        expr.evaluate(arrays, engine="numexpr", short_circuit=True)
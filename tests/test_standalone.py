@@ -0,0 +1,88 @@
+"""The standalone parsers generated from the grammars.
+
+They have to stay in step with the grammar files they were generated from, and
+be interchangeable with the parser lark compiles from those files: the same
+trees for everything that parses, and lark's own errors for everything that
+does not.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+
+import lark
+import pytest
+
+import formulate
+from formulate import _standalone, toast
+
+
+def _grammar(name: str) -> str:
+    return formulate._read_grammar(name)
+
+
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_generated_parser_matches_its_grammar(name):
+    """If this fails, a grammar was edited without running `nox -s generate`."""
+    module = importlib.import_module(f"formulate._standalone.{name}_parser")
+    digest = hashlib.sha256(_grammar(name).encode()).hexdigest()
+    assert digest == module.GRAMMAR_SHA256
+
+
+@pytest.mark.parametrize("reduce", [False, True])
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_parsing_uses_the_generated_parser(name, reduce):
+    parser = formulate._get_parser(name, reduce)
+    assert isinstance(parser, _standalone.StandaloneParser)
+
+
+@pytest.mark.parametrize(
+    "name,expression",
+    [
+        ("root", "TMath::Sqrt(x**2 + y**2) > 10 && !(a.b[0][i] == 1) : c"),
+        ("root", "Length$ + Sum$(x) - Length$()  * -2^3^-1 % 1.5e3"),
+        ("root", "a || b && c != d <= e"),
+        ("numexpr", "where(x > 1, sqrt(x), -x) ** 2 ** -1"),
+        ("numexpr", "(a & b | ~c ^ d) == (x % 2)"),
+        ("numexpr", "arctan2(y, x,) < pi"),
+    ],
+)
+def test_generated_and_compiled_parsers_agree(name, expression):
+    generated = formulate._get_parser(name, False).parse(expression)
+    compiled = formulate._get_lark_parser(name, False).parse(expression)
+    assert str(toast.toast(generated)) == str(toast.toast(compiled))
+
+
+@pytest.mark.parametrize("name", ["root", "numexpr"])
+def test_failures_are_raised_by_lark(name):
+    with pytest.raises(lark.UnexpectedInput):
+        formulate._get_parser(name, False).parse("a +")
+
+
+def test_out_of_date_parser_is_not_used():
+    assert _standalone.load("root", _grammar("root") + "\n", lambda: None) is None
+
+
+def test_missing_parser_is_not_used(monkeypatch):
+    grammar = _grammar("root")
+
+    def missing(name):
+        raise ModuleNotFoundError(name)
+
+    monkeypatch.setattr(importlib, "import_module", missing)
+    assert _standalone.load("root", grammar, lambda: None) is None
+
+
+def test_without_a_generated_parser_the_grammar_is_compiled(monkeypatch):
+    monkeypatch.setattr(_standalone, "load", lambda *_args, **_kwargs: None)
+    formulate._get_parser.cache_clear()
+    try:
+        assert formulate._get_parser("root", False) is formulate._get_lark_parser(
+            "root", False
+        )
+        assert formulate.from_root("a && b", cache=False).to_numexpr() == "(a & b)"
+        reduced = formulate.from_root("a && b", engine="reduce", cache=False)
+        assert reduced.to_numexpr() == "(a & b)"
+    finally:
+        formulate._get_parser.cache_clear()
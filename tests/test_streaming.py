@@ -0,0 +1,71 @@
+"""Rendering an expression a chunk at a time, with the ``iter_*`` and
+``write_*`` methods."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+
+import formulate
+from formulate import AST
+
+BACKENDS = ["root", "numexpr", "python"]
+
+
+@pytest.fixture
+def long_expression():
+    terms = [f"(x{i % 7} > {i})" for i in range(5000)]
+    return formulate.from_numexpr(" | ".join(terms), engine="fast", cache=False)
+
+
+@pytest.mark.parametrize("parens", ["full", "minimal"])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_output_is_identical_to_the_string(long_expression, backend, parens):
+    expected = getattr(long_expression, f"to_{backend}")(parens=parens)
+
+    chunks = list(getattr(long_expression, f"iter_{backend}")(parens=parens))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected
+
+    fp = io.StringIO()
+    getattr(long_expression, f"write_{backend}")(fp, parens=parens)
+    assert fp.getvalue() == expected
+
+
+def test_a_short_expression_is_one_chunk():
+    assert list(formulate.from_root("a + b").iter_root()) == ["(a + b)"]
+
+
+def test_chunks_are_counted_in_fragments(monkeypatch):
+    monkeypatch.setattr(AST, "_CHUNK_FRAGMENTS", 2)
+    chunks = list(formulate.from_root("a + b * c").iter_root(parens="minimal"))
+    assert chunks == ["a + ", "b * ", "c"]
+    monkeypatch.setattr(AST, "_CHUNK_FRAGMENTS", 1)
+    assert list(formulate.from_root("-a").iter_root()) == ["(", "-", "a", ")"]
+
+
+def test_rendering_writes_no_new_text(monkeypatch):
+    """Names, operators and constants are looked up, not built, so rendering
+    twice hands out the very same strings."""
+    monkeypatch.setattr(AST, "_CHUNK_FRAGMENTS", 1)
+    AST._encode_name.cache_clear()
+    expr = formulate.from_root("sqrt(branch.x ** y) > TMath::Pi() && !flag")
+    for backend in BACKENDS:
+        render = getattr(expr, f"iter_{backend}")
+        first = list(render())
+        assert all(a is b for a, b in zip(first, render(), strict=True))
+    assert AST._encode_name.cache_info().misses == 1
+
+
+def test_errors_come_after_what_precedes_them(monkeypatch):
+    monkeypatch.setattr(AST, "_CHUNK_FRAGMENTS", 1)
+    chunks = formulate.from_root("a + b[0]").iter_numexpr()
+    assert "".join(next(chunks) for _ in range(3)) == "(a + "
+    with pytest.raises(ValueError, match="forbidden in NumExpr"):
+        next(chunks)
+
+
+def test_arguments_are_checked_straight_away():
+    with pytest.raises(ValueError, match="Unknown parens"):
+        formulate.from_root("a").iter_root(parens="some")
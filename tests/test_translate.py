@@ -0,0 +1,153 @@
+"""Translating many expressions, and the translation cache."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+import formulate
+from formulate import _batch, _translate
+
+EXPRESSIONS = ["a && b", "a &", "TMath::Min(a, b)", "pi * x", "a && b", "class"]
+
+
+def _outcome(result):
+    if isinstance(result, Exception):
+        return type(result), str(result)
+    return result
+
+
+def _translate_all(path=None, **kwargs):
+    options = {"source": "root", "target": "numexpr", **kwargs}
+    return [
+        _outcome(r)
+        for r in formulate.translate_many(EXPRESSIONS, cache=path, **options)
+    ]
+
+
+def _without_parsing(monkeypatch):
+    def parse(_parser, expressions):
+        pytest.fail(f"parsed {expressions}")
+
+    monkeypatch.setattr(_batch.Parser, "parse", parse)
+
+
+def test_results_and_failures_in_order():
+    results = _translate_all()
+    assert results[0] == results[4] == "(a & b)"
+    assert results[1][0] is formulate.ParseError
+    # Parses, but cannot be rendered in NumExpr.
+    assert results[2] == (
+        ValueError,
+        'Function "TMath::Min" is not supported in NumExpr.',
+    )
+    assert results[3] == "(3.141592653589793 * x)"
+    assert results[5][0] is SyntaxError
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_a_second_run_parses_nothing(tmp_path, monkeypatch, jobs):
+    path = tmp_path / "cache.db"
+    first = _translate_all(path, jobs=jobs)
+    _without_parsing(monkeypatch)
+    assert _translate_all(path, jobs=jobs) == first
+
+
+def test_cached_parse_errors_have_no_lark_error(tmp_path):
+    path = tmp_path / "cache.db"
+    _translate_all(path)
+    [error] = formulate.translate_many(
+        ["a &"], source="root", target="root", cache=path
+    )
+    assert isinstance(error.lark_error, formulate._lark_error())
+    [error] = formulate.translate_many(
+        ["a &"], source="root", target="root", cache=path
+    )
+    assert error.lark_error is None
+
+
+def test_entries_are_keyed_on_source_and_target(tmp_path):
+    path = tmp_path / "cache.db"
+    with _translate.TranslationCache(path) as cache:
+        cache.put_many("root", "numexpr", [("a ^ b", "cached")])
+        assert cache.get_many("root", "numexpr", ["a ^ b"]) == {"a ^ b": "cached"}
+        assert cache.get_many("root", "python", ["a ^ b"]) == {}
+        assert cache.get_many("numexpr", "numexpr", ["a ^ b"]) == {}
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda monkeypatch: monkeypatch.setattr(_translate, "__version__", "0.0.0"),
+        lambda monkeypatch: monkeypatch.setattr(
+            _translate, "_read_grammar", lambda language: f"changed {language}"
+        ),
+    ],
+)
+def test_another_version_or_grammar_starts_afresh(tmp_path, monkeypatch, change):
+    path = tmp_path / "cache.db"
+    with _translate.TranslationCache(path) as cache:
+        cache.put_many("root", "numexpr", [("a", "cached")])
+    with monkeypatch.context() as patch:
+        change(patch)
+        with _translate.TranslationCache(path) as cache:
+            assert cache.get_many("root", "numexpr", ["a"]) == {}
+            cache.put_many("root", "numexpr", [("a", "other")])
+    # Each version keeps its own entries, so going back finds them again.
+    with _translate.TranslationCache(path) as cache:
+        assert cache.get_many("root", "numexpr", ["a"]) == {"a": "cached"}
+    assert formulate.translation_cache_prune(path) == 1
+    assert formulate.translation_cache_prune(path) == 0
+    # ... and pruning takes them out of the file, not just out of sight.
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT stamp FROM translations").fetchall() == [
+            (_translate._stamp(),)
+        ]
+
+
+def test_hits_and_lookups_are_counted(tmp_path):
+    path = tmp_path / "cache.db"
+    results = formulate.translate_many(
+        EXPRESSIONS, source="root", target="numexpr", cache=path
+    )
+    assert (results.hits, results.lookups) == (0, 0)
+    list(results)
+    assert (results.hits, results.lookups) == (0, 5)
+    results = formulate.translate_many(
+        [*EXPRESSIONS, "c"], source="root", target="numexpr", cache=path
+    )
+    assert list(results)[-1] == "c"
+    assert (results.hits, results.lookups) == (5, 6)
+    uncached = formulate.translate_many(EXPRESSIONS, source="root", target="root")
+    list(uncached)
+    assert (uncached.hits, uncached.lookups) == (0, 0)
+
+
+def test_large_batches_are_looked_up_and_saved_in_pieces(tmp_path, monkeypatch):
+    monkeypatch.setattr(_translate, "_LOOKUP", 2)
+    monkeypatch.setattr(_translate, "_COMMIT_EVERY", 3)
+    path = tmp_path / "cache.db"
+    names = [f"x{i}" for i in range(7)]
+    with _translate.TranslationCache(path) as cache:
+        cache.put_many("root", "root", [(name, name) for name in names])
+        # Committed already, so visible to another connection before closing.
+        with sqlite3.connect(path) as connection:
+            assert connection.execute(
+                "SELECT COUNT(*) FROM translations"
+            ).fetchone() == (7,)
+        assert cache.get_many("root", "root", names) == {name: name for name in names}
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        ({"source": "python", "target": "root"}, "Unknown source 'python'"),
+        ({"source": "root", "target": "latex"}, "Unknown target 'latex'"),
+        ({"source": "root", "target": "root", "jobs": 0}, "jobs must be at least 1"),
+    ],
+)
+def test_arguments_are_checked_straight_away(options, message):
+    with pytest.raises(ValueError, match=message):
+        formulate.translate_many(["a"], **options)